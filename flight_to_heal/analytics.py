@@ -0,0 +1,411 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+import mysql.connector
+
+from db_pool import ensure_tables
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Summary tables for MySQL, created by GameAnalytics.ensure_schema() when missing; the SQLite stand-in creates the
+# same tables in STAND_IN_SCHEMA.
+MYSQL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS game_result (
+        Game_ID INT PRIMARY KEY,
+        Player_Name VARCHAR(100),
+        Start_Airport_ID VARCHAR(10) NOT NULL,
+        Target_Hospital_ID VARCHAR(10) NOT NULL,
+        Outcome VARCHAR(16) NOT NULL,
+        Total_Game_Time_Minutes INT NOT NULL,
+        Final_Health DOUBLE NOT NULL,
+        Clinics_Used INT NOT NULL,
+        Finished_At DOUBLE NOT NULL,
+        INDEX idx_game_result_leaderboard (Outcome, Total_Game_Time_Minutes, Game_ID)
+    );
+    CREATE TABLE IF NOT EXISTS route_pair_stats (
+        Start_Airport_ID VARCHAR(10) NOT NULL,
+        Target_Hospital_ID VARCHAR(10) NOT NULL,
+        Games INT NOT NULL,
+        Wins INT NOT NULL,
+        Total_Win_Minutes BIGINT NOT NULL,
+        Best_Win_Minutes INT,
+        PRIMARY KEY (Start_Airport_ID, Target_Hospital_ID)
+    );
+    CREATE TABLE IF NOT EXISTS clinic_stats (
+        Clinic_ID VARCHAR(10) PRIMARY KEY,
+        Heals INT NOT NULL,
+        Games INT NOT NULL,
+        Wins INT NOT NULL
+    );
+"""
+
+# What record_finished reads from a GameState, copied when the game ends so the queued result cannot change.
+FinishedGame = namedtuple('FinishedGame', ('start_location_icao', 'target_hospital_icao', 'outcome',
+                                           'total_time_minutes', 'current_health', 'clinics_used'))
+
+
+class GameAnalytics:
+    # Maintains the leaderboard / win-rate summary tables one finished game at a time and serves keyset-paginated
+    # reads from them through a small TTL cache that is dropped whenever a new result is recorded.
+
+    INSERT_RESULT_SQL = """
+                        INSERT INTO game_result
+                        (Game_ID, Player_Name, Start_Airport_ID, Target_Hospital_ID, Outcome,
+                         Total_Game_Time_Minutes, Final_Health, Clinics_Used, Finished_At)
+                        SELECT Game_ID, Player_Name, %s, %s, %s, %s, %s, %s, %s
+                        FROM game_state
+                        WHERE Game_ID = %s
+                          AND NOT EXISTS (SELECT 1 FROM game_result WHERE Game_ID = %s) \
+                        """
+    UPSERT_PAIR_SQL = """
+                      INSERT INTO route_pair_stats
+                      (Start_Airport_ID, Target_Hospital_ID, Games, Wins, Total_Win_Minutes, Best_Win_Minutes)
+                      VALUES (%s, %s, 1, %s, %s, %s)
+                      ON DUPLICATE KEY UPDATE
+                          Games             = Games + 1,
+                          Wins              = Wins + %s,
+                          Total_Win_Minutes = Total_Win_Minutes + %s,
+                          Best_Win_Minutes  = CASE
+                                                  WHEN %s = 1 AND (Best_Win_Minutes IS NULL OR %s < Best_Win_Minutes)
+                                                      THEN %s
+                                                  ELSE Best_Win_Minutes END \
+                      """
+    UPSERT_CLINIC_SQL = """
+                        INSERT INTO clinic_stats (Clinic_ID, Heals, Games, Wins)
+                        VALUES (%s, %s, 1, %s)
+                        ON DUPLICATE KEY UPDATE
+                            Heals = Heals + %s,
+                            Games = Games + 1,
+                            Wins  = Wins + %s \
+                        """
+
+    TABLES = ('game_result', 'route_pair_stats', 'clinic_stats')
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
+    def __init__(self, data_manager, cache_ttl_seconds=30.0, max_cache_entries=1024, metrics=None):
+        self.data_manager = data_manager
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.max_cache_entries = max_cache_entries
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._generation = 0
+        self._schema_ready = False
+        self.counters = {'recorded': 0, 'duplicates': 0, 'cache_hits': 0, 'cache_misses': 0, 'invalidations': 0}
+
+    def ensure_schema(self):
+        # Creates the summary tables on first use; later calls cost nothing.
+        if not self._schema_ready:
+            with self.data_manager._get_db_connection() as conn:
+                if ensure_tables(conn, self.TABLES, MYSQL_SCHEMA):
+                    logger.info("Created the analytics summary tables.")
+            self._schema_ready = True
+
+    def record_finished(self, game_id, state):
+        # Called once when a game ends. The result row and every counter it bumps commit together, and the
+        # NOT EXISTS guard (or, when two requests race, the primary key) makes a repeated call for the same game a
+        # no-op, so the summary tables count each game exactly once. Counter rows are upserted in one statement
+        # each, so games finishing together on a new pair or clinic cannot collide on the insert.
+        won = int(state.outcome == 'SUCCESS')
+        win_minutes = state.total_time_minutes if won else 0
+        heals_by_clinic = {}
+        for icao in state.clinics_used:
+            heals_by_clinic[icao] = heals_by_clinic.get(icao, 0) + 1
+
+        self.ensure_schema()
+        with self.metrics.timer('flight_to_heal_db_query_duration_seconds', (('query', 'record_game_result'),)), \
+                self.data_manager._get_db_connection() as conn:
+            cursor = conn.cursor()
+            conn.start_transaction()
+            try:
+                cursor.execute(self.INSERT_RESULT_SQL, (
+                    state.start_location_icao, state.target_hospital_icao, state.outcome, state.total_time_minutes,
+                    round(state.current_health, 2), len(state.clinics_used), time.time(), game_id, game_id,
+                ))
+                recorded = cursor.rowcount != 0
+                if recorded:
+                    cursor.execute(self.UPSERT_PAIR_SQL, (
+                        state.start_location_icao, state.target_hospital_icao, won, win_minutes,
+                        win_minutes if won else None, won, win_minutes, won, win_minutes, win_minutes,
+                    ))
+                    # Sorted, so concurrent games lock shared clinic rows in the same order.
+                    for icao, heals in sorted(heals_by_clinic.items()):
+                        cursor.execute(self.UPSERT_CLINIC_SQL, (icao, heals, won, heals, won))
+                    conn.commit()
+                else:
+                    conn.rollback()
+            except mysql.connector.IntegrityError:
+                conn.rollback()
+                recorded = False
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        if not recorded:
+            with self._cache_lock:
+                self.counters['duplicates'] += 1
+            return False
+
+        self.metrics.inc('flight_to_heal_db_rows_written_total', (('table', 'game_result'),))
+        self.invalidate()
+        with self._cache_lock:
+            self.counters['recorded'] += 1
+        return True
+
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._generation += 1
+            self.counters['invalidations'] += 1
+
+    def _cached(self, key, query):
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                self.counters['cache_hits'] += 1
+                return entry[1]
+            self.counters['cache_misses'] += 1
+            generation = self._generation
+
+        result = query()
+        with self._cache_lock:
+            # A result recorded while the query ran would make this page stale; serve it but don't keep it.
+            if generation != self._generation:
+                return result
+            if len(self._cache) >= self.max_cache_entries:
+                self._cache.clear()
+            self._cache[key] = (now + self.cache_ttl_seconds, result)
+        return result
+
+    def _fetch(self, query_name, sql, params):
+        self.ensure_schema()
+        with self.metrics.timer('flight_to_heal_db_query_duration_seconds', (('query', query_name),)), \
+                self.data_manager._get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+
+    def page_size(self, limit):
+        if limit is None:
+            return self.DEFAULT_PAGE_SIZE
+        return max(1, min(self.MAX_PAGE_SIZE, int(limit)))
+
+    def leaderboard(self, limit=None, after=None):
+        # Fastest successful deliveries. `after` is the (minutes, game_id) of the last row of the previous page;
+        # the (Outcome, Total_Game_Time_Minutes, Game_ID) index serves each page without an offset scan.
+        limit = self.page_size(limit)
+
+        def query():
+            sql = """
+                  SELECT Game_ID, Player_Name, Start_Airport_ID, Target_Hospital_ID,
+                         Total_Game_Time_Minutes, Final_Health, Clinics_Used
+                  FROM game_result
+                  WHERE Outcome = 'SUCCESS' \
+                  """
+            params = []
+            if after is not None:
+                sql += " AND (Total_Game_Time_Minutes > %s OR (Total_Game_Time_Minutes = %s AND Game_ID > %s))"
+                params.extend((after[0], after[0], after[1]))
+            sql += " ORDER BY Total_Game_Time_Minutes, Game_ID LIMIT %s"
+            params.append(limit + 1)
+            rows = self._fetch('leaderboard', sql, params)
+
+            entries = [{
+                'game_id': row['Game_ID'], 'player_name': row['Player_Name'],
+                'start_icao': row['Start_Airport_ID'], 'target_icao': row['Target_Hospital_ID'],
+                'time_total': row['Total_Game_Time_Minutes'], 'final_health': row['Final_Health'],
+                'clinics_used': row['Clinics_Used'],
+            } for row in rows[:limit]]
+            next_after = None
+            if len(rows) > limit:
+                next_after = f"{entries[-1]['time_total']}:{entries[-1]['game_id']}"
+            return {'entries': entries, 'next_after': next_after}
+
+        return self._cached(('leaderboard', limit, after), query)
+
+    def pair_stats(self, limit=None, after=None, start_icao=None):
+        # Win rate per start/target pair, paged in primary-key order. `after` is the last (start, target) seen.
+        limit = self.page_size(limit)
+
+        def query():
+            sql = """
+                  SELECT Start_Airport_ID, Target_Hospital_ID, Games, Wins, Total_Win_Minutes, Best_Win_Minutes
+                  FROM route_pair_stats
+                  WHERE 1 = 1 \
+                  """
+            params = []
+            if start_icao is not None:
+                sql += " AND Start_Airport_ID = %s"
+                params.append(start_icao)
+            if after is not None:
+                sql += " AND (Start_Airport_ID > %s OR (Start_Airport_ID = %s AND Target_Hospital_ID > %s))"
+                params.extend((after[0], after[0], after[1]))
+            sql += " ORDER BY Start_Airport_ID, Target_Hospital_ID LIMIT %s"
+            params.append(limit + 1)
+            rows = self._fetch('pair_stats', sql, params)
+
+            entries = [{
+                'start_icao': row['Start_Airport_ID'], 'target_icao': row['Target_Hospital_ID'],
+                'games': row['Games'], 'wins': row['Wins'], 'win_rate': round(row['Wins'] / row['Games'], 4),
+                'average_win_minutes': round(row['Total_Win_Minutes'] / row['Wins'], 1) if row['Wins'] else None,
+                'best_win_minutes': row['Best_Win_Minutes'],
+            } for row in rows[:limit]]
+            next_after = None
+            if len(rows) > limit:
+                next_after = f"{entries[-1]['start_icao']}:{entries[-1]['target_icao']}"
+            return {'entries': entries, 'next_after': next_after}
+
+        return self._cached(('pair_stats', limit, after, start_icao), query)
+
+    def clinic_stats(self, limit=None, after=None):
+        # Heal counts and the win rate of games that healed at each clinic, paged by clinic ICAO.
+        limit = self.page_size(limit)
+
+        def query():
+            sql = "SELECT Clinic_ID, Heals, Games, Wins FROM clinic_stats"
+            params = []
+            if after is not None:
+                sql += " WHERE Clinic_ID > %s"
+                params.append(after)
+            sql += " ORDER BY Clinic_ID LIMIT %s"
+            params.append(limit + 1)
+            rows = self._fetch('clinic_stats', sql, params)
+
+            entries = [{
+                'clinic_icao': row['Clinic_ID'], 'heals': row['Heals'], 'games': row['Games'], 'wins': row['Wins'],
+                'win_rate': round(row['Wins'] / row['Games'], 4),
+            } for row in rows[:limit]]
+            next_after = entries[-1]['clinic_icao'] if len(rows) > limit else None
+            return {'entries': entries, 'next_after': next_after}
+
+        return self._cached(('clinic_stats', limit, after), query)
+
+    def stats(self):
+        with self._cache_lock:
+            return dict(self.counters, cache_entries=len(self._cache))
+
+
+class GameResultWriter:
+    # Records finished games through GameAnalytics.record_finished on a background thread, so a player's last move
+    # does not wait for the result transaction. record_finished counts each game once, so a failed write is simply
+    # retried; a full queue or a closed writer records on the caller's thread instead.
+
+    def __init__(self, analytics, max_pending=10000, max_retries=3, retry_backoff_seconds=0.5, submit_timeout=1.0):
+        self.analytics = analytics
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.submit_timeout = submit_timeout
+
+        # (game_id, FinishedGame, attempts so far) in finishing order.
+        self._pending = deque()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.counters = {'submitted': 0, 'sync_writes': 0, 'written': 0, 'failed': 0, 'retried': 0, 'dropped': 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='game-result-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, game_id, state):
+        result = FinishedGame(state.start_location_icao, state.target_hospital_icao, state.outcome,
+                              state.total_time_minutes, state.current_health, tuple(state.clinics_used))
+        with self._condition:
+            self.counters['submitted'] += 1
+            if not self._closed:
+                self._ensure_started()
+                deadline = time.monotonic() + self.submit_timeout
+                while len(self._pending) >= self.max_pending and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if len(self._pending) < self.max_pending and not self._closed:
+                    self._pending.append((game_id, result, 0))
+                    self._condition.notify_all()
+                    return
+            self.counters['sync_writes'] += 1
+
+        # Queue full or writer closed: record on the caller's thread rather than lose the result.
+        if not self._record(game_id, result):
+            with self._condition:
+                self.counters['dropped'] += 1
+
+    def _record(self, game_id, result):
+        try:
+            self.analytics.record_finished(game_id, result)
+        except mysql.connector.Error as error:
+            logger.warning("Failed to record result for game %s: %s", game_id, error)
+            return False
+        except Exception:
+            logger.exception("Failed to record result for game %s.", game_id)
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    self._condition.notify_all()
+                    return
+                game_id, result, attempts = self._pending.popleft()
+                self._in_flight = 1
+                self._condition.notify_all()
+
+            recorded = self._record(game_id, result)
+
+            with self._condition:
+                self._in_flight = 0
+                if recorded:
+                    self.counters['written'] += 1
+                else:
+                    self.counters['failed'] += 1
+                    if attempts + 1 > self.max_retries:
+                        self.counters['dropped'] += 1
+                        logger.warning("Dropped the result of game %s after %d attempts.", game_id, attempts + 1)
+                    else:
+                        self.counters['retried'] += 1
+                        self._pending.append((game_id, result, attempts + 1))
+                self._condition.notify_all()
+                if not recorded and not self._closed:
+                    self._condition.wait(self.retry_backoff_seconds)
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, pending=len(self._pending), in_flight=self._in_flight)
@@ -1,9 +1,104 @@
-import random
+import copy
+import hashlib
+import logging
+import math
+import struct
 import sys
+import threading
+import time
+from types import MappingProxyType
 import mysql.connector
-from flask import Flask, request, jsonify, session, render_template
+from flask import Flask, request, jsonify, session, render_template, g
 from datetime import timedelta
 
+import coord_stream
+from analytics import GameAnalytics, GameResultWriter
+from db_pool import ConnectionPool
+from game_random import GameRandom
+from event_log import DatabaseEventSink, GameEventLog, SegmentedFileEventSink, replay_events
+from metrics import Metrics, SIZE_BUCKETS
+from refresher import ReferenceDataRefresher
+from route_network import PackedBlobs, RouteNetwork, RoutesByDeparture
+from route_solver import RouteSolver
+from session_store import MemoryStateStore
+from snapshot_file import read_snapshot, write_snapshot
+from spatial import SpatialIndex
+from static_payloads import EncodedPayload, encode_json
+from status_push import StatusHub, StatusStream, format_event
+from write_behind import GameStatusWriter
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceSnapshot:
+    # One immutable load of the reference data and everything derived from it. GameData swaps whole snapshots,
+    # so a reader holding one never sees a half-loaded graph.
+
+    def __init__(self, airports, interconnections, departure_risks, diversion_risks=(), data_version=0,
+                 content_hash=None, flight_options_json=None):
+        self.network = RouteNetwork(airports, interconnections)
+        self.airports = MappingProxyType(
+            {icao: MappingProxyType(dict(airports[icao])) for icao in self.network.icaos})
+        self.departure_risks = tuple(MappingProxyType(dict(risk)) for risk in departure_risks)
+        self.diversion_risks = tuple(MappingProxyType(dict(risk)) for risk in diversion_risks)
+        self.data_version = data_version
+        self.content_hash = content_hash or self.compute_content_hash(airports, interconnections, departure_risks)
+        self.route_solver = None
+
+        self._build_route_index(flight_options_json)
+
+    @staticmethod
+    def compute_content_hash(airports, interconnections, departure_risks):
+        digest = hashlib.sha256()
+        digest.update(repr(sorted((icao, sorted(airport.items())) for icao, airport in airports.items())).encode())
+        digest.update(repr([sorted(connection.items()) for connection in interconnections]).encode())
+        digest.update(repr([sorted(risk.items()) for risk in departure_risks]).encode())
+        return digest.hexdigest()
+
+    @property
+    def interconnections(self):
+        return tuple(MappingProxyType(self.network.connection(edge)) for edge in range(self.network.edge_count))
+
+    def _build_route_index(self, flight_options_json=None):
+        # Routes live in the network's arrays; the per-route and per-option dicts are only built on demand, and the
+        # option JSON every turn sends is pre-encoded once per load into a single buffer.
+        network = self.network
+        self.routes_by_departure = RoutesByDeparture(network)
+        self.valid_start_icaos = tuple(icao for airport_id, icao in enumerate(network.icaos)
+                                       if network.has_departures(airport_id))
+
+        if flight_options_json is None:
+            flight_options_json = {icao: encode_json([dict(option) for option in self.get_flight_options(icao)])
+                                   for icao in self.valid_start_icaos}
+        self.flight_options_json = PackedBlobs(network, flight_options_json)
+        self.airport_coords_payload = EncodedPayload(
+            {icao: [data['Latitude'], data['Longitude']] for icao, data in self.airports.items()}, self.data_version)
+
+        self.spatial_index = SpatialIndex(self.airports)
+        self.clinic_spatial_index = SpatialIndex(
+            {icao: data for icao, data in self.airports.items() if data.get('Clinic', False)})
+
+    def get_route(self, departure_icao, arrival_icao):
+        edge = self.network.find_edge(departure_icao, arrival_icao)
+        return None if edge is None else self.network.route(edge)
+
+    def get_flight_options(self, departure_icao):
+        network = self.network
+        options = []
+        for flight_id, edge in enumerate(network.edges_from(departure_icao), start=1):
+            arrival_icao = network.icaos[network.arrivals[edge]]
+            arrival = self.airports[arrival_icao]
+            options.append(MappingProxyType({
+                'ID': flight_id, 'Destination_ICAO': arrival_icao, 'Destination_Name': arrival['Name'],
+                'Time': network.times[edge], 'Health_Loss': round(network.health_losses[edge], 2),
+                'Latitude': arrival['Latitude'], 'Longitude': arrival['Longitude'],
+                'Clinic': bool(arrival.get('Clinic', False)),
+            }))
+        return tuple(options)
+
+    def get_flight_options_json(self, departure_icao):
+        return self.flight_options_json.get(departure_icao, b'[]')
+
 
 class GameData:
     DB_CONFIG = {
@@ -19,25 +114,116 @@ class GameData:
     START_HEALTH = 75.0
     HEALING_TIME_BASE = 60
 
-    def __init__(self):
-        self.airports = {}
-        self.interconnections = []
-        self.departure_risks = []
-        self.diversion_risks = []
-
-    def _get_db_connection(self):
+    POOL_SIZE = 10
+    POOL_TIMEOUT_SECONDS = 5.0
+    POOL_HEALTH_CHECK_SECONDS = 30.0
+
+    PRECOMPUTE_WINNABLE_ROUTES = True
+    REFERENCE_FINGERPRINT_SQL = "CHECKSUM TABLE Airport, Interconnection, Departure_Risk"
+    # Precompiled reference data file; None disables it.
+    SNAPSHOT_PATH = None
+
+    def __init__(self, connect=None, snapshot_path=None):
+        self.pool = ConnectionPool(connect or self._connect_mysql, size=self.POOL_SIZE,
+                                   timeout=self.POOL_TIMEOUT_SECONDS,
+                                   health_check_interval=self.POOL_HEALTH_CHECK_SECONDS)
+        self.snapshot_path = snapshot_path or self.SNAPSHOT_PATH
+        self._reload_lock = threading.Lock()
+        self._reference_fingerprint = None
+        self._snapshot = self._build_snapshot({}, [], [])
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def airports(self):
+        return self._snapshot.airports
+
+    @property
+    def interconnections(self):
+        return self._snapshot.interconnections
+
+    @property
+    def departure_risks(self):
+        return self._snapshot.departure_risks
+
+    @property
+    def diversion_risks(self):
+        return self._snapshot.diversion_risks
+
+    @property
+    def routes_by_departure(self):
+        return self._snapshot.routes_by_departure
+
+    @property
+    def valid_start_icaos(self):
+        return self._snapshot.valid_start_icaos
+
+    @property
+    def route_network(self):
+        return self._snapshot.network
+
+    @property
+    def route_solver(self):
+        return self._snapshot.route_solver
+
+    @property
+    def data_version(self):
+        return self._snapshot.data_version
+
+    @property
+    def airport_coords_payload(self):
+        return self._snapshot.airport_coords_payload
+
+    @property
+    def spatial_index(self):
+        return self._snapshot.spatial_index
+
+    @property
+    def clinic_spatial_index(self):
+        return self._snapshot.clinic_spatial_index
+
+    def get_route(self, departure_icao, arrival_icao):
+        return self._snapshot.get_route(departure_icao, arrival_icao)
+
+    def get_flight_options(self, departure_icao):
+        return self._snapshot.get_flight_options(departure_icao)
+
+    def get_flight_options_json(self, departure_icao):
+        return self._snapshot.get_flight_options_json(departure_icao)
+
+    def pinned(self):
+        # A view that keeps reading the current snapshot even if a reload swaps in a newer one meanwhile.
+        return copy.copy(self)
+
+    def _build_snapshot(self, airports, interconnections, departure_risks, content_hash=None,
+                        winnable_targets=None, flight_options_json=None):
+        previous = getattr(self, '_snapshot', None)
+        snapshot = ReferenceSnapshot(airports, interconnections, departure_risks,
+                                     data_version=previous.data_version + 1 if previous else 0,
+                                     content_hash=content_hash, flight_options_json=flight_options_json)
+        view = copy.copy(self)
+        view._snapshot = snapshot
+        snapshot.route_solver = RouteSolver(view)
+        if winnable_targets is not None:
+            snapshot.route_solver.use_precomputed(winnable_targets)
+        elif self.PRECOMPUTE_WINNABLE_ROUTES and snapshot.valid_start_icaos:
+            snapshot.route_solver.precompute()
+        return snapshot
+
+    def _connect_mysql(self):
         try:
             connection = mysql.connector.connect(**self.DB_CONFIG)
             return connection
         except mysql.connector.Error as errors:
             raise mysql.connector.Error(f"Database connection failed: {errors}")
 
-    def _load_emergency_data(self):
-        self.airports.clear()
-        self.interconnections.clear()
-        self.departure_risks.clear()
+    def _get_db_connection(self):
+        return self.pool.connection()
 
-        self.airports.update({
+    def _load_emergency_data(self):
+        airports = {
             'OTHH': {'Name': 'Hamad International Airport', 'Continent': 'Asia', 'Country': 'Qatar',
                      'Latitude': 25.273500, 'Longitude': 51.608300,
                      'Clinic': True, 'Healing': 25.0, 'TimeFactor': 0.75},
@@ -54,8 +240,8 @@ class GameData:
             'PADD': {'Name': 'Addu International Airport', 'Continent': 'Asia', 'Country': 'Maldives',
                      'Latitude': 0.697400, 'Longitude': 73.158100,
                      'Clinic': False},
-        })
-        self.interconnections.extend([
+        }
+        interconnections = [
             {'Departure_Airport_ID': 'OTHH', 'Arrival_Airport_ID': 'EGLL', 'Time': 420,
              'Health_Cost_Per_Minute': 0.045},
             {'Departure_Airport_ID': 'OTHH', 'Arrival_Airport_ID': 'WSSS', 'Time': 460,
@@ -68,88 +254,219 @@ class GameData:
              'Health_Cost_Per_Minute': 0.035},
             {'Departure_Airport_ID': 'PADD', 'Arrival_Airport_ID': 'OTHH', 'Time': 240,
              'Health_Cost_Per_Minute': 0.035},
-        ])
-        self.departure_risks.extend([
+        ]
+        departure_risks = [
             {'Name': 'Weather Delay', 'Probability': 0.50, 'TimePenalty': 60, 'HealthPenalty': 4.80},
-        ])
+        ]
 
-        if not self.airports or not self.interconnections:
+        if not airports or not interconnections:
             sys.exit()
 
-    def load_from_database(self):
-        connection = None
-        cursor = None
-        try:
-            connection = self._get_db_connection()
-            cursor = connection.cursor(dictionary=True)
-
-            airport_sql_query = """
-                                SELECT A.ICAO_Code, \
-                                       A.Airport_Name, \
-                                       C.Continent_Name, \
-                                       A.Country_Name,
-                                       A.Latitude, \
-                                       A.Longitude, \
-                                       A.Clinic, \
-                                       A.Clinic_Healing_Amount, \
-                                       A.Clinic_Time_Factor
-                                FROM Airport AS A \
-                                         INNER JOIN Continent AS C ON A.Continent_ID = C.Continent_ID \
-                                """
-            cursor.execute(airport_sql_query)
-            for row in cursor.fetchall():
-                icao_code = row['ICAO_Code']
-                is_clinic = bool(row.get('Clinic', 0))
-                airport_data = {
-                    'Name': row['Airport_Name'], 'Continent': row.get('Continent_Name', 'Unknown'),
-                    'Country': row.get('Country_Name', 'Unknown'),
-                    'Latitude': float(row.get('Latitude', 0.0)),
-                    'Longitude': float(row.get('Longitude', 0.0)),
-                    'Clinic': is_clinic,
-                }
-                if is_clinic:
-                    airport_data.update({'Healing': float(row.get('Clinic_Healing_Amount', 0.0)),
-                                         'TimeFactor': float(row.get('Clinic_Time_Factor', 1.0))})
-                self.airports[icao_code] = airport_data
-
-            interconnection_sql_query = """
-                                        SELECT Departure_Airport_ID, \
-                                               Arrival_Airport_ID, \
-                                               Travel_Time_Minutes, \
-                                               Health_Cost_Per_Minute
-                                        FROM Interconnection \
-                                        """
-            cursor.execute(interconnection_sql_query)
-            for row in cursor.fetchall():
-                self.interconnections.append({
-                    'Departure_Airport_ID': row['Departure_Airport_ID'],
-                    'Arrival_Airport_ID': row['Arrival_Airport_ID'],
-                    'Time': int(row['Travel_Time_Minutes']),
-                    'Health_Cost_Per_Minute': float(row['Health_Cost_Per_Minute']),
-                })
-
-            sql_query_departure_risk = "SELECT Departure_Risk_Name, Probability_of_Occurring, Time_Delay_Minutes, Health_Loss FROM Departure_Risk"
-            cursor.execute(sql_query_departure_risk)
-            for row in cursor.fetchall():
-                self.departure_risks.append({
-                    'Name': row['Departure_Risk_Name'], 'Probability': float(row['Probability_of_Occurring']),
-                    'TimePenalty': int(row['Time_Delay_Minutes']), 'HealthPenalty': float(row['Health_Loss']),
-                })
-
-            if not self.airports or not self.interconnections:
-                self._load_emergency_data()
+        self._snapshot = self._build_snapshot(airports, interconnections, departure_risks)
 
+    def _fetch_fingerprint(self, cursor):
+        try:
+            cursor.execute(self.REFERENCE_FINGERPRINT_SQL)
+            return tuple(sorted((row['Table'], row['Checksum']) for row in cursor.fetchall()))
         except mysql.connector.Error:
-            self._load_emergency_data()
+            return None
+
+    def _fetch_reference_rows(self, cursor):
+        airports = {}
+        interconnections = []
+        departure_risks = []
+
+        airport_sql_query = """
+                            SELECT A.ICAO_Code, \
+                                   A.Airport_Name, \
+                                   C.Continent_Name, \
+                                   A.Country_Name,
+                                   A.Latitude, \
+                                   A.Longitude, \
+                                   A.Clinic, \
+                                   A.Clinic_Healing_Amount, \
+                                   A.Clinic_Time_Factor
+                            FROM Airport AS A \
+                                     INNER JOIN Continent AS C ON A.Continent_ID = C.Continent_ID \
+                            """
+        cursor.execute(airport_sql_query)
+        for row in cursor.fetchall():
+            icao_code = row['ICAO_Code']
+            is_clinic = bool(row.get('Clinic', 0))
+            airport_data = {
+                'Name': row['Airport_Name'], 'Continent': row.get('Continent_Name', 'Unknown'),
+                'Country': row.get('Country_Name', 'Unknown'),
+                'Latitude': float(row.get('Latitude', 0.0)),
+                'Longitude': float(row.get('Longitude', 0.0)),
+                'Clinic': is_clinic,
+            }
+            if is_clinic:
+                airport_data.update({'Healing': float(row.get('Clinic_Healing_Amount', 0.0)),
+                                     'TimeFactor': float(row.get('Clinic_Time_Factor', 1.0))})
+            airports[icao_code] = airport_data
+
+        interconnection_sql_query = """
+                                    SELECT Departure_Airport_ID, \
+                                           Arrival_Airport_ID, \
+                                           Travel_Time_Minutes, \
+                                           Health_Cost_Per_Minute
+                                    FROM Interconnection \
+                                    """
+        cursor.execute(interconnection_sql_query)
+        for row in cursor.fetchall():
+            interconnections.append({
+                'Departure_Airport_ID': row['Departure_Airport_ID'],
+                'Arrival_Airport_ID': row['Arrival_Airport_ID'],
+                'Time': int(row['Travel_Time_Minutes']),
+                'Health_Cost_Per_Minute': float(row['Health_Cost_Per_Minute']),
+            })
 
-        finally:
-            if cursor: cursor.close()
-            if connection and connection.is_connected(): connection.close()
+        sql_query_departure_risk = "SELECT Departure_Risk_Name, Probability_of_Occurring, Time_Delay_Minutes, Health_Loss FROM Departure_Risk"
+        cursor.execute(sql_query_departure_risk)
+        for row in cursor.fetchall():
+            departure_risks.append({
+                'Name': row['Departure_Risk_Name'], 'Probability': float(row['Probability_of_Occurring']),
+                'TimePenalty': int(row['Time_Delay_Minutes']), 'HealthPenalty': float(row['Health_Loss']),
+            })
 
+        return airports, interconnections, departure_risks
+
+    def _read_snapshot_file(self):
+        if not self.snapshot_path:
+            return None
+        try:
+            return read_snapshot(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logger.warning("Ignoring unreadable reference snapshot %s: %s", self.snapshot_path, error)
+            return None
+
+    def _write_snapshot_file(self, airports, departure_risks, fingerprint):
+        if not self.snapshot_path:
+            return
+        solver = self._snapshot.route_solver
+        try:
+            # The network's routes rather than the rows: it has dropped any whose airports did not load.
+            write_snapshot(self.snapshot_path, airports, self._snapshot.interconnections, departure_risks,
+                           self._snapshot.content_hash, fingerprint,
+                           solver.winnable_targets if solver.winnable_starts else None,
+                           self._snapshot.flight_options_json, RouteSolver.parameters_key(self))
+        except OSError as error:
+            logger.warning("Could not write reference snapshot %s: %s", self.snapshot_path, error)
+
+    def _stored_winnable_targets(self, stored):
+        # A stored winnable map only holds for the game parameters (START_HEALTH etc.) it was computed with.
+        if stored['solver_key'] != RouteSolver.parameters_key(self):
+            return None
+        return stored['winnable_targets']
+
+    def _build_from_file(self, stored, fingerprint):
+        # Returns False if the file's winnable map was computed for other game parameters and had to be redone.
+        self._snapshot = self._build_snapshot(stored['airports'], stored['interconnections'],
+                                              stored['departure_risks'], stored['content_hash'],
+                                              self._stored_winnable_targets(stored), stored['flight_options_json'])
+        self._reference_fingerprint = fingerprint
+        return stored['solver_key'] == RouteSolver.parameters_key(self)
+
+    def load_from_snapshot_file(self):
+        # Reference data from the precompiled file alone, for offline tools that run without a database.
+        with self._reload_lock:
+            stored = self._read_snapshot_file()
+            if stored is None:
+                raise FileNotFoundError(f"No readable reference snapshot at {self.snapshot_path}.")
+            self._build_from_file(stored, stored['fingerprint'])
+
+    def load_from_database(self):
+        # With a snapshot file whose fingerprint still matches the database, startup is one cheap CHECKSUM query
+        # plus a file read. If only the fingerprint is unavailable, the rows are fetched, and a matching content
+        # hash still skips the expensive winnable-route precompute. A stale file is rewritten after the load.
+        with self._reload_lock:
+            stored = self._read_snapshot_file()
+            connection = None
+            cursor = None
+            try:
+                connection = self._get_db_connection()
+                cursor = connection.cursor(dictionary=True)
+                fingerprint = self._fetch_fingerprint(cursor)
+                if stored and fingerprint is not None and fingerprint == stored['fingerprint']:
+                    if not self._build_from_file(stored, fingerprint):
+                        self._write_snapshot_file(stored['airports'], stored['departure_risks'], fingerprint)
+                    return
+
+                airports, interconnections, departure_risks = self._fetch_reference_rows(cursor)
+
+                if not airports or not interconnections:
+                    self._load_emergency_data()
+                else:
+                    content_hash = ReferenceSnapshot.compute_content_hash(airports, interconnections, departure_risks)
+                    winnable_targets = None
+                    if stored and stored['content_hash'] == content_hash:
+                        winnable_targets = self._stored_winnable_targets(stored)
+                    self._snapshot = self._build_snapshot(airports, interconnections, departure_risks, content_hash,
+                                                          winnable_targets)
+                    self._reference_fingerprint = fingerprint
+                    if not stored or stored['content_hash'] != content_hash or stored['fingerprint'] != fingerprint \
+                            or stored['solver_key'] != RouteSolver.parameters_key(self):
+                        self._write_snapshot_file(airports, departure_risks, fingerprint)
+
+            except mysql.connector.Error:
+                # The cursor must go before its connection is discarded; closing it afterwards raises anew.
+                if cursor: cursor.close()
+                cursor = None
+                if connection: connection.discard()
+                connection = None
+                if stored:
+                    # Real data from the last good load beats the built-in emergency network.
+                    logger.warning("Database unavailable, serving reference data from %s.", self.snapshot_path)
+                    self._build_from_file(stored, stored['fingerprint'])
+                else:
+                    self._load_emergency_data()
+
+            finally:
+                if cursor: cursor.close()
+                if connection: connection.close()
+
+    def refresh(self, force=False):
+        # Reloads off the request path and swaps the snapshot only when the data really changed. Errors propagate
+        # so the caller can count them; the current snapshot keeps serving in the meantime.
+        with self._reload_lock:
+            with self._get_db_connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+                try:
+                    fingerprint = self._fetch_fingerprint(cursor)
+                    if not force and fingerprint is not None and fingerprint == self._reference_fingerprint:
+                        return False
+                    airports, interconnections, departure_risks = self._fetch_reference_rows(cursor)
+                finally:
+                    cursor.close()
+
+            self._reference_fingerprint = fingerprint
+            if not airports or not interconnections:
+                return False
+            content_hash = ReferenceSnapshot.compute_content_hash(airports, interconnections, departure_risks)
+            if content_hash == self._snapshot.content_hash:
+                return False
+
+            self._snapshot = self._build_snapshot(airports, interconnections, departure_risks, content_hash)
+            self._write_snapshot_file(airports, departure_risks, fingerprint)
+            return True
 
-class GameState:
 
-    def __init__(self, data_manager: GameData):
+class GameState:
+    __slots__ = ('data', 'current_health', 'total_time_minutes', 'current_location_icao', 'target_hospital_icao',
+                 'messages', 'is_game_over', 'outcome', 'start_location_icao', 'clinics_used', 'rng', 'revision')
+
+    BINARY_VERSION = 4
+    BINARY_HEADER = struct.Struct('<BdiBB')
+    BINARY_LENGTH = struct.Struct('<H')
+    BINARY_COUNTS = struct.Struct('<HH')
+    BINARY_RNG = struct.Struct('<QI')
+    BINARY_REVISION = struct.Struct('<I')
+    OUTCOME_CODES = {None: 0, 'SUCCESS': 1, 'LOST_HEALTH': 2, 'LOST_TIME': 3}
+    OUTCOMES_BY_CODE = {code: outcome for outcome, code in OUTCOME_CODES.items()}
+
+    def __init__(self, data_manager: GameData, seed=None):
         self.data = data_manager
         self.current_health = data_manager.START_HEALTH
         self.total_time_minutes = 0
@@ -158,27 +475,40 @@ class GameState:
         self.messages = []
         self.is_game_over = False
         self.outcome = None
+        self.start_location_icao = None
+        self.clinics_used = []
+        # Unseeded states get their stream from initialize() or the stored blob, not from os.urandom on every load.
+        self.rng = None if seed is None else GameRandom(seed)
+        # Bumped on every save, so status streams can tell which pushed deltas a stored state already contains.
+        self.revision = 0
 
     def initialize(self):
         all_icaos = list(self.data.airports.keys())
+        if self.rng is None:
+            self.rng = GameRandom(GameRandom.new_seed())
 
         if not all_icaos:
             raise Exception("No airport data available. Cannot start game.")
 
-        possible_starts = [icao for icao in all_icaos if
-                           any(conn['Departure_Airport_ID'] == icao for conn in self.data.interconnections)]
+        solver = self.data.route_solver
+        if solver.winnable_starts:
+            self.current_location_icao = self.rng.choice(solver.winnable_starts)
+            self.target_hospital_icao = self.rng.choice(solver.winnable_targets[self.current_location_icao])
+        else:
+            possible_starts = self.data.valid_start_icaos
 
-        if not possible_starts:
-            raise Exception("No valid starting locations available from loaded data.")
+            if not possible_starts:
+                raise Exception("No valid starting locations available from loaded data.")
 
-        self.current_location_icao = random.choice(possible_starts)
+            self.current_location_icao = self.rng.choice(possible_starts)
 
-        icao_remaining = [icao for icao in all_icaos if icao != self.current_location_icao]
-        if not icao_remaining:
-            raise Exception("Only one airport loaded. Cannot set a destination.")
+            icao_remaining = [icao for icao in all_icaos if icao != self.current_location_icao]
+            if not icao_remaining:
+                raise Exception("Only one airport loaded. Cannot set a destination.")
 
-        self.target_hospital_icao = random.choice(icao_remaining)
+            self.target_hospital_icao = self.rng.choice(icao_remaining)
 
+        self.start_location_icao = self.current_location_icao
         self.messages.append(
             f"GOAL: Deliver patient to {self.data.airports[self.target_hospital_icao]['Name']} ({self.target_hospital_icao})."
         )
@@ -186,17 +516,69 @@ class GameState:
         return {
             'current_health': self.current_health, 'total_time_minutes': self.total_time_minutes,
             'current_location_icao': self.current_location_icao, 'target_hospital_icao': self.target_hospital_icao,
-            'messages': self.messages, 'is_game_over': self.is_game_over, 'outcome': self.outcome
+            'messages': self.messages, 'is_game_over': self.is_game_over, 'outcome': self.outcome,
+            'start_location_icao': self.start_location_icao, 'clinics_used': self.clinics_used,
+            'seed': self.rng.seed if self.rng is not None else None
         }
 
-    def load_from_session(self, session_data):
-        self.current_health = session_data['current_health']
-        self.total_time_minutes = session_data['total_time_minutes']
-        self.current_location_icao = session_data['current_location_icao']
-        self.target_hospital_icao = session_data['target_hospital_icao']
-        self.messages = session_data.get('messages', [])
-        self.is_game_over = session_data.get('is_game_over', False)
-        self.outcome = session_data.get('outcome')
+    def to_bytes(self):
+        parts = [self.BINARY_HEADER.pack(self.BINARY_VERSION, self.current_health, self.total_time_minutes,
+                                         self.is_game_over, self.OUTCOME_CODES[self.outcome])]
+        strings = [self.current_location_icao or '', self.target_hospital_icao or '', self.start_location_icao or '']
+        strings.extend(self.clinics_used)
+        strings.extend(self.messages)
+        parts.append(self.BINARY_COUNTS.pack(len(self.clinics_used), len(self.messages)))
+        parts.append(self.BINARY_RNG.pack(self.rng.seed, self.rng.counter))
+        parts.append(self.BINARY_REVISION.pack(self.revision))
+        for text in strings:
+            encoded = text.encode('utf-8')
+            parts.append(self.BINARY_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b''.join(parts)
+
+    def load_from_bytes(self, payload):
+        version, health, total_time, is_game_over, outcome_code = self.BINARY_HEADER.unpack_from(payload)
+        offset = self.BINARY_HEADER.size
+        rng = None
+        revision = 0
+        if 2 <= version <= self.BINARY_VERSION:
+            clinic_count, message_count = self.BINARY_COUNTS.unpack_from(payload, offset)
+            offset += self.BINARY_COUNTS.size
+            fixed_count = 3
+            if version >= 3:
+                rng = GameRandom(*self.BINARY_RNG.unpack_from(payload, offset))
+                offset += self.BINARY_RNG.size
+            if version >= 4:
+                (revision,) = self.BINARY_REVISION.unpack_from(payload, offset)
+                offset += self.BINARY_REVISION.size
+        elif version == 1:
+            # Written before start airport and clinic visits were tracked; still readable from a shared store.
+            clinic_count = 0
+            (message_count,) = self.BINARY_LENGTH.unpack_from(payload, offset)
+            offset += self.BINARY_LENGTH.size
+            fixed_count = 2
+        else:
+            raise ValueError(f"Unsupported game state format version {version}.")
+
+        strings = []
+        for _ in range(fixed_count + clinic_count + message_count):
+            (length,) = self.BINARY_LENGTH.unpack_from(payload, offset)
+            offset += self.BINARY_LENGTH.size
+            strings.append(payload[offset:offset + length].decode('utf-8'))
+            offset += length
+
+        self.current_health = health
+        self.total_time_minutes = total_time
+        self.current_location_icao = strings[0] or None
+        self.target_hospital_icao = strings[1] or None
+        self.start_location_icao = (strings[2] or None) if fixed_count == 3 else None
+        self.clinics_used = strings[fixed_count:fixed_count + clinic_count]
+        self.messages = strings[fixed_count + clinic_count:]
+        # Older blobs get a fresh stream; their games were never reproducible anyway.
+        self.rng = rng if rng is not None else GameRandom(GameRandom.new_seed())
+        self.revision = revision
+        self.is_game_over = bool(is_game_over)
+        self.outcome = self.OUTCOMES_BY_CODE[outcome_code]
 
     def check_game_over(self):
         if self.current_health <= 0:
@@ -220,13 +602,16 @@ class GameState:
     def check_risk(self, risk_list):
         if not risk_list: return None
         for risk in risk_list:
-            if random.random() < risk['Probability']: return risk
+            if self.rng.random() < risk['Probability']: return risk
         return None
 
+    def apply_departure_risk(self, departure_risk):
+        self.total_time_minutes += departure_risk['TimePenalty']
+        self.current_health -= departure_risk['HealthPenalty']
+        return self.check_game_over()
+
     def get_flight_info(self, departure_icao, arrival_icao):
-        return next((conn for conn in self.data.interconnections if
-                     conn['Departure_Airport_ID'] == departure_icao and conn['Arrival_Airport_ID'] == arrival_icao),
-                    None)
+        return self.data.get_route(departure_icao, arrival_icao)
 
     def execute_healing(self):
         healing_data = self.data.airports[self.current_location_icao]
@@ -235,6 +620,7 @@ class GameState:
 
         self.total_time_minutes += int(round(time_cost))
         self.current_health = min(self.data.START_HEALTH, self.current_health + health_gain)
+        self.clinics_used.append(self.current_location_icao)
 
         self.messages.append(
             f"--- HEALING COMPLETE: Health +{health_gain:.2f} HP. Time Taken: {int(round(time_cost))} min. ---")
@@ -262,154 +648,509 @@ class GameState:
         return {
             'current_health': self.current_health, 'total_time_minutes': self.total_time_minutes,
             'current_location_icao': self.current_location_icao, 'target_hospital_icao': self.target_hospital_icao,
-            'messages': self.messages, 'is_game_over': self.is_game_over, 'outcome': self.outcome
+            'messages': self.messages, 'is_game_over': self.is_game_over, 'outcome': self.outcome,
+            'start_location_icao': self.start_location_icao, 'clinics_used': self.clinics_used,
+            'seed': self.rng.seed if self.rng is not None else None
         }
 
 
 class FlightToHealApp:
-
-    def __init__(self):
-        self.data_manager = GameData()
-        self.data_manager.load_from_database()
+    STATIC_MAX_AGE_SECONDS = 60
+    REFERENCE_REFRESH_SECONDS = 300
+    METRICS_ENABLED = True
+    MAX_BATCH_ACTIONS = 20
+    BATCH_RISK_POLICIES = ('stop', 'proceed', 'cancel')
+    ANALYTICS_CACHE_SECONDS = 30
+    NEARBY_DEFAULT_LIMIT = 10
+    NEARBY_MAX_LIMIT = 100
+    # Half the Earth's circumference; any larger radius already covers the whole globe.
+    NEARBY_MAX_RADIUS_KM = 20000.0
+    VIEWPORT_MAX_AIRPORTS = 2000
+    # None appends game events to the game_event table; a path writes segmented local log files instead.
+    EVENT_LOG_DIRECTORY = None
+    # Turn history lives in the event log; the game_state row is only rewritten when the game ends.
+    UPDATE_STATUS_EVERY_TURN = False
+    STATUS_PUSH_FLUSH_SECONDS = 0.05
+    # A stream rereads the shared state store this often to catch moves handled by another worker process.
+    STATUS_STREAM_POLL_SECONDS = 2.0
+    STATUS_STREAM_KEEPALIVE_SECONDS = 15.0
+    # Streams end after this long and the browser's EventSource reconnects, so no worker thread is held forever.
+    STATUS_STREAM_MAX_SECONDS = 600
+    STATUS_STREAM_HEADERS = (('Content-Type', 'text/event-stream; charset=utf-8'), ('Cache-Control', 'no-cache'),
+                             ('X-Accel-Buffering', 'no'))
+
+    def __init__(self, data_manager=None, state_store=None, metrics=None, event_log=None):
+        if data_manager is None:
+            data_manager = GameData()
+            data_manager.load_from_database()
+        self.data_manager = data_manager
+        self.metrics = metrics if metrics is not None else Metrics(enabled=self.METRICS_ENABLED)
+        self.status_writer = GameStatusWriter(self.data_manager, metrics=self.metrics)
+        self.analytics = GameAnalytics(self.data_manager, self.ANALYTICS_CACHE_SECONDS, metrics=self.metrics)
+        self.result_writer = GameResultWriter(self.analytics)
+        if event_log is None:
+            if self.EVENT_LOG_DIRECTORY:
+                event_log = GameEventLog(SegmentedFileEventSink(self.EVENT_LOG_DIRECTORY))
+            else:
+                event_log = GameEventLog(DatabaseEventSink(self.data_manager, metrics=self.metrics))
+        self.event_log = event_log
+        self._ensure_schema(self.analytics)
+        if hasattr(self.event_log.sink, 'ensure_schema'):
+            self._ensure_schema(self.event_log.sink)
+        self.status_hub = StatusHub(self.STATUS_PUSH_FLUSH_SECONDS)
+        self.refresher = ReferenceDataRefresher(self.data_manager, self.REFERENCE_REFRESH_SECONDS)
+        if self.REFERENCE_REFRESH_SECONDS:
+            self.refresher.start()
 
         self.app = Flask(__name__)
         self.app.secret_key = 'your_super_secret_key_here'
         self.app.permanent_session_lifetime = timedelta(minutes=60)
 
+        if state_store is None:
+            state_store = MemoryStateStore(self.app.permanent_session_lifetime.total_seconds())
+        self.state_store = state_store
+
         self._register_routes()
+        self._register_metrics()
 
     def _register_routes(self):
         self.app.route('/')(self.index)
         self.app.route('/api/get_airport_coords', methods=['GET'])(self.get_airport_coords)
+        self.app.route('/api/nearby', methods=['GET'])(self.get_nearby_airports)
+        self.app.route('/api/airports_in_view', methods=['GET'])(self.get_airports_in_view)
+        self.app.route('/api/airport_tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])(self.get_airport_tile)
+        self.app.route('/api/airport_coords_stream', methods=['GET'])(self.get_airport_coords_stream)
         self.app.route('/api/start_game', methods=['POST'])(self.start_game)
         self.app.route('/api/risk_check', methods=['POST'])(self.check_for_risk)
         self.app.route('/api/take_action', methods=['POST'])(self.take_action)
+        self.app.route('/api/batch_actions', methods=['POST'])(self.batch_actions)
+        self.app.route('/api/optimal_route', methods=['GET'])(self.get_optimal_route)
+        self.app.route('/api/status_stream', methods=['GET'])(self.get_status_stream)
+        self.app.route('/api/game_events', methods=['GET'])(self.get_game_events)
+        self.app.route('/api/leaderboard', methods=['GET'])(self.get_leaderboard)
+        self.app.route('/api/stats/pairs', methods=['GET'])(self.get_pair_stats)
+        self.app.route('/api/stats/clinics', methods=['GET'])(self.get_clinic_stats)
+        self.app.route('/metrics', methods=['GET'])(self.get_metrics)
+
+    def _register_metrics(self):
+        if not self.metrics.enabled:
+            return
+
+        self.metrics.describe('flight_to_heal_http_request_duration_seconds', 'histogram',
+                              'Request latency per endpoint.')
+        self.metrics.describe('flight_to_heal_phase_duration_seconds', 'histogram',
+                              'Time spent in each phase of a request.')
+        self.metrics.describe('flight_to_heal_db_query_duration_seconds', 'histogram',
+                              'Database call latency per query.')
+        self.metrics.describe('flight_to_heal_db_rows_written_total', 'counter', 'Rows written per table.')
+        self.metrics.describe('flight_to_heal_game_state_bytes', 'histogram',
+                              'Serialized game state size per save.', buckets=SIZE_BUCKETS)
+        self.metrics.describe('flight_to_heal_games_finished_total', 'counter', 'Finished games per outcome.')
+        self.metrics.add_collector(self._collect_component_metrics)
+
+        self.app.before_request(self._start_request_timer)
+        self.app.after_request(self._observe_request)
+
+    def _start_request_timer(self):
+        g.request_started = time.perf_counter()
+
+    def _observe_request(self, response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            self.metrics.observe('flight_to_heal_http_request_duration_seconds', time.perf_counter() - started,
+                                 (('endpoint', endpoint), ('method', request.method),
+                                  ('status', response.status_code)))
+        return response
+
+    @staticmethod
+    def _ensure_schema(component):
+        # Tables are created on first use anyway; trying at startup surfaces a missing table or grant right away.
+        try:
+            component.ensure_schema()
+        except mysql.connector.Error as error:
+            logger.warning("Could not check the tables of %s: %s", type(component).__name__, error)
+
+    def _phase(self, name):
+        return self.metrics.timer('flight_to_heal_phase_duration_seconds', (('phase', name),))
+
+    def _log_event(self, event_type, **payload):
+        if 'game_id' in session:
+            self.event_log.append(session['game_id'], event_type, **payload)
+
+    def _on_game_finished(self, state: GameState):
+        self.metrics.inc('flight_to_heal_games_finished_total', (('outcome', state.outcome),))
+        if 'game_id' not in session:
+            return
+        self._log_event('outcome', outcome=state.outcome, health=round(state.current_health, 2),
+                        time_total=state.total_time_minutes)
+        # Recorded in the background: the result transaction has no business on the player's last move.
+        self.result_writer.submit(session['game_id'], state)
+
+    def _collect_component_metrics(self):
+        samples = []
+        pool = self.data_manager.pool.stats()
+        for name in ('open', 'in_use', 'idle'):
+            samples.append(('flight_to_heal_db_pool_connections', 'gauge', 'Pooled database connections by state.',
+                            (('state', name),), pool[name]))
+        for name in ('checkouts', 'created', 'closed', 'waits', 'exhausted', 'health_check_failures'):
+            samples.append(('flight_to_heal_db_pool_events_total', 'counter', 'Connection pool events.',
+                            (('event', name),), pool[name]))
+        samples.append(('flight_to_heal_db_pool_wait_seconds_total', 'counter',
+                        'Time spent waiting for a pooled connection.', (), pool['wait_seconds']))
+
+        writer = self.status_writer.stats()
+        samples.append(('flight_to_heal_status_writer_pending', 'gauge', 'Game status rows waiting to be written.',
+                        (), writer['pending']))
+        for name in ('submitted', 'coalesced', 'backpressure_waits', 'sync_writes', 'batches', 'written',
+                     'failed_batches', 'retried', 'dropped'):
+            samples.append(('flight_to_heal_status_writer_events_total', 'counter', 'Write-behind queue events.',
+                            (('event', name),), writer[name]))
+
+        analytics = self.analytics.stats()
+        for name in ('recorded', 'duplicates', 'cache_hits', 'cache_misses', 'invalidations'):
+            samples.append(('flight_to_heal_analytics_events_total', 'counter', 'Game result analytics events.',
+                            (('event', name),), analytics[name]))
+        results = self.result_writer.stats()
+        samples.append(('flight_to_heal_result_writer_pending', 'gauge', 'Finished games waiting to be recorded.',
+                        (), results['pending']))
+        for name in ('submitted', 'sync_writes', 'written', 'failed', 'retried', 'dropped'):
+            samples.append(('flight_to_heal_result_writer_events_total', 'counter', 'Game result writer events.',
+                            (('event', name),), results[name]))
+
+        events = self.event_log.stats()
+        samples.append(('flight_to_heal_event_log_pending', 'gauge', 'Game events waiting to be written.',
+                        (), events['pending']))
+        for name in ('appended', 'batches', 'written', 'sync_writes', 'failed_batches', 'dropped'):
+            samples.append(('flight_to_heal_event_log_events_total', 'counter', 'Game event log events.',
+                            (('event', name),), events[name]))
+
+        push = self.status_hub.stats()
+        samples.append(('flight_to_heal_status_stream_subscribers', 'gauge', 'Open game status streams.',
+                        (), push['subscribers']))
+        for name in ('published', 'coalesced', 'frames', 'deliveries', 'overflows', 'subscribed'):
+            samples.append(('flight_to_heal_status_push_events_total', 'counter', 'Game status push events.',
+                            (('event', name),), push[name]))
+
+        samples.append(('flight_to_heal_reference_data_version', 'gauge', 'Loaded reference data version.',
+                        (), self.data_manager.data_version))
+        return samples
+
+    def _reference_data(self):
+        # Pinned once per request so a concurrent reload cannot change the data halfway through a handler.
+        if 'reference_data' not in g:
+            g.reference_data = self.data_manager.pinned()
+        return g.reference_data
 
     def _get_current_state(self):
-        if 'game_state' not in session:
+        if 'game_id' not in session:
             return None
-        state = GameState(self.data_manager)
-        state.load_from_session(session['game_state'])
+        with self._phase('state_load'):
+            payload = self.state_store.get(session['game_id'])
+            if payload is None:
+                return None
+            state = GameState(self._reference_data())
+            state.load_from_bytes(payload)
+        if self.status_hub.has_subscribers(session['game_id']):
+            # Deltas are only built for watched games; a stream that opens mid-request catches up from its store poll.
+            g.status_before = self._status_fields(state)
         return state
 
-    def _get_current_status_json(self, state: GameState):
-        minutes_remaining = self.data_manager.MAXIMUM_TIME_MINUTES - state.total_time_minutes
-        current_location_data = self.data_manager.airports[state.current_location_icao]
-        target_location_data = self.data_manager.airports[state.target_hospital_icao]
-
-        available_flights = []
-        flight_id = 1
-        for connection in self.data_manager.interconnections:
-            if connection['Departure_Airport_ID'] == state.current_location_icao:
-                health_cost = connection['Time'] * connection['Health_Cost_Per_Minute']
-                available_flights.append({
-                    'ID': flight_id, 'Destination_ICAO': connection['Arrival_Airport_ID'],
-                    'Destination_Name': self.data_manager.airports[connection['Arrival_Airport_ID']]['Name'],
-                    'Time': connection['Time'], 'Health_Loss': round(health_cost, 2),
-                })
-                flight_id += 1
+    def _save_state(self, state: GameState):
+        with self._phase('state_save'):
+            state.revision += 1
+            payload = state.to_bytes()
+            self.state_store.set(session['game_id'], payload)
+        self.metrics.observe('flight_to_heal_game_state_bytes', len(payload))
+        if 'status_before' in g and self.status_hub.has_subscribers(session['game_id']):
+            # Published even when empty, so the game's streams know this payload is already accounted for.
+            self.status_hub.publish(session['game_id'], self._status_delta(g.status_before, state), payload,
+                                    state.revision)
+            g.status_before = self._status_fields(state)
+
+    @staticmethod
+    def _status_fields(state: GameState):
+        # The message list itself, not a copy: the delta pushes whatever this request appended to it.
+        return (state.current_health, state.total_time_minutes, state.current_location_icao, state.is_game_over,
+                state.outcome, state.messages, len(state.messages))
+
+    def _status_delta(self, before, state: GameState):
+        # The parts of the status payload that changed since `before`; the option list only travels with a move.
+        health, total_time, location, is_game_over, outcome, messages, message_count = before
+        data = state.data
+        status = {}
+        if round(state.current_health, 2) != round(health, 2):
+            status['health'] = round(state.current_health, 2)
+        if state.total_time_minutes != total_time:
+            status['time_total'] = state.total_time_minutes
+            status['time_remaining'] = data.MAXIMUM_TIME_MINUTES - state.total_time_minutes
+        delta = {}
+        if state.current_location_icao != location:
+            airport = data.airports[state.current_location_icao]
+            status.update({'current_icao': state.current_location_icao, 'current_name': airport['Name'],
+                           'is_clinic': airport.get('Clinic', False),
+                           'current_coords': [airport['Latitude'], airport['Longitude']]})
+            delta['options'] = data.get_flight_options_json(state.current_location_icao)
+        if status:
+            delta['status'] = status
+        # Handlers start a fresh list for their own messages, so a replaced list is new in full, repeats included.
+        new_messages = state.messages[message_count:] if state.messages is messages else state.messages
+        if new_messages:
+            delta['messages'] = list(new_messages)
+        if state.is_game_over != is_game_over or state.outcome != outcome:
+            delta.update({'game_over': state.is_game_over, 'outcome': state.outcome})
+        return delta
+
+    def _stream_ack(self, state: GameState, extra=None):
+        # With ?stream=1 the client follows /api/status_stream, so the reply carries only what the stream does not.
+        return jsonify(dict(extra or {}, accepted=True, game_over=state.is_game_over, outcome=state.outcome))
+
+    def _get_current_status_json(self, state: GameState, extra=None):
+        with self._phase('status_encode'):
+            return self._encode_status(state, extra)
+
+    def _encode_status(self, state: GameState, extra=None):
+        data = state.data
+        minutes_remaining = data.MAXIMUM_TIME_MINUTES - state.total_time_minutes
+        current_location_data = data.airports[state.current_location_icao]
+        target_location_data = data.airports[state.target_hospital_icao]
+
+        available_flights = data.get_flight_options_json(state.current_location_icao)
 
         messages_to_send = state.messages.copy()
         state.messages = []
 
-        return jsonify({
-            'status': {
+        # The option list is pre-encoded per airport at load time and spliced in as-is.
+        body = b''.join([
+            b'{"status":', encode_json({
                 'health': round(state.current_health, 2), 'time_total': state.total_time_minutes,
                 'time_remaining': minutes_remaining, 'current_icao': state.current_location_icao,
                 'current_name': current_location_data['Name'], 'target_icao': state.target_hospital_icao,
-                'target_name': target_location_data['Name'], 'is_clinic': current_location_data.get('Clinic', False)
-            },
-            'options': available_flights, 'messages': messages_to_send,
-            'game_over': state.is_game_over, 'outcome': state.outcome
-        })
+                'target_name': target_location_data['Name'], 'is_clinic': current_location_data.get('Clinic', False),
+                'current_coords': [current_location_data['Latitude'], current_location_data['Longitude']],
+                'target_coords': [target_location_data['Latitude'], target_location_data['Longitude']],
+            }),
+            b',"options":', available_flights, b',"messages":', encode_json(messages_to_send),
+            b',"game_over":', encode_json(state.is_game_over), b',"outcome":', encode_json(state.outcome),
+            b''.join(b',' + encode_json(key) + b':' + encode_json(value) for key, value in (extra or {}).items()),
+            b'}',
+        ])
+        return self.app.response_class(body, mimetype='application/json')
+
+    def _encoded_response(self, payload: EncodedPayload):
+        encoding = request.accept_encodings.best_match(payload.encodings, default='identity')
+        etag = payload.etag(encoding)
+
+        if request.if_none_match.contains(etag):
+            response = self.app.response_class(status=304)
+        else:
+            response = self.app.response_class(payload.bodies[encoding], mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.STATIC_MAX_AGE_SECONDS}'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Data-Version'] = str(payload.data_version)
+        return response
 
     def _update_game_status_in_db(self, state: GameState):
         if 'game_id' not in session:
             return
+        if not state.is_game_over and not self.UPDATE_STATUS_EVERY_TURN:
+            return
 
         game_status_text = 'Active'
         if state.is_game_over:
             game_status_text = 'Won' if state.outcome == 'SUCCESS' else 'Lost'
 
-        conn = None
-        try:
-            conn = self.data_manager._get_db_connection()
-            cursor = conn.cursor()
-
-            sql = """
-                  UPDATE game_state
-                  SET Current_Patient_Health  = %s,
-                      Total_Game_Time_Minutes = %s,
-                      Current_Location_ID     = %s,
-                      Game_Status             = %s
-                  WHERE Game_ID = %s \
-                  """
-
-            cursor.execute(sql, (
-                round(state.current_health, 2),
-                state.total_time_minutes,
-                state.current_location_icao,
-                game_status_text,
-                session['game_id']
-            ))
-            conn.commit()
-        except mysql.connector.Error:
-            pass
-        finally:
-            if conn:
-                conn.close()
+        self.status_writer.submit(session['game_id'], (
+            round(state.current_health, 2),
+            state.total_time_minutes,
+            state.current_location_icao,
+            game_status_text,
+        ))
 
     def index(self):
         return render_template('index.html')
 
     def get_airport_coords(self):
-        coords_map = {}
-        for icao, data in self.data_manager.airports.items():
-            coords_map[icao] = [data['Latitude'], data['Longitude']]
-        return jsonify(coords_map)
+        return self._encoded_response(self.data_manager.airport_coords_payload)
+
+    @staticmethod
+    def _flag_arg(name):
+        return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def _float_args(*names):
+        # nan and inf parse as floats but are no coordinates; they fail like any other malformed number.
+        values = tuple(float(request.args[name]) for name in names)
+        if not all(math.isfinite(value) for value in values):
+            raise ValueError(f"Non-finite value among {names}.")
+        return values
+
+    def get_nearby_airports(self):
+        # Nearest airports (or clinics) to an airport or a coordinate; radius_km bounds the search,
+        # otherwise the `limit` nearest are returned.
+        data = self._reference_data()
+        icao = request.args.get('icao')
+        try:
+            if icao is not None:
+                if icao not in data.airports:
+                    return jsonify({'error': 'Unknown airport.'}), 400
+                latitude, longitude = data.airports[icao]['Latitude'], data.airports[icao]['Longitude']
+            else:
+                latitude, longitude = self._float_args('lat', 'lon')
+                if not -90.0 <= latitude <= 90.0:
+                    raise ValueError("Latitude out of range.")
+            limit = max(1, min(self.NEARBY_MAX_LIMIT, int(request.args.get('limit', self.NEARBY_DEFAULT_LIMIT))))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Pass "icao", or numeric "lat" (-90 to 90) and "lon".'}), 400
+        radius_km = None
+        if 'radius_km' in request.args:
+            try:
+                (radius_km,) = self._float_args('radius_km')
+                valid = 0.0 < radius_km <= self.NEARBY_MAX_RADIUS_KM
+            except ValueError:
+                valid = False
+            if not valid:
+                return jsonify({'error': f'"radius_km" must be a number above 0 and at most '
+                                         f'{self.NEARBY_MAX_RADIUS_KM:g}.'}), 400
+
+        index = data.clinic_spatial_index if self._flag_arg('clinic_only') else data.spatial_index
+        exclude = (icao,) if icao is not None else ()
+        if radius_km is not None:
+            found = [item for item in index.within(latitude, longitude, radius_km) if item[0] not in exclude][:limit]
+        else:
+            found = index.nearest(latitude, longitude, limit, exclude=exclude)
+
+        return jsonify({
+            'origin': {'icao': icao, 'latitude': latitude, 'longitude': longitude},
+            'airports': [{
+                'icao': found_icao, 'name': data.airports[found_icao]['Name'],
+                'latitude': data.airports[found_icao]['Latitude'], 'longitude': data.airports[found_icao]['Longitude'],
+                'clinic': bool(data.airports[found_icao].get('Clinic', False)), 'distance_km': round(distance_km, 1),
+            } for found_icao, distance_km in found],
+        })
+
+    @staticmethod
+    def _normalize_longitudes(west, east):
+        if east - west >= 360.0:
+            return -180.0, 180.0
+        # Leaflet reports longitudes past +-180 once the map is panned around the world.
+        return (west + 180.0) % 360.0 - 180.0, (east + 180.0) % 360.0 - 180.0
+
+    def _stream_coords(self, bounds, tag):
+        # Streams airport coordinates inside bounds straight from the spatial index, one chunk at a time,
+        # so memory stays flat however many airports match. Bodies are keyed by data version for caching.
+        data = self._reference_data()
+        output_format = request.args.get('format', 'json')
+        if output_format not in coord_stream.FORMATS:
+            return jsonify({'error': f'Unknown format. Use one of {", ".join(coord_stream.FORMATS)}.'}), 400
+        clinic_only = self._flag_arg('clinic_only')
+
+        response = self.app.response_class(status=304)
+        etag = f'v{data.data_version}-{tag}-{output_format}{"-clinics" if clinic_only else ""}'
+        if not request.if_none_match.contains(etag):
+            index = data.clinic_spatial_index if clinic_only else data.spatial_index
+            airports = data.airports
+            records = ((icao, latitude, longitude, bool(airports[icao].get('Clinic', False)))
+                       for icao, latitude, longitude in index.iter_box(*bounds))
+            encoder = coord_stream.iter_delta if output_format == 'delta' else coord_stream.iter_json
+            response = self.app.response_class(encoder(records), mimetype=coord_stream.FORMATS[output_format])
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f'public, max-age={self.STATIC_MAX_AGE_SECONDS}'
+        response.headers['X-Data-Version'] = str(data.data_version)
+        return response
+
+    def get_airport_tile(self, z, x, y):
+        if z > coord_stream.MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Tile out of range.'}), 404
+        return self._stream_coords(coord_stream.tile_bounds(z, x, y), f'{z}-{x}-{y}')
+
+    def get_airport_coords_stream(self):
+        names = ('south', 'west', 'north', 'east')
+        if not any(name in request.args for name in names):
+            return self._stream_coords((-90.0, -180.0, 90.0, 180.0), 'all')
+        try:
+            south, west, north, east = self._float_args(*names)
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Pass numeric "south", "west", "north" and "east", or none of them.'}), 400
+        west, east = self._normalize_longitudes(west, east)
+        return self._stream_coords((south, west, north, east), f'{south}-{west}-{north}-{east}')
+
+    def get_airports_in_view(self):
+        # Airports inside the map viewport, as {icao: [lat, lon, clinic]} so the map only loads what it shows.
+        data = self._reference_data()
+        try:
+            south, west, north, east = self._float_args('south', 'west', 'north', 'east')
+            limit = max(1, min(self.VIEWPORT_MAX_AIRPORTS,
+                               int(request.args.get('limit', self.VIEWPORT_MAX_AIRPORTS))))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'Pass numeric "south", "west", "north" and "east".'}), 400
+
+        west, east = self._normalize_longitudes(west, east)
+        index = data.clinic_spatial_index if self._flag_arg('clinic_only') else data.spatial_index
+        icaos = index.in_box(south, west, north, east, limit + 1)
+        airports = {
+            found_icao: [data.airports[found_icao]['Latitude'], data.airports[found_icao]['Longitude'],
+                         bool(data.airports[found_icao].get('Clinic', False))]
+            for found_icao in icaos[:limit]
+        }
+        return jsonify({'airports': airports, 'truncated': len(icaos) > limit, 'data_version': data.data_version})
 
     def start_game(self):
         try:
             data = request.get_json()
             player_name = data.get('player_name', 'Unknown Player')
             player_age = int(data.get('player_age', 0))
+            # An explicit seed makes the whole game reproducible from the seed plus its action list.
+            seed = data.get('seed')
+            if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+                return jsonify({'error': 'Seed must be a non-negative integer.'}), 400
 
-            initial_state_object = GameState(self.data_manager)
+            initial_state_object = GameState(self._reference_data(), seed)
             initial_state_dict = initial_state_object.initialize()
 
-            conn = self.data_manager._get_db_connection()
-            cursor = conn.cursor()
-
-            sql = """
-                  INSERT INTO game_state
-                  (Current_Patient_Health, Total_Game_Time_Minutes, Max_Allowed_Time_Minutes,
-                   Current_Location_ID, Target_Hospital_ID, Game_Status, Player_Name, Player_Age)
-                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s) \
-                  """
-
-            cursor.execute(sql, (
-                initial_state_dict['current_health'],
-                initial_state_dict['total_time_minutes'],
-                self.data_manager.MAXIMUM_TIME_MINUTES,
-                initial_state_dict['current_location_icao'],
-                initial_state_dict['target_hospital_icao'],
-                'Active',
-                player_name,
-                player_age
-            ))
-
-            game_id = cursor.lastrowid
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self.metrics.timer('flight_to_heal_db_query_duration_seconds', (('query', 'insert_game'),)), \
+                    self.data_manager._get_db_connection() as conn:
+                cursor = conn.cursor()
+
+                sql = """
+                      INSERT INTO game_state
+                      (Current_Patient_Health, Total_Game_Time_Minutes, Max_Allowed_Time_Minutes,
+                       Current_Location_ID, Target_Hospital_ID, Game_Status, Player_Name, Player_Age)
+                      VALUES (%s, %s, %s, %s, %s, %s, %s, %s) \
+                      """
+
+                cursor.execute(sql, (
+                    initial_state_dict['current_health'],
+                    initial_state_dict['total_time_minutes'],
+                    self.data_manager.MAXIMUM_TIME_MINUTES,
+                    initial_state_dict['current_location_icao'],
+                    initial_state_dict['target_hospital_icao'],
+                    'Active',
+                    player_name,
+                    player_age
+                ))
+
+                game_id = cursor.lastrowid
+                conn.commit()
+                cursor.close()
 
             session.permanent = True
-            session['game_state'] = initial_state_dict
             session['game_id'] = game_id
+            session.pop('game_state', None)
             session.pop('pending_flight', None)
+            self._save_state(initial_state_object)
+            self._log_event('start', seed=initial_state_object.rng.seed,
+                            start_icao=initial_state_object.start_location_icao,
+                            target_icao=initial_state_object.target_hospital_icao,
+                            health=initial_state_object.current_health,
+                            time_total=initial_state_object.total_time_minutes)
 
-            current_state = self._get_current_state()
-            return self._get_current_status_json(current_state)
+            return self._get_current_status_json(initial_state_object)
 
         except mysql.connector.Error as db_error:
             return jsonify(
@@ -417,6 +1158,94 @@ class FlightToHealApp:
         except Exception as e:
             return jsonify({'error': str(e), 'internal_error': 'Initialization Failed'}), 500
 
+    @staticmethod
+    def _risk_details(departure_risk):
+        return {
+            'name': departure_risk['Name'],
+            'time_penalty': departure_risk['TimePenalty'],
+            'health_penalty': round(departure_risk['HealthPenalty'], 2)
+        }
+
+    def _apply_departure_risk(self, state: GameState, target_icao):
+        with self._phase('route_lookup'):
+            chosen_flight = state.get_flight_info(state.current_location_icao, target_icao)
+
+        if not chosen_flight:
+            return None, None
+
+        departure_risk = state.check_risk(state.data.departure_risks)
+
+        # Logged whether or not a risk fired, so the event list doubles as the action list for a seeded replay.
+        self._log_event('risk', fired=departure_risk is not None, target_icao=target_icao,
+                        name=departure_risk['Name'] if departure_risk else None,
+                        time_penalty=departure_risk['TimePenalty'] if departure_risk else 0,
+                        health_penalty=departure_risk['HealthPenalty'] if departure_risk else 0.0)
+
+        if departure_risk:
+            was_over = state.is_game_over
+            if state.apply_departure_risk(departure_risk) and not was_over:
+                self._on_game_finished(state)
+
+            session['pending_flight'] = {
+                'target_icao': target_icao,
+                'time': chosen_flight['Time'],
+                'health_cost_per_minute': chosen_flight['Health_Cost_Per_Minute']
+            }
+
+        return chosen_flight, departure_risk
+
+    def _apply_action(self, state: GameState, action_type, target_icao=None):
+        was_over = state.is_game_over
+        state_changed = False
+
+        if action_type == 'heal':
+            if not state.data.airports[state.current_location_icao].get('Clinic', False):
+                state.messages.append("🚫 No clinic here. Cannot heal.")
+            else:
+                health_before, time_before = state.current_health, state.total_time_minutes
+                state.execute_healing()
+                self._log_event('heal', icao=state.current_location_icao,
+                                time=state.total_time_minutes - time_before,
+                                health_gain=state.current_health - health_before)
+                state_changed = True
+
+        elif action_type == 'fly_execute':
+            target_icao = session.pop('pending_flight', {}).get('target_icao') or target_icao
+
+            if not target_icao:
+                state.messages.append("🚫 Error: Flight target missing for execution.")
+            else:
+                with self._phase('route_lookup'):
+                    chosen_flight = state.get_flight_info(state.current_location_icao, target_icao)
+
+                if not chosen_flight:
+                    state.messages.append("🚫 Error: Invalid flight option during execution.")
+                else:
+                    flight_info = {
+                        'Destination_ICAO': target_icao, 'Time': chosen_flight['Time'],
+                        'Health_Loss': chosen_flight['Health_Loss'],
+                    }
+                    from_icao = state.current_location_icao
+                    state.execute_flight(flight_info)
+                    self._log_event('flight', from_icao=from_icao, to_icao=target_icao, time=chosen_flight['Time'],
+                                    health_loss=chosen_flight['Health_Loss'],
+                                    arrived=state.current_location_icao == target_icao)
+                    state_changed = True
+
+        elif action_type == 'fly_cancel':
+            state.messages.append("🛫 Flight cancelled due to departure risk. Patient stabilized locally.")
+            session.pop('pending_flight', None)
+            self._log_event('cancel', icao=state.current_location_icao)
+            state_changed = True
+
+        else:
+            state.messages.append("🚫 Invalid action.")
+
+        if state.is_game_over and not was_over:
+            self._on_game_finished(state)
+
+        return state_changed
+
     def check_for_risk(self):
         state = self._get_current_state()
         if not state:
@@ -425,40 +1254,32 @@ class FlightToHealApp:
         data = request.get_json()
         target_icao = data.get('target_icao')
 
-        chosen_flight = state.get_flight_info(state.current_location_icao, target_icao)
+        # Messages stored with the state were already delivered with the previous reply.
+        state.messages = []
+        chosen_flight, departure_risk = self._apply_departure_risk(state, target_icao)
 
         if not chosen_flight:
             return jsonify({'error': 'Invalid flight option.'}), 400
 
-        departure_risk = state.check_risk(self.data_manager.departure_risks)
-
         if departure_risk:
-            state.total_time_minutes += departure_risk['TimePenalty']
-            state.current_health -= departure_risk['HealthPenalty']
-
-            is_over = state.check_game_over()
+            is_over = state.is_game_over
 
             if 'game_id' in session:
                 self._update_game_status_in_db(state)
 
-            session['game_state'] = state.to_dict()
-            session['pending_flight'] = {
-                'target_icao': target_icao,
-                'time': chosen_flight['Time'],
-                'health_cost_per_minute': chosen_flight['Health_Cost_Per_Minute']
-            }
+            self._save_state(state)
 
-            return jsonify({
+            response = {
                 'risk_found': True,
-                'risk_details': {
-                    'name': departure_risk['Name'],
-                    'time_penalty': departure_risk['TimePenalty'],
-                    'health_penalty': round(departure_risk['HealthPenalty'], 2)
-                },
+                'risk_details': self._risk_details(departure_risk),
                 'game_over_after_risk': is_over,
-                'current_status': self._get_current_status_json(state).json
-            })
+            }
+            if not self._flag_arg('stream'):
+                response['current_status'] = self._get_current_status_json(state).json
+            return jsonify(response)
         else:
+            # Nothing changed but the game's random stream advanced; persist it so the next check draws fresh.
+            self._save_state(state)
             return jsonify({
                 'risk_found': False,
                 'target_icao': target_icao
@@ -476,49 +1297,219 @@ class FlightToHealApp:
         action_type = data.get('action')
 
         state.messages = []
-        state_changed = False
+        state_changed = self._apply_action(state, action_type, data.get('target_icao'))
 
-        if action_type == 'heal':
-            if not self.data_manager.airports[state.current_location_icao].get('Clinic', False):
-                state.messages.append("🚫 No clinic here. Cannot heal.")
-            else:
-                state.execute_healing()
-                state_changed = True
+        self._save_state(state)
 
-        elif action_type == 'fly_execute':
-            target_icao = session.pop('pending_flight', {}).get('target_icao') or data.get('target_icao')
+        if state_changed or state.is_game_over:
+            self._update_game_status_in_db(state)
 
-            if not target_icao:
-                state.messages.append("🚫 Error: Flight target missing for execution.")
-            else:
-                chosen_flight = state.get_flight_info(state.current_location_icao, target_icao)
+        if self._flag_arg('stream'):
+            return self._stream_ack(state)
+        return self._get_current_status_json(state)
+
+    def batch_actions(self):
+        state = self._get_current_state()
+        if not state:
+            return jsonify({'error': 'Game not started. Please call /api/start_game'}), 400
+
+        data = request.get_json()
+        actions = data.get('actions')
+        risk_policy = data.get('risk_policy', 'stop')
+
+        if not isinstance(actions, list) or not actions or len(actions) > self.MAX_BATCH_ACTIONS:
+            return jsonify({'error': f'Send between 1 and {self.MAX_BATCH_ACTIONS} actions.'}), 400
+        if risk_policy not in self.BATCH_RISK_POLICIES:
+            return jsonify({'error': f'Unknown risk policy. Use one of {", ".join(self.BATCH_RISK_POLICIES)}.'}), 400
 
+        state.messages = []
+        state_changed = False
+        results = []
+        pending_risk = None
+
+        for step in actions:
+            if state.is_game_over or pending_risk:
+                break
+            action_type = step.get('action') if isinstance(step, dict) else None
+            target_icao = step.get('target_icao') if isinstance(step, dict) else None
+            result = {'action': action_type, 'target_icao': target_icao, 'applied': True, 'risk': None}
+            results.append(result)
+
+            if action_type in ('risk_check', 'fly'):
+                chosen_flight, departure_risk = self._apply_departure_risk(state, target_icao)
                 if not chosen_flight:
-                    state.messages.append("🚫 Error: Invalid flight option during execution.")
-                else:
-                    health_cost = chosen_flight['Time'] * chosen_flight['Health_Cost_Per_Minute']
-                    flight_info = {
-                        'Destination_ICAO': target_icao, 'Time': chosen_flight['Time'], 'Health_Loss': health_cost,
-                    }
-                    state.execute_flight(flight_info)
+                    result['applied'] = False
+                    state.messages.append("🚫 Error: Invalid flight option.")
+                    break
+                if departure_risk:
                     state_changed = True
+                    result['risk'] = self._risk_details(departure_risk)
+                    if state.is_game_over:
+                        break
+                    if risk_policy == 'stop':
+                        pending_risk = result['risk']
+                        break
+                    if risk_policy == 'cancel':
+                        state_changed |= self._apply_action(state, 'fly_cancel')
+                        continue
+                if action_type == 'fly':
+                    state_changed |= self._apply_action(state, 'fly_execute', target_icao)
+            else:
+                state_changed |= self._apply_action(state, action_type, target_icao)
 
-        elif action_type == 'fly_cancel':
-            state.messages.append("🛫 Flight cancelled due to departure risk. Patient stabilized locally.")
-            session.pop('pending_flight', None)
-            state_changed = True
+        # One state save and one persistence write for the whole batch.
+        self._save_state(state)
+        if state_changed or state.is_game_over:
+            self._update_game_status_in_db(state)
+
+        extra = {
+            'results': results,
+            'risk_pending': pending_risk is not None,
+            'risk_details': pending_risk,
+            'actions_skipped': len(actions) - len(results),
+        }
+        if self._flag_arg('stream'):
+            return self._stream_ack(state, extra)
+        return self._get_current_status_json(state, extra=extra)
+
+    def get_optimal_route(self):
+        data = self._reference_data()
+        state = self._get_current_state()
+        start_icao = request.args.get('from')
+        target_icao = request.args.get('to')
+
+        if start_icao is None or target_icao is None:
+            if not state:
+                return jsonify({'error': 'Game not started. Pass "from" and "to" airports.'}), 400
+            target_icao = target_icao or state.target_hospital_icao
 
+        if start_icao is None:
+            start_icao = state.current_location_icao
+            health, elapsed = state.current_health, state.total_time_minutes
         else:
-            state.messages.append("🚫 Invalid action.")
+            health, elapsed = data.START_HEALTH, 0
 
-        session['game_state'] = state.to_dict()
+        if start_icao not in data.airports or target_icao not in data.airports:
+            return jsonify({'error': 'Unknown airport.'}), 400
 
-        if state_changed or state.is_game_over:
-            self._update_game_status_in_db(state)
+        routes = data.route_solver.solve(start_icao, target_icao, health, elapsed)
+        return jsonify({
+            'start_icao': start_icao, 'target_icao': target_icao,
+            'winnable': bool(routes), 'routes': routes,
+        })
 
-        return self._get_current_status_json(state)
+    def get_status_stream(self):
+        # Server-Sent Events for the current game: the full status once, then only what each move changed.
+        stream = self._open_status_stream()
+        if stream is None:
+            return jsonify({'error': 'Game not started.'}), 400
+        return self.app.response_class(stream, headers=list(self.STATUS_STREAM_HEADERS))
+
+    def open_status_stream(self, environ):
+        # For front ends that drive streams on their own event loop (asgi.py): the request's StatusStream, or None
+        # to serve the request through the app as usual, which then answers with the error.
+        with self.app.request_context(environ):
+            return self._open_status_stream()
+
+    def _open_status_stream(self):
+        if 'game_id' not in session:
+            return None
+        game_id = session['game_id']
+        # Subscribed before the state is read, so a move saved in between still arrives as a delta.
+        subscription = self.status_hub.subscribe(game_id)
+        payload = self.state_store.get(game_id)
+        if payload is None:
+            subscription.close()
+            return None
+        try:
+            frame, finished, _ = self._status_frame(payload, keep_messages=False)
+        except Exception:
+            subscription.close()
+            raise
+        # The stream outlives the request context, so it only touches the store, the hub and the reference data.
+        return StatusStream(subscription, frame, payload, finished, lambda: self.state_store.get(game_id),
+                            lambda stored: self._status_frame(stored, keep_messages=True),
+                            self.STATUS_STREAM_POLL_SECONDS, self.STATUS_STREAM_KEEPALIVE_SECONDS,
+                            self.STATUS_STREAM_MAX_SECONDS)
+
+    def _status_frame(self, payload, keep_messages):
+        state = GameState(self.data_manager.pinned())
+        state.load_from_bytes(payload)
+        if not keep_messages:
+            state.messages = []
+        return format_event('status', self._encode_status(state).get_data()), state.is_game_over, state.revision
+
+    def get_game_events(self):
+        # History of the current game; with ?step=N also the state rebuilt from the first N events.
+        if 'game_id' not in session:
+            return jsonify({'error': 'Game not started.'}), 400
+        step = request.args.get('step', type=int)
+        try:
+            events = self.event_log.read(session['game_id'])
+        except mysql.connector.Error as db_error:
+            return jsonify(
+                {'error': 'Database error: Failed to load game events.', 'internal_error': str(db_error)}), 500
+
+        response = {'game_id': session['game_id'], 'events': events}
+        if step is not None:
+            response['state'] = replay_events(GameState(self._reference_data()), events, step).to_dict()
+        return jsonify(response)
+
+    @staticmethod
+    def _page_args():
+        # Keyset paging: "after" is the sort key of the last row of the previous page, returned as next_after.
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after') or None
+        return limit, after
+
+    def get_leaderboard(self):
+        limit, after = self._page_args()
+        if after is not None:
+            minutes, _, game_id = after.partition(':')
+            if not minutes.isdigit() or not game_id.isdigit():
+                return jsonify({'error': 'Invalid "after" cursor.'}), 400
+            after = (int(minutes), int(game_id))
+        try:
+            return jsonify(self.analytics.leaderboard(limit, after))
+        except mysql.connector.Error as db_error:
+            return jsonify(
+                {'error': 'Database error: Failed to load leaderboard.', 'internal_error': str(db_error)}), 500
+
+    def get_pair_stats(self):
+        limit, after = self._page_args()
+        if after is not None:
+            start_icao, separator, target_icao = after.partition(':')
+            if not separator:
+                return jsonify({'error': 'Invalid "after" cursor.'}), 400
+            after = (start_icao, target_icao)
+        try:
+            return jsonify(self.analytics.pair_stats(limit, after, request.args.get('start') or None))
+        except mysql.connector.Error as db_error:
+            return jsonify(
+                {'error': 'Database error: Failed to load pair stats.', 'internal_error': str(db_error)}), 500
+
+    def get_clinic_stats(self):
+        limit, after = self._page_args()
+        try:
+            return jsonify(self.analytics.clinic_stats(limit, after))
+        except mysql.connector.Error as db_error:
+            return jsonify(
+                {'error': 'Database error: Failed to load clinic stats.', 'internal_error': str(db_error)}), 500
+
+    def get_metrics(self):
+        if not self.metrics.enabled:
+            return jsonify({'error': 'Metrics are disabled.'}), 404
+        return self.app.response_class(self.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    def close(self):
+        self.refresher.stop()
+        self.status_writer.close()
+        self.result_writer.close()
+        self.event_log.close()
+        self.status_hub.close()
 
     def run(self, debug=True):
+        self.refresher.install_signal_handler()
         self.app.run(debug=debug)
 
 
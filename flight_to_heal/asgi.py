@@ -0,0 +1,224 @@
+import asyncio
+import io
+import logging
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import FlightToHealApp
+
+logger = logging.getLogger(__name__)
+
+_END_OF_BODY = object()
+
+
+class AsyncFlightToHeal:
+    # ASGI front end for FlightToHealApp. Every request runs the Flask handler on a bounded thread pool, so
+    # blocking database calls never stall the event loop and one process can hold many concurrent games.
+    # Status streams only use the pool to open: they then wait on the event loop, so open streams cannot starve
+    # ordinary requests of threads.
+    STATUS_STREAM_PATH = '/api/status_stream'
+
+    def __init__(self, flight_app=None, max_workers=32, shutdown_timeout=30.0):
+        self.flight_app = flight_app
+        self.max_workers = max_workers
+        self.shutdown_timeout = shutdown_timeout
+        self._executor = None
+        self._in_flight = 0
+        self._idle = None
+        self._shutting_down = False
+        self._streams = set()
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_started(self):
+        if self._executor is not None and self.flight_app is not None:
+            return
+        async with self._start_lock:
+            await self._start()
+
+    async def _start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='flight-to-heal')
+            self._idle = asyncio.Event()
+            self._idle.set()
+        if self.flight_app is None:
+            loop = asyncio.get_running_loop()
+            self.flight_app = await loop.run_in_executor(self._executor, FlightToHealApp)
+            try:
+                loop.add_signal_handler(signal.SIGHUP, self.flight_app.refresher.trigger)
+            except (AttributeError, NotImplementedError, RuntimeError):
+                # No SIGHUP on this platform, or not running on the main thread's loop.
+                pass
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}.")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._ensure_started()
+                except Exception as error:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(error)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def shutdown(self):
+        # Refuse new requests, let in-flight ones finish, then flush queued writes and release connections.
+        self._shutting_down = True
+        for stream in list(self._streams):
+            # Streams would otherwise run until their client leaves or STATUS_STREAM_MAX_SECONDS passes.
+            stream.close()
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Shutting down with %d requests still in flight.", self._in_flight)
+
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            if self.flight_app is not None:
+                await loop.run_in_executor(self._executor, self.flight_app.close)
+                await loop.run_in_executor(self._executor, self.flight_app.data_manager.pool.close_idle)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _stream(self, stream, receive, send):
+        loop = asyncio.get_running_loop()
+        frames = stream.frames(lambda function: loop.run_in_executor(self._executor, function))
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        # Closing the subscription wakes the stream, which then ends without waiting out its poll interval.
+        disconnected.add_done_callback(lambda _: stream.close())
+        self._streams.add(stream)
+        try:
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                       for name, value in self.flight_app.STATUS_STREAM_HEADERS]
+            await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+            async for chunk in frames:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            self._streams.discard(stream)
+            disconnected.cancel()
+            await frames.aclose()
+
+    @staticmethod
+    def _build_environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _start_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        body = self.flight_app.app.wsgi_app(environ, start_response)
+        iterator = iter(body)
+        first_chunk = next(iterator, _END_OF_BODY)
+        return response, body, iterator, first_chunk
+
+    async def _http(self, scope, receive, send):
+        if self._shutting_down:
+            await send({'type': 'http.response.start', 'status': 503,
+                        'headers': [(b'content-type', b'application/json'), (b'retry-after', b'5')]})
+            await send({'type': 'http.response.body', 'body': b'{"error":"Server is shutting down."}'})
+            return
+
+        await self._ensure_started()
+        body = await self._read_body(receive)
+        if body is None:
+            return
+
+        self._in_flight += 1
+        self._idle.clear()
+        loop = asyncio.get_running_loop()
+        wsgi_body = None
+        try:
+            environ = self._build_environ(scope, body)
+            if scope['method'] == 'GET' and scope['path'] == self.STATUS_STREAM_PATH:
+                stream = await loop.run_in_executor(self._executor, self.flight_app.open_status_stream, environ)
+                if stream is not None:
+                    await self._stream(stream, receive, send)
+                    return
+            response, wsgi_body, iterator, chunk = await loop.run_in_executor(
+                self._executor, self._start_wsgi, environ)
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            while chunk is not _END_OF_BODY:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self._executor, next, iterator, _END_OF_BODY)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if wsgi_body is not None and hasattr(wsgi_body, 'close'):
+                await loop.run_in_executor(self._executor, wsgi_body.close)
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+
+application = AsyncFlightToHeal()
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi:application', host='127.0.0.1', port=8000, lifespan='on')
@@ -0,0 +1,318 @@
+import argparse
+import http.cookiejar
+import json
+import math
+import platform
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from app import FlightToHealApp, GameData
+from db_pool import SQLiteStandIn
+
+ENDPOINTS = ('/api/get_airport_coords', '/api/start_game', '/api/risk_check', '/api/take_action',
+             '/api/batch_actions')
+
+
+def _icao_code(index):
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    letters = []
+    for _ in range(4):
+        index, remainder = divmod(index, len(alphabet))
+        letters.append(alphabet[remainder])
+    return ''.join(reversed(letters))
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def populate_synthetic_network(stand_in, n_airports, out_degree=4, clinic_ratio=0.3, seed=0):
+    # Writes a random but connected airport network into the stand-in's reference tables.
+    rng = random.Random(seed)
+    airports = []
+    for index in range(n_airports):
+        is_clinic = rng.random() < clinic_ratio
+        airports.append((
+            _icao_code(index), f"Synthetic Airport {index}", 1, 'Synthetica',
+            rng.uniform(-60.0, 70.0), rng.uniform(-180.0, 180.0), int(is_clinic),
+            rng.uniform(10.0, 25.0) if is_clinic else None, rng.uniform(0.5, 1.0) if is_clinic else None,
+        ))
+
+    edges = {}
+    for index, airport in enumerate(airports):
+        neighbours = {(index + 1) % n_airports, (index - 1) % n_airports}
+        while len(neighbours) < min(out_degree, n_airports - 1):
+            neighbours.add(rng.randrange(n_airports))
+        neighbours.discard(index)
+        for neighbour in neighbours:
+            other = airports[neighbour]
+            distance = _distance_km(airport[4], airport[5], other[4], other[5])
+            minutes = max(30, min(600, int(distance / 800.0 * 60)))
+            edges[(airport[0], other[0])] = (airport[0], other[0], minutes, rng.uniform(0.02, 0.05))
+
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        for table in ('Continent', 'Airport', 'Interconnection', 'Departure_Risk'):
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute("INSERT INTO Continent (Continent_ID, Continent_Name) VALUES (%s, %s)", (1, 'Synthetica'))
+        cursor.executemany("INSERT INTO Airport VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", airports)
+        cursor.executemany("INSERT INTO Interconnection VALUES (%s, %s, %s, %s)", list(edges.values()))
+        cursor.executemany("INSERT INTO Departure_Risk VALUES (%s, %s, %s, %s)", [
+            ('Weather Delay', 0.20, 60, 4.8), ('Crew Shortage', 0.05, 120, 6.0),
+        ])
+        cursor.close()
+    finally:
+        connection.close()
+    return len(airports), len(edges)
+
+
+class FlaskClient:
+
+    def __init__(self, flask_app):
+        self._client = flask_app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self._client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        http_request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                              headers={'Content-Type': 'application/json'})
+        try:
+            with self._opener.open(http_request, timeout=30) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+
+class LatencyRecorder:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+
+    def call(self, client, method, path, payload=None):
+        started = time.perf_counter()
+        status, body = client.request(method, path, payload)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[path].append(elapsed)
+            if status >= 400:
+                self.errors[path] += 1
+        return status, body
+
+
+def play_game(client, recorder, rng, max_turns=50, heal_below=40.0, use_batch=False, game_seed=None):
+    payload = {'player_name': 'bench', 'player_age': 30}
+    if game_seed is not None:
+        payload['seed'] = game_seed
+    status, data = recorder.call(client, 'POST', '/api/start_game', payload)
+    if status != 200 or not data:
+        return None
+
+    for _ in range(max_turns):
+        if data['game_over']:
+            return data['outcome']
+        current = data['status']
+        if current['is_clinic'] and current['health'] < heal_below:
+            status, data = recorder.call(client, 'POST', '/api/take_action', {'action': 'heal'})
+        elif data['options']:
+            targets = [option['Destination_ICAO'] for option in data['options']]
+            target = current['target_icao'] if current['target_icao'] in targets else rng.choice(targets)
+            if use_batch:
+                status, data = recorder.call(client, 'POST', '/api/batch_actions', {
+                    'actions': [{'action': 'fly', 'target_icao': target}], 'risk_policy': 'proceed'})
+                if status != 200 or not data:
+                    return None
+                continue
+            status, risk = recorder.call(client, 'POST', '/api/risk_check', {'target_icao': target})
+            if status != 200 or not risk:
+                return None
+            if risk['risk_found'] and risk['game_over_after_risk']:
+                return risk['current_status']['outcome']
+            status, data = recorder.call(client, 'POST', '/api/take_action',
+                                         {'action': 'fly_execute', 'target_icao': target})
+        else:
+            return 'STUCK'
+        if status != 200 or not data:
+            return None
+    return 'TURN_LIMIT'
+
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    rank = max(0, math.ceil(fraction * len(sorted_samples)) - 1)
+    return sorted_samples[rank]
+
+
+def summarize(recorder, wall_seconds):
+    endpoints = {}
+    for endpoint, samples in recorder.samples.items():
+        ordered = sorted(samples)
+        endpoints[endpoint] = {
+            'requests': len(ordered), 'errors': recorder.errors[endpoint],
+            'throughput_rps': len(ordered) / wall_seconds if wall_seconds else 0.0,
+            'mean_ms': 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+            'p50_ms': 1000 * _percentile(ordered, 0.50), 'p95_ms': 1000 * _percentile(ordered, 0.95),
+            'p99_ms': 1000 * _percentile(ordered, 0.99), 'max_ms': 1000 * ordered[-1] if ordered else 0.0,
+        }
+    return endpoints
+
+
+def run_load(make_client, games, concurrency, seed=0, use_batch=False):
+    recorder = LatencyRecorder()
+    outcomes = {}
+    outcomes_lock = threading.Lock()
+    counter = iter(range(games))
+    counter_lock = threading.Lock()
+
+    def worker(worker_id):
+        client = make_client()
+        recorder.call(client, 'GET', '/api/get_airport_coords')
+        while True:
+            with counter_lock:
+                game_index = next(counter, None)
+            if game_index is None:
+                return
+            # Seeding per game rather than per worker keeps outcomes identical at any concurrency.
+            game_seed = seed * 1000003 + game_index
+            outcome = play_game(client, recorder, random.Random(game_seed), use_batch=use_batch, game_seed=game_seed)
+            with outcomes_lock:
+                outcomes[outcome or 'ERROR'] = outcomes.get(outcome or 'ERROR', 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        'games': games, 'concurrency': concurrency, 'batch': use_batch, 'wall_seconds': wall_seconds,
+        'games_per_second': games / wall_seconds if wall_seconds else 0.0,
+        'outcomes': outcomes, 'endpoints': summarize(recorder, wall_seconds),
+    }
+
+
+def run_synthetic(n_airports, games, concurrency, out_degree=4, seed=0, use_batch=False):
+    stand_in = SQLiteStandIn()
+    flight_app = None
+    try:
+        n_airports, n_routes = populate_synthetic_network(stand_in, n_airports, out_degree=out_degree, seed=seed)
+        started = time.perf_counter()
+        data_manager = GameData(connect=stand_in)
+        data_manager.load_from_database()
+        load_seconds = time.perf_counter() - started
+
+        flight_app = FlightToHealApp(data_manager)
+        result = run_load(lambda: FlaskClient(flight_app.app), games, concurrency, seed=seed, use_batch=use_batch)
+        flight_app.status_writer.flush(timeout=30)
+        result.update({
+            'mode': 'flask_test_client', 'airports': n_airports, 'routes': n_routes,
+            'data_load_seconds': load_seconds, 'writer': flight_app.status_writer.stats(),
+            'pool': data_manager.pool.stats(),
+        })
+        return result
+    finally:
+        if flight_app is not None:
+            flight_app.close()
+        stand_in.remove()
+
+
+def compare(current, baseline, tolerance=0.10):
+    # Flags endpoints whose p95 grew by more than the tolerance for a matching scenario.
+    regressions = []
+    def scenario(run):
+        return run.get('mode'), run.get('airports'), run['concurrency'], run.get('batch', False)
+
+    baseline_runs = {scenario(run): run for run in baseline['runs']}
+    for run in current['runs']:
+        previous = baseline_runs.get(scenario(run))
+        if not previous:
+            continue
+        for endpoint, stats in run['endpoints'].items():
+            before = previous['endpoints'].get(endpoint, {}).get('p95_ms')
+            if before and stats['p95_ms'] > before * (1 + tolerance):
+                regressions.append({'airports': run.get('airports'), 'concurrency': run['concurrency'],
+                                    'endpoint': endpoint, 'baseline_p95_ms': before, 'p95_ms': stats['p95_ms']})
+    return regressions
+
+
+def print_run(run):
+    label = f"{run.get('airports', 'remote')} airports" if run.get('airports') else run['mode']
+    print(f"\n== {label}, {run['concurrency']} concurrent clients: {run['games']} games in "
+          f"{run['wall_seconds']:.2f}s ({run['games_per_second']:.1f} games/s), outcomes {run['outcomes']}")
+    print(f"{'endpoint':28} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in run['endpoints'].items():
+        print(f"{endpoint:28} {stats['requests']:>8} {stats['errors']:>6} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test and latency benchmark for the Flight To Heal API.')
+    parser.add_argument('--sizes', default='100,1000', help='Comma separated synthetic airport counts.')
+    parser.add_argument('--degree', type=int, default=4, help='Outgoing routes per synthetic airport.')
+    parser.add_argument('--games', type=int, default=200, help='Games to play per scenario.')
+    parser.add_argument('--concurrency', default='1,8', help='Comma separated numbers of concurrent clients.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch', action='store_true', help='Fly through /api/batch_actions in one round trip.')
+    parser.add_argument('--url', help='Benchmark a running server over HTTP instead of in-process.')
+    parser.add_argument('--output', help='Write the machine-readable report to this JSON file.')
+    parser.add_argument('--compare', help='Baseline JSON report to check p95 regressions against.')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative p95 growth.')
+    args = parser.parse_args()
+
+    concurrency_levels = [int(value) for value in args.concurrency.split(',')]
+    runs = []
+    if args.url:
+        for concurrency in concurrency_levels:
+            run = run_load(lambda: HttpClient(args.url), args.games, concurrency, seed=args.seed,
+                           use_batch=args.batch)
+            run.update({'mode': 'http', 'url': args.url})
+            runs.append(run)
+            print_run(run)
+    else:
+        for size in [int(value) for value in args.sizes.split(',')]:
+            for concurrency in concurrency_levels:
+                run = run_synthetic(size, args.games, concurrency, out_degree=args.degree, seed=args.seed,
+                                    use_batch=args.batch)
+                runs.append(run)
+                print_run(run)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'python': platform.python_version(),
+        'platform': platform.platform(), 'seed': args.seed, 'runs': runs,
+    }
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['endpoint']} ({regression['airports']} airports, "
+                  f"{regression['concurrency']} clients): p95 {regression['baseline_p95_ms']:.2f} -> "
+                  f"{regression['p95_ms']:.2f} ms")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
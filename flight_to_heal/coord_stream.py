@@ -0,0 +1,105 @@
+import math
+
+from static_payloads import encode_json
+
+# Compact coordinate stream: MAGIC, a version byte and the fixed-point scale, then one record per airport:
+#   [ICAO length: u8][ICAO: ascii][latitude delta: zigzag varint][longitude delta: zigzag varint][flags: u8]
+# Deltas are against the previous record in scaled integer degrees; flags bit 0 marks a clinic.
+# There is no record count, so the stream can be written before the number of airports is known.
+MAGIC = b'FTHC'
+FORMAT_VERSION = 1
+SCALE = 100000
+CLINIC_FLAG = 1
+
+FORMATS = {'json': 'application/json', 'delta': 'application/x-flight-coords'}
+MAX_TILE_ZOOM = 18
+
+
+def tile_bounds(z, x, y):
+    # (south, west, north, east) of a Web Mercator map tile, the scheme Leaflet tile layers request.
+    tiles = 2 ** z
+    west = x / tiles * 360.0 - 180.0
+    east = (x + 1) / tiles * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / tiles))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / tiles))))
+    return south, west, north, east
+
+
+def _varint(value):
+    value = (value << 1) ^ (value >> 63)
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def iter_json(records, chunk_records=256):
+    # Yields a {"ICAO": [lat, lon, clinic], ...} object a slice at a time.
+    yield b'{'
+    chunk = []
+    first = True
+    for icao, latitude, longitude, clinic in records:
+        chunk.append((b'' if first else b',') + encode_json(icao) + b':' + encode_json([latitude, longitude, clinic]))
+        first = False
+        if len(chunk) >= chunk_records:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
+    yield b'}'
+
+
+def iter_delta(records, chunk_records=256):
+    yield MAGIC + bytes([FORMAT_VERSION]) + SCALE.to_bytes(4, 'little')
+    chunk = bytearray()
+    count = 0
+    previous_latitude = previous_longitude = 0
+    for icao, latitude, longitude, clinic in records:
+        scaled_latitude, scaled_longitude = round(latitude * SCALE), round(longitude * SCALE)
+        code = icao.encode('ascii')
+        chunk.append(len(code))
+        chunk += code
+        chunk += _varint(scaled_latitude - previous_latitude)
+        chunk += _varint(scaled_longitude - previous_longitude)
+        chunk.append(CLINIC_FLAG if clinic else 0)
+        previous_latitude, previous_longitude = scaled_latitude, scaled_longitude
+        count += 1
+        if count >= chunk_records:
+            yield bytes(chunk)
+            chunk = bytearray()
+            count = 0
+    if chunk:
+        yield bytes(chunk)
+
+
+def decode_delta(payload):
+    # Reference decoder for the delta format; returns {icao: [lat, lon, clinic]}.
+    if payload[:4] != MAGIC or payload[4] != FORMAT_VERSION:
+        raise ValueError("Not a version 1 coordinate stream.")
+    scale = int.from_bytes(payload[5:9], 'little')
+    offset = 9
+    latitude = longitude = 0
+    airports = {}
+
+    def read_varint():
+        nonlocal offset
+        shift = value = 0
+        while True:
+            byte = payload[offset]
+            offset += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return (value >> 1) ^ -(value & 1)
+
+    while offset < len(payload):
+        length = payload[offset]
+        icao = payload[offset + 1:offset + 1 + length].decode('ascii')
+        offset += 1 + length
+        latitude += read_varint()
+        longitude += read_varint()
+        airports[icao] = [latitude / scale, longitude / scale, bool(payload[offset] & CLINIC_FLAG)]
+        offset += 1
+    return airports
@@ -0,0 +1,375 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import errorcode, errors as mysql_errors
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, size=10, timeout=5.0, health_check_interval=30.0):
+        if size < 1:
+            raise ValueError("Connection pool size must be at least 1.")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._metrics = {
+            'checkouts': 0, 'created': 0, 'closed': 0, 'waits': 0, 'wait_seconds': 0.0,
+            'exhausted': 0, 'health_check_failures': 0, 'peak_in_use': 0,
+        }
+
+    def connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        raw = None
+        waited = False
+
+        with self._condition:
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    last_used = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['exhausted'] += 1
+                    raise mysql_errors.PoolError(
+                        f"Connection pool exhausted: {self.size} connections in use after {timeout:.1f}s.")
+                waited = True
+                self._condition.wait(remaining)
+
+            self._in_use += 1
+            self._metrics['checkouts'] += 1
+            self._metrics['peak_in_use'] = max(self._metrics['peak_in_use'], self._in_use)
+            if waited:
+                self._metrics['waits'] += 1
+                self._metrics['wait_seconds'] += time.monotonic() - started
+
+        try:
+            if raw is not None and time.monotonic() - last_used >= self.health_check_interval \
+                    and not self._is_healthy(raw):
+                with self._condition:
+                    self._metrics['health_check_failures'] += 1
+                self._close_raw(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+                with self._condition:
+                    self._metrics['created'] += 1
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+
+        return PooledConnection(self, raw)
+
+    def _is_healthy(self, raw):
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._metrics['closed'] += 1
+
+    def _release(self, raw, discard=False):
+        if discard:
+            self._close_raw(raw)
+        with self._condition:
+            self._in_use -= 1
+            if discard:
+                self._open -= 1
+            else:
+                self._idle.append((raw, time.monotonic()))
+            self._condition.notify()
+
+    def close_idle(self):
+        with self._condition:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw in idle:
+            self._close_raw(raw)
+
+    def stats(self):
+        with self._condition:
+            return dict(self._metrics, size=self.size, open=self._open, in_use=self._in_use, idle=len(self._idle))
+
+
+class PooledConnection:
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql_errors.OperationalError("Connection already returned to the pool.")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and issubclass(exc_type, mysql.connector.Error):
+            self.discard()
+        else:
+            self.close()
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw)
+
+    def discard(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, discard=True)
+
+
+def ensure_tables(connection, tables, schema):
+    # Runs a module's MYSQL_SCHEMA if any of its tables is missing, so a MySQL deployment needs no separate
+    # migration step. The SQLite stand-in creates every table up front (STAND_IN_SCHEMA; it cannot parse the
+    # inline INDEX clauses), so there the probe always succeeds. Returns True if the DDL ran.
+    cursor = connection.cursor()
+    try:
+        try:
+            for table in tables:
+                cursor.execute(f"SELECT 1 FROM {table} LIMIT 0")
+                cursor.fetchall()
+            return False
+        except mysql_errors.ProgrammingError as error:
+            if error.errno != errorcode.ER_NO_SUCH_TABLE:
+                raise
+        for statement in schema.split(';'):
+            if statement.strip():
+                cursor.execute(statement)
+        connection.commit()
+        return True
+    finally:
+        cursor.close()
+
+
+class SQLiteCursor:
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _translate(sql):
+        # MySQL's upsert becomes SQLite's target-less form (SQLite 3.35+); unqualified columns in the SET list
+        # name the existing row in both dialects.
+        return sql.replace('%s', '?').replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET')
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(self._translate(sql), tuple(params))
+        except sqlite3.Error as error:
+            raise mysql_errors.DatabaseError(str(error))
+
+    def executemany(self, sql, seq_of_params):
+        try:
+            self._cursor.executemany(self._translate(sql), [tuple(params) for params in seq_of_params])
+        except sqlite3.Error as error:
+            raise mysql_errors.DatabaseError(str(error))
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+
+    def __init__(self, path):
+        try:
+            self._connection = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        except sqlite3.Error as error:
+            raise mysql_errors.DatabaseError(f"Database connection failed: {error}")
+        self._connection.execute('PRAGMA journal_mode=WAL')
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._connection.cursor(), dictionary=dictionary)
+
+    def _control(self, statement):
+        try:
+            self._connection.execute(statement)
+        except sqlite3.Error as error:
+            raise mysql_errors.DatabaseError(str(error))
+
+    def start_transaction(self):
+        # Statements otherwise autocommit, like the MySQL connections GameData opens. IMMEDIATE takes the write
+        # lock up front, so concurrent transactions queue instead of failing at their first write.
+        self._control('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self._connection.in_transaction:
+            self._control('COMMIT')
+
+    def rollback(self):
+        if self._connection.in_transaction:
+            self._control('ROLLBACK')
+
+    def is_connected(self):
+        try:
+            self._connection.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def ping(self, reconnect=False, **kwargs):
+        if not self.is_connected():
+            raise mysql_errors.InterfaceError("SQLite stand-in connection is closed.")
+
+    def close(self):
+        self._connection.close()
+
+
+STAND_IN_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS Continent (
+        Continent_ID INTEGER PRIMARY KEY,
+        Continent_Name TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS Airport (
+        ICAO_Code TEXT PRIMARY KEY,
+        Airport_Name TEXT NOT NULL,
+        Continent_ID INTEGER,
+        Country_Name TEXT,
+        Latitude REAL,
+        Longitude REAL,
+        Clinic INTEGER DEFAULT 0,
+        Clinic_Healing_Amount REAL,
+        Clinic_Time_Factor REAL
+    );
+    CREATE TABLE IF NOT EXISTS Interconnection (
+        Departure_Airport_ID TEXT NOT NULL,
+        Arrival_Airport_ID TEXT NOT NULL,
+        Travel_Time_Minutes INTEGER NOT NULL,
+        Health_Cost_Per_Minute REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS Departure_Risk (
+        Departure_Risk_Name TEXT NOT NULL,
+        Probability_of_Occurring REAL NOT NULL,
+        Time_Delay_Minutes INTEGER NOT NULL,
+        Health_Loss REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS game_state (
+        Game_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Current_Patient_Health REAL,
+        Total_Game_Time_Minutes INTEGER,
+        Max_Allowed_Time_Minutes INTEGER,
+        Current_Location_ID TEXT,
+        Target_Hospital_ID TEXT,
+        Game_Status TEXT,
+        Player_Name TEXT,
+        Player_Age INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS game_result (
+        Game_ID INTEGER PRIMARY KEY,
+        Player_Name TEXT,
+        Start_Airport_ID TEXT NOT NULL,
+        Target_Hospital_ID TEXT NOT NULL,
+        Outcome TEXT NOT NULL,
+        Total_Game_Time_Minutes INTEGER NOT NULL,
+        Final_Health REAL NOT NULL,
+        Clinics_Used INTEGER NOT NULL,
+        Finished_At REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_game_result_leaderboard
+        ON game_result (Outcome, Total_Game_Time_Minutes, Game_ID);
+    CREATE TABLE IF NOT EXISTS route_pair_stats (
+        Start_Airport_ID TEXT NOT NULL,
+        Target_Hospital_ID TEXT NOT NULL,
+        Games INTEGER NOT NULL,
+        Wins INTEGER NOT NULL,
+        Total_Win_Minutes INTEGER NOT NULL,
+        Best_Win_Minutes INTEGER,
+        PRIMARY KEY (Start_Airport_ID, Target_Hospital_ID)
+    );
+    CREATE TABLE IF NOT EXISTS game_event (
+        Event_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Game_ID INTEGER NOT NULL,
+        Event_Type TEXT NOT NULL,
+        Payload TEXT NOT NULL,
+        Created_At REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_game_event_game ON game_event (Game_ID, Event_ID);
+    CREATE TABLE IF NOT EXISTS clinic_stats (
+        Clinic_ID TEXT PRIMARY KEY,
+        Heals INTEGER NOT NULL,
+        Games INTEGER NOT NULL,
+        Wins INTEGER NOT NULL
+    );
+"""
+
+
+class SQLiteStandIn:
+    # Local replacement for the MySQL server: a callable connection factory for ConnectionPool / GameData.
+
+    def __init__(self, path=None):
+        self._owns_file = path is None
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix='flight_to_heal_', suffix='.sqlite3')
+            os.close(handle)
+        self.path = path
+
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.executescript(STAND_IN_SCHEMA)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def __call__(self):
+        return SQLiteConnection(self.path)
+
+    def remove(self):
+        if self._owns_file:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self.path + suffix)
+                except OSError:
+                    pass
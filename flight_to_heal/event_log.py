@@ -0,0 +1,335 @@
+import argparse
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+from db_pool import ensure_tables
+from game_random import GameRandom
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Event table for MySQL, created by DatabaseEventSink.ensure_schema() when missing; the SQLite stand-in creates the
+# same table in STAND_IN_SCHEMA.
+MYSQL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS game_event (
+        Event_ID BIGINT AUTO_INCREMENT PRIMARY KEY,
+        Game_ID INT NOT NULL,
+        Event_Type VARCHAR(16) NOT NULL,
+        Payload TEXT NOT NULL,
+        Created_At DOUBLE NOT NULL,
+        INDEX idx_game_event_game (Game_ID, Event_ID)
+    );
+"""
+
+
+def _encode(event):
+    return json.dumps(event, separators=(',', ':'), ensure_ascii=False)
+
+
+class DatabaseEventSink:
+    # Appends events to the game_event table; one multi-row INSERT per batch, never an UPDATE.
+
+    INSERT_SQL = """
+                 INSERT INTO game_event (Game_ID, Event_Type, Payload, Created_At)
+                 VALUES (%s, %s, %s, %s) \
+                 """
+
+    def __init__(self, data_manager, metrics=None):
+        self.data_manager = data_manager
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if not self._schema_ready:
+            with self.data_manager._get_db_connection() as conn:
+                if ensure_tables(conn, ('game_event',), MYSQL_SCHEMA):
+                    logger.info("Created the game_event table.")
+            self._schema_ready = True
+
+    def append_batch(self, events):
+        self.ensure_schema()
+        rows = []
+        for event in events:
+            payload = {key: value for key, value in event.items() if key not in ('game_id', 'type', 'at')}
+            rows.append((event['game_id'], event['type'], _encode(payload), event['at']))
+
+        with self.metrics.timer('flight_to_heal_db_query_duration_seconds', (('query', 'append_game_events'),)):
+            with self.data_manager._get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(self.INSERT_SQL, rows)
+                conn.commit()
+                cursor.close()
+        self.metrics.inc('flight_to_heal_db_rows_written_total', (('table', 'game_event'),), len(rows))
+
+    def read(self, game_id):
+        self.ensure_schema()
+        with self.data_manager._get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Event_Type, Payload, Created_At FROM game_event WHERE Game_ID = %s "
+                           "ORDER BY Event_ID", (game_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+        return [dict(json.loads(payload), game_id=game_id, type=event_type, at=created_at)
+                for event_type, payload, created_at in rows]
+
+
+class SegmentedFileEventSink:
+    # Appends events as JSON lines to numbered segment files, starting a new segment past segment_max_bytes.
+    # Each batch is one sequential write; one writer process per directory.
+
+    def __init__(self, directory, segment_max_bytes=64 * 1024 * 1024, prefix='events'):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self._segment_index = int(segments[-1].rsplit('-', 1)[1].split('.')[0]) if segments else 1
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"{self.prefix}-{index:06d}.jsonl")
+
+    def segments(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(self.prefix + '-') and name.endswith('.jsonl'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def append_batch(self, events):
+        data = ''.join(_encode(event) + '\n' for event in events).encode('utf-8')
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._segment_path(self._segment_index), 'ab')
+            if self._file.tell() and self._file.tell() + len(data) > self.segment_max_bytes:
+                self._file.close()
+                self._segment_index += 1
+                self._file = open(self._segment_path(self._segment_index), 'ab')
+            self._file.write(data)
+            self._file.flush()
+
+    def iter_events(self):
+        for path in self.segments():
+            with open(path, 'rb') as segment:
+                for line in segment:
+                    # A torn final line from a crash mid-write is skipped rather than failing the whole scan.
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def read(self, game_id):
+        return [event for event in self.iter_events() if event['game_id'] == game_id]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class GameEventLog:
+    # Buffers events in order and hands them to the sink in batches from a background thread,
+    # so a turn only pays for an append to an in-memory queue.
+
+    def __init__(self, sink, max_pending=50000, batch_size=1000, linger_seconds=0.05, submit_timeout=1.0):
+        self.sink = sink
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.submit_timeout = submit_timeout
+
+        self._pending = deque()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.counters = {'appended': 0, 'batches': 0, 'written': 0, 'sync_writes': 0, 'failed_batches': 0,
+                         'dropped': 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='game-event-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def append(self, game_id, event_type, **payload):
+        event = dict(payload, game_id=game_id, type=event_type, at=time.time())
+        with self._condition:
+            self.counters['appended'] += 1
+            if not self._closed:
+                self._ensure_started()
+                deadline = time.monotonic() + self.submit_timeout
+                while len(self._pending) >= self.max_pending and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if len(self._pending) < self.max_pending and not self._closed:
+                    self._pending.append(event)
+                    self._condition.notify_all()
+                    return
+            self.counters['sync_writes'] += 1
+
+        # Queue full or log closed: write on the caller's thread so the history keeps every event.
+        self._write([event])
+
+    def _write(self, batch):
+        try:
+            self.sink.append_batch(batch)
+        except Exception as error:
+            # Whatever the sink raises, the worker thread must live on: nothing restarts it, and without it
+            # every later append waits out submit_timeout and writes synchronously.
+            with self._condition:
+                self.counters['failed_batches'] += 1
+                self.counters['dropped'] += len(batch)
+            if isinstance(error, (mysql.connector.Error, OSError)):
+                logger.warning("Dropped %d game events: %s", len(batch), error)
+            else:
+                logger.exception("Dropped %d game events after an unexpected sink error.", len(batch))
+            return False
+        with self._condition:
+            self.counters['batches'] += 1
+            self.counters['written'] += len(batch)
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    self._condition.notify_all()
+                    return
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.linger_seconds)
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                self._in_flight = len(batch)
+                self._condition.notify_all()
+
+            self._write(batch)
+
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def read(self, game_id):
+        self.flush(timeout=5.0)
+        return self.sink.read(game_id)
+
+    def close(self, timeout=10.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if hasattr(self.sink, 'close'):
+            self.sink.close()
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, pending=len(self._pending), in_flight=self._in_flight)
+
+
+def replay_events(state, events, step=None):
+    # Rebuilds a GameState from recorded deltas, so replay does not depend on the reference data still
+    # matching what the game was played against. `step` stops after that many events.
+    for event in events[:step]:
+        event_type = event['type']
+        if event_type == 'start':
+            if event.get('seed') is not None:
+                state.rng = GameRandom(event['seed'])
+            state.start_location_icao = event['start_icao']
+            state.current_location_icao = event['start_icao']
+            state.target_hospital_icao = event['target_icao']
+            state.current_health = event['health']
+            state.total_time_minutes = event['time_total']
+            state.clinics_used = []
+            state.is_game_over = False
+            state.outcome = None
+        elif event_type == 'risk':
+            state.total_time_minutes += event['time_penalty']
+            state.current_health -= event['health_penalty']
+        elif event_type == 'heal':
+            state.total_time_minutes += event['time']
+            state.current_health += event['health_gain']
+            state.clinics_used.append(event['icao'])
+        elif event_type == 'flight':
+            state.total_time_minutes += event['time']
+            state.current_health -= event['health_loss']
+            if event['arrived']:
+                state.current_location_icao = event['to_icao']
+        elif event_type == 'outcome':
+            state.is_game_over = True
+            state.outcome = event['outcome']
+    state.messages = []
+    return state
+
+
+def actions_from_events(events):
+    # The seed and the action list (in /api/batch_actions vocabulary) that reproduce a recorded game when
+    # replayed against the same reference data; see simulation.replay_actions.
+    seed = None
+    actions = []
+    for event in events:
+        event_type = event['type']
+        if event_type == 'start':
+            seed = event.get('seed')
+        elif event_type == 'risk':
+            actions.append({'action': 'risk_check', 'target_icao': event['target_icao']})
+        elif event_type == 'flight':
+            actions.append({'action': 'fly_execute', 'target_icao': event['to_icao']})
+        elif event_type == 'heal':
+            actions.append({'action': 'heal'})
+        elif event_type == 'cancel':
+            actions.append({'action': 'fly_cancel'})
+    return seed, actions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded Flight To Heal game step by step.')
+    parser.add_argument('game_id', type=int)
+    parser.add_argument('--directory', help='Read a segmented event log directory instead of the database.')
+    parser.add_argument('--step', type=int, help='Stop after this many events.')
+    args = parser.parse_args()
+
+    from app import GameData, GameState
+
+    data_manager = GameData()
+    if args.directory:
+        sink = SegmentedFileEventSink(args.directory)
+    else:
+        data_manager.load_from_database()
+        sink = DatabaseEventSink(data_manager)
+    events = sink.read(args.game_id)
+    if not events:
+        parser.error(f"No events recorded for game {args.game_id}.")
+
+    for index in range(1, len(events[:args.step]) + 1):
+        state = replay_events(GameState(data_manager), events, index)
+        print(f"{index:4d} {events[index - 1]['type']:<8} at {state.current_location_icao} "
+              f"health {state.current_health:6.2f} time {state.total_time_minutes:5d}"
+              + (f" -> {state.outcome}" if state.is_game_over else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import os
+
+_MASK64 = (1 << 64) - 1
+_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _mix64(value):
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class GameRandom:
+    # Counter-based SplitMix64 stream owned by one game. Its whole state is (seed, counter), so it round-trips
+    # through the game state blob, and no lock or global generator is shared between concurrent games.
+    __slots__ = ('seed', 'counter')
+
+    def __init__(self, seed, counter=0):
+        self.seed = seed & _MASK64
+        self.counter = counter
+
+    @staticmethod
+    def new_seed():
+        return int.from_bytes(os.urandom(8), 'little')
+
+    def next_u64(self):
+        self.counter += 1
+        return _mix64((self.seed + self.counter * _GAMMA) & _MASK64)
+
+    def random(self):
+        # 53 random bits as a float in [0, 1), like random.random().
+        return (self.next_u64() >> 11) * (1.0 / (1 << 53))
+
+    def randbelow(self, n):
+        # Rejection sampling keeps every index equally likely.
+        limit = _MASK64 - (_MASK64 + 1) % n
+        while True:
+            value = self.next_u64()
+            if value <= limit:
+                return value % n
+
+    def choice(self, sequence):
+        if not sequence:
+            raise IndexError("Cannot choose from an empty sequence.")
+        return sequence[self.randbelow(len(sequence))]
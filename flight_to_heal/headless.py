@@ -0,0 +1,394 @@
+import argparse
+import copy
+import importlib
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app import GameData, GameState
+from benchmark import populate_synthetic_network
+from db_pool import SQLiteStandIn
+from game_random import GameRandom
+from spatial import distance_km
+
+FLY, HEAL = 'fly', 'heal'
+OUTCOMES = ('SUCCESS', 'LOST_HEALTH', 'LOST_TIME', 'STUCK', 'TURN_LIMIT')
+MAX_TURNS = 200
+CHUNK_SIZE = 250
+# Policies draw from their own stream, so a policy's choices never shift the game's risk draws.
+POLICY_STREAM = 0x5EED
+
+
+class Policy:
+    # One instance plays one game at a time: start() gets the fresh state, choose() is asked for every move and
+    # returns (HEAL, None), (FLY, icao) or None to give up. on_risk() decides whether a flight that drew a
+    # departure risk still leaves ('proceed') or is called off ('cancel'), as a player would in the browser.
+
+    def start(self, state, rng):
+        self.rng = rng
+
+    def choose(self, state):
+        raise NotImplementedError
+
+    def on_risk(self, state, risk, target_icao):
+        return 'proceed'
+
+
+def _at_clinic(state):
+    return bool(state.data.airports[state.current_location_icao].get('Clinic', False))
+
+
+class RandomPolicy(Policy):
+    # Uniform over every legal move; heals only count as moves while they can restore something.
+
+    def choose(self, state):
+        network = state.data.route_network
+        moves = [(FLY, network.icaos[network.arrivals[edge]])
+                 for edge in network.edges_from(state.current_location_icao)]
+        if _at_clinic(state) and state.current_health < state.data.START_HEALTH:
+            moves.append((HEAL, None))
+        return self.rng.choice(moves) if moves else None
+
+
+class GreedyPolicy(Policy):
+    # Heals at a clinic below heal_below of full health, otherwise flies to the target if it is one hop away,
+    # else to the unvisited neighbour closest to it, preferring flights the patient survives.
+
+    def __init__(self, heal_below=0.6):
+        self.heal_below = heal_below
+
+    def start(self, state, rng):
+        super().start(state, rng)
+        self.visited = {state.current_location_icao}
+
+    def choose(self, state):
+        data = state.data
+        if _at_clinic(state) and state.current_health < self.heal_below * data.START_HEALTH:
+            return HEAL, None
+
+        network = data.route_network
+        edges = network.edges_from(state.current_location_icao)
+        if not edges:
+            return (HEAL, None) if _at_clinic(state) and state.current_health < data.START_HEALTH else None
+        target_id = network.ids[state.target_hospital_icao]
+        if any(network.arrivals[edge] == target_id for edge in edges):
+            return FLY, state.target_hospital_icao
+
+        survivable = [edge for edge in edges if network.health_losses[edge] < state.current_health] or list(edges)
+        fresh = [edge for edge in survivable if network.icaos[network.arrivals[edge]] not in self.visited]
+        target = data.airports[state.target_hospital_icao]
+
+        def remaining_km(edge):
+            airport = data.airports[network.icaos[network.arrivals[edge]]]
+            return distance_km(airport['Latitude'], airport['Longitude'], target['Latitude'], target['Longitude'])
+
+        arrival = network.icaos[network.arrivals[min(fresh or survivable, key=remaining_km)]]
+        self.visited.add(arrival)
+        return FLY, arrival
+
+
+class OptimalPolicy(Policy):
+    # Follows a route from the solver and plans again only when a departure risk knocked the game off that plan.
+    # Among the Pareto routes it takes the one with the widest margin on whichever of health and time is tighter,
+    # which leaves the most room for later risks. Falls back to greedy once no route can still win.
+
+    def __init__(self):
+        self.fallback = GreedyPolicy()
+
+    def start(self, state, rng):
+        super().start(state, rng)
+        self.fallback.start(state, rng)
+        self.plan = None
+
+    def _plan(self, state):
+        data = state.data
+        routes = data.route_solver.solve(state.current_location_icao, state.target_hospital_icao,
+                                         state.current_health, state.total_time_minutes)
+        if not routes:
+            return []
+        best = max(routes, key=lambda route: min(route['final_health'] / data.START_HEALTH,
+                                                 1 - route['total_time'] / data.MAXIMUM_TIME_MINUTES))
+        return list(reversed(best['steps']))
+
+    def choose(self, state):
+        if self.plan is None:
+            self.plan = self._plan(state)
+        if not self.plan:
+            return self.fallback.choose(state)
+        step = self.plan.pop()
+        return (HEAL, None) if step['action'] == 'heal' else (FLY, step['to_icao'])
+
+    def on_risk(self, state, risk, target_icao):
+        self.plan = None
+        return 'proceed'
+
+
+POLICIES = {'random': RandomPolicy, 'greedy': GreedyPolicy, 'optimal': OptimalPolicy}
+
+
+def make_policy(name):
+    # A built-in name, or 'module:Class' for a Policy subclass defined elsewhere.
+    if name in POLICIES:
+        return POLICIES[name]()
+    module_name, _, attribute = name.partition(':')
+    if not attribute:
+        raise ValueError(f"Unknown policy {name!r}; expected one of {sorted(POLICIES)} or 'module:Class'.")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+def play(data_manager: GameData, policy, seed, start_icao=None, target_icao=None, max_turns=MAX_TURNS):
+    # One game through GameState with the Flask handlers' rules and random draws (risk check, then fly or
+    # cancel). Without a start the game picks its own pair from the seed, like /api/start_game.
+    state = GameState(data_manager, seed)
+    if start_icao is None:
+        state.initialize()
+    else:
+        state.current_location_icao = state.start_location_icao = start_icao
+        state.target_hospital_icao = target_icao
+    policy.start(state, GameRandom(seed ^ POLICY_STREAM))
+
+    outcome = None
+    turns = risks = 0
+    while not state.is_game_over:
+        if turns >= max_turns:
+            outcome = 'TURN_LIMIT'
+            break
+        move = policy.choose(state)
+        if move is None:
+            outcome = 'STUCK'
+            break
+        turns += 1
+        action, arrival_icao = move
+        if action == HEAL:
+            if not _at_clinic(state):
+                raise ValueError(f"Policy healed at {state.current_location_icao}, which has no clinic.")
+            state.execute_healing()
+        else:
+            flight = state.get_flight_info(state.current_location_icao, arrival_icao)
+            if flight is None:
+                raise ValueError(f"Policy flew {state.current_location_icao}->{arrival_icao}, which is no route.")
+            risk = state.check_risk(data_manager.departure_risks)
+            if risk:
+                risks += 1
+                if state.apply_departure_risk(risk):
+                    break
+                if policy.on_risk(state, risk, arrival_icao) == 'cancel':
+                    continue
+            state.execute_flight({'Destination_ICAO': arrival_icao, 'Time': flight['Time'],
+                                  'Health_Loss': flight['Health_Loss']})
+        state.messages.clear()
+
+    return (state.start_location_icao, state.target_hospital_icao, state.outcome or outcome,
+            round(state.current_health, 2), state.total_time_minutes, turns, len(state.clinics_used), risks)
+
+
+def tune(data_manager: GameData, start_health=None, healing_time_base=None, healing_scale=1.0,
+         time_factor_scale=1.0, cost_scale=1.0):
+    # A copy of the game with balance parameters changed; the original and anything serving it are untouched.
+    # Scales multiply every clinic's Healing / TimeFactor and every route's Health_Cost_Per_Minute. The winnable
+    # map is recomputed, since which pairs can be won is exactly what these parameters move.
+    if (start_health, healing_time_base, healing_scale, time_factor_scale, cost_scale) == (None, None, 1.0, 1.0, 1.0):
+        return data_manager
+    tuned = copy.copy(data_manager)
+    if start_health is not None:
+        tuned.START_HEALTH = start_health
+    if healing_time_base is not None:
+        tuned.HEALING_TIME_BASE = healing_time_base
+
+    airports = {}
+    for icao, airport in data_manager.airports.items():
+        airport = dict(airport)
+        if airport.get('Clinic'):
+            airport['Healing'] = airport['Healing'] * healing_scale
+            airport['TimeFactor'] = airport['TimeFactor'] * time_factor_scale
+        airports[icao] = airport
+    interconnections = [dict(connection, Health_Cost_Per_Minute=connection['Health_Cost_Per_Minute'] * cost_scale)
+                        for connection in data_manager.interconnections]
+    tuned._snapshot = tuned._build_snapshot(airports, interconnections,
+                                            [dict(risk) for risk in data_manager.departure_risks])
+    return tuned
+
+
+def load_data(snapshot=None, synthetic=None, synthetic_seed=0, tuning=None):
+    # Reference data from a snapshot file, a generated stand-in network, or the database, in that order.
+    if synthetic:
+        stand_in = SQLiteStandIn()
+        try:
+            populate_synthetic_network(stand_in, synthetic, seed=synthetic_seed)
+            data_manager = GameData(connect=stand_in)
+            data_manager.load_from_database()
+            data_manager.pool.close_idle()
+        finally:
+            stand_in.remove()
+    elif snapshot:
+        data_manager = GameData(snapshot_path=snapshot)
+        data_manager.load_from_snapshot_file()
+    else:
+        data_manager = GameData()
+        data_manager.load_from_database()
+    return tune(data_manager, **(tuning or {}))
+
+
+def choose_pairs(data_manager: GameData, count, seed):
+    # Distinct winnable (start, target) pairs, drawn reproducibly from the seed.
+    solver = data_manager.route_solver
+    if not solver.winnable_starts:
+        raise ValueError("No winnable start/target pairs in the loaded data.")
+    rng = GameRandom(seed, 1 << 32)
+    pairs = {}
+    for _ in range(count * 20):
+        start_icao = rng.choice(solver.winnable_starts)
+        pairs.setdefault((start_icao, rng.choice(solver.winnable_targets[start_icao])), None)
+        if len(pairs) == count:
+            break
+    return list(pairs)
+
+
+_worker_data = None
+
+
+def _init_worker(source):
+    # Forked workers inherit the parent's data; anything else loads its own copy once.
+    global _worker_data
+    if _worker_data is None:
+        _worker_data = load_data(**source)
+
+
+def _play_chunk(policy_name, games, max_turns):
+    policy = make_policy(policy_name)
+    return [play(_worker_data, policy, seed, start_icao, target_icao, max_turns)
+            for seed, start_icao, target_icao in games]
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _distribution(values):
+    ordered = sorted(values)
+    return {
+        'mean': sum(ordered) / len(ordered) if ordered else 0.0, 'p5': _percentile(ordered, 0.05),
+        'p50': _percentile(ordered, 0.50), 'p95': _percentile(ordered, 0.95),
+        'min': ordered[0] if ordered else 0.0, 'max': ordered[-1] if ordered else 0.0,
+    }
+
+
+def summarize(results):
+    outcomes = {name: 0 for name in OUTCOMES}
+    for result in results:
+        outcomes[result[2]] += 1
+    wins = [result for result in results if result[2] == 'SUCCESS']
+    return {
+        'games': len(results), 'win_rate': len(wins) / len(results) if results else 0.0, 'outcomes': outcomes,
+        'final_health': _distribution([result[3] for result in results]),
+        'total_time': _distribution([result[4] for result in results]),
+        'win_health': _distribution([result[3] for result in wins]),
+        'win_time': _distribution([result[4] for result in wins]),
+        'turns': _distribution([result[5] for result in results]),
+        'heals_per_game': sum(result[6] for result in results) / len(results) if results else 0.0,
+        'risks_per_game': sum(result[7] for result in results) / len(results) if results else 0.0,
+    }
+
+
+def run_batch(source, policy_name, n_games, seed=1, workers=1, pairs=None, max_turns=MAX_TURNS,
+              chunk_size=CHUNK_SIZE, data_manager=None):
+    # Game i is seeded from (seed, i) and plays pairs[i % len(pairs)], or the pair its seed picks when pairs is
+    # None, so results do not depend on the worker count or on how the games are chunked.
+    global _worker_data
+    data_manager = data_manager or load_data(**source)
+    games = []
+    for game_index in range(n_games):
+        start_icao, target_icao = pairs[game_index % len(pairs)] if pairs else (None, None)
+        games.append((GameRandom(seed, game_index).next_u64(), start_icao, target_icao))
+    chunks = [games[index:index + chunk_size] for index in range(0, n_games, chunk_size)]
+
+    # Set before any pool starts, so fork-started workers share the loaded data copy-on-write.
+    _worker_data = data_manager
+    started = time.perf_counter()
+    if workers <= 1:
+        results = [result for chunk in chunks for result in _play_chunk(policy_name, chunk, max_turns)]
+    else:
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(source,)) as executor:
+            results = [result for chunk_results in executor.map(
+                _play_chunk, [policy_name] * len(chunks), chunks, [max_turns] * len(chunks))
+                for result in chunk_results]
+    seconds = time.perf_counter() - started
+
+    by_pair = {}
+    for result in results:
+        by_pair.setdefault((result[0], result[1]), []).append(result)
+    return {
+        'policy': policy_name, 'games': n_games, 'seed': seed, 'workers': workers, 'seconds': seconds,
+        'games_per_second': n_games / seconds if seconds else 0.0,
+        'overall': summarize(results),
+        'pairs': {f'{start}->{target}': summarize(pair_results)
+                  for (start, target), pair_results in sorted(by_pair.items())},
+    }
+
+
+def print_report(report, show_pairs=10, min_pair_games=10):
+    overall = report['overall']
+    outcomes = overall['outcomes']
+    print(f"{report['policy']:>10}: {report['games']} games in {report['seconds']:.1f}s on {report['workers']} "
+          f"workers ({report['games_per_second']:,.0f} games/s), win rate {overall['win_rate']:.1%}, "
+          f"lost health {outcomes['LOST_HEALTH']}, lost time {outcomes['LOST_TIME']}, "
+          f"stuck/turn limit {outcomes['STUCK'] + outcomes['TURN_LIMIT']}, median health "
+          f"{overall['final_health']['p50']:.1f}, median time {overall['total_time']['p50']:.0f} min")
+    hardest = sorted(((name, pair) for name, pair in report['pairs'].items() if pair['games'] >= min_pair_games),
+                     key=lambda item: (item[1]['win_rate'], item[0]))[:show_pairs]
+    for name, pair in hardest:
+        print(f"{'':12}{name:>11}  {pair['games']:>5} games  win {pair['win_rate']:6.1%}  "
+              f"health p50 {pair['final_health']['p50']:5.1f}  time p50 {pair['total_time']['p50']:5.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play Flight To Heal headlessly with scripted policies.')
+    parser.add_argument('--policies', default='greedy,random,optimal',
+                        help=f"Comma-separated; built in: {', '.join(POLICIES)}, or module:Class.")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--pairs', type=int, help='Spread games evenly over this many fixed winnable pairs '
+                                                  '(default: every game picks its own pair).')
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS)
+    parser.add_argument('--snapshot', help='Precompiled reference data file instead of the database.')
+    parser.add_argument('--synthetic', type=int, help='Generated network with this many airports instead.')
+    parser.add_argument('--synthetic-seed', type=int, default=0)
+    parser.add_argument('--start-health', type=float)
+    parser.add_argument('--healing-time-base', type=float)
+    parser.add_argument('--healing-scale', type=float, default=1.0)
+    parser.add_argument('--time-factor-scale', type=float, default=1.0)
+    parser.add_argument('--cost-scale', type=float, default=1.0, help='Multiplies Health_Cost_Per_Minute.')
+    parser.add_argument('--show-pairs', type=int, default=10, help='Hardest pairs to list per policy.')
+    parser.add_argument('--output', help='Write the full report, with per-pair statistics, as JSON.')
+    args = parser.parse_args()
+
+    source = {
+        'snapshot': args.snapshot, 'synthetic': args.synthetic, 'synthetic_seed': args.synthetic_seed,
+        'tuning': {'start_health': args.start_health, 'healing_time_base': args.healing_time_base,
+                   'healing_scale': args.healing_scale, 'time_factor_scale': args.time_factor_scale,
+                   'cost_scale': args.cost_scale},
+    }
+    data_manager = load_data(**source)
+    pairs = choose_pairs(data_manager, args.pairs, args.seed) if args.pairs else None
+
+    reports = []
+    for policy_name in args.policies.split(','):
+        report = run_batch(source, policy_name, args.games, seed=args.seed, workers=args.workers, pairs=pairs,
+                           max_turns=args.max_turns, data_manager=data_manager)
+        print_report(report, show_pairs=args.show_pairs)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'source': source, 'reports': reports}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import threading
+import time
+from contextlib import nullcontext
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, self.labels)
+
+
+class Metrics:
+    # Minimal thread-safe counter/histogram registry rendered in the Prometheus text format.
+    # Every recording call returns immediately when disabled.
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, metric_type, help_text, buckets=None):
+        self._descriptions[name] = (metric_type, help_text, buckets)
+
+    def add_collector(self, collector):
+        # collector() returns (name, type, help, labels, value) tuples, sampled at scrape time.
+        self._collectors.append(collector)
+
+    def inc(self, name, labels=(), amount=1):
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                buckets = self._descriptions.get(name, (None, None, None))[2] or LATENCY_BUCKETS
+                histogram = self._histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            buckets, counts = histogram[0], histogram[1]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            histogram[2] += value
+            histogram[3] += 1
+
+    def timer(self, name, labels=()):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = tuple(labels) + tuple(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    def _header(self, lines, seen, name, metric_type, help_text):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+    def render(self):
+        lines = []
+        seen = set()
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (value[0], list(value[1]), value[2], value[3]))
+                                for key, value in self._histograms.items())
+
+        for (name, labels), value in counters:
+            _, help_text, _ = self._descriptions.get(name, ('counter', name, None))
+            self._header(lines, seen, name, 'counter', help_text)
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            _, help_text, _ = self._descriptions.get(name, ('histogram', name, None))
+            self._header(lines, seen, name, 'histogram', help_text)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{self._format_labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+
+        for collector in self._collectors:
+            for name, metric_type, help_text, labels, value in collector():
+                self._header(lines, seen, name, metric_type, help_text)
+                lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
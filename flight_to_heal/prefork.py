@@ -0,0 +1,193 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import tempfile
+import time
+
+from werkzeug.serving import make_server
+
+from app import FlightToHealApp, GameData
+from session_store import SharedStateStore, SQLiteKeyValueClient
+
+logger = logging.getLogger(__name__)
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_usage(pid):
+    # kB figures from /proc/<pid>/smaps_rollup (Linux 4.14+). Pss charges each shared page to its sharers in equal
+    # parts, so the Pss of the master plus its workers adds up to what the whole group really occupies.
+    usage = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            name, _, rest = line.partition(':')
+            if name in MEMORY_FIELDS:
+                usage[name] = int(rest.split()[0])
+    return usage
+
+
+class PreforkServer:
+    # Loads the reference data once, then forks worker processes that inherit it copy-on-write and accept
+    # connections from one shared listening socket. Game state goes through a store every worker can read,
+    # because consecutive requests of one game can land on different workers.
+
+    STATE_TTL_SECONDS = 3600
+    RESPAWN_DELAY_SECONDS = 1.0
+
+    def __init__(self, data_manager, workers=4, host='127.0.0.1', port=5000, state_path=None, backlog=1024):
+        self.data_manager = data_manager
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.state_path = state_path or os.path.join(tempfile.gettempdir(), 'flight_to_heal_state.sqlite3')
+        self.backlog = backlog
+        self.socket = None
+        self._pids = {}
+        self._stopping = False
+
+    def _listen(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        listener = socket.socket(family, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(self.backlog)
+        listener.set_inheritable(True)
+        self.port = listener.getsockname()[1]
+        return listener
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid:
+            self._pids[pid] = (index, time.monotonic())
+            return pid
+
+        code = 0
+        try:
+            self._run_worker(index)
+        except BaseException:
+            logger.exception("Worker %d failed.", index)
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _run_worker(self, index):
+        # Ctrl-C reaches the whole process group; only the master reacts to it and then stops the workers.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+        # Until the app installs its reload handler; the master's would forward the signal to sibling workers.
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+        gc.enable()
+
+        state_store = SharedStateStore(SQLiteKeyValueClient(self.state_path), self.STATE_TTL_SECONDS)
+        flight_app = FlightToHealApp(self.data_manager, state_store=state_store)
+        flight_app.refresher.install_signal_handler()
+        server = make_server(self.host, self.port, flight_app.app, threaded=True, fd=self.socket.fileno())
+        logger.info("Worker %d (pid %d) serving on %s:%d.", index, os.getpid(), self.host, self.port)
+        try:
+            server.serve_forever()
+        except SystemExit:
+            pass
+        finally:
+            server.server_close()
+            flight_app.close()
+
+    def _stop(self, signum, frame):
+        self._stopping = True
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _reload(self, signum, frame):
+        # Every worker holds its own snapshot, so each one reloads on its own.
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    def _log_memory(self, signum=None, frame=None):
+        for line in self.memory_report_lines():
+            logger.info(line)
+
+    def memory_report(self):
+        report = {'master': memory_usage(os.getpid())}
+        for pid, (index, _) in sorted(self._pids.items(), key=lambda item: item[1][0]):
+            try:
+                report[f'worker {index}'] = memory_usage(pid)
+            except OSError:
+                continue
+        return report
+
+    def memory_report_lines(self):
+        report = self.memory_report()
+        lines = [f"{'process':10} " + ' '.join(f'{field:>14}' for field in MEMORY_FIELDS) + '   (kB)']
+        for name, usage in report.items():
+            lines.append(f'{name:10} ' + ' '.join(f'{usage.get(field, 0):>14}' for field in MEMORY_FIELDS))
+        lines.append(f"total Pss {sum(usage.get('Pss', 0) for usage in report.values())} kB over "
+                     f"{len(report)} processes")
+        return lines
+
+    def serve(self):
+        self.socket = self._listen()
+        # Idle connections must not be shared with the workers, and everything the master allocated so far is
+        # moved out of the collector's reach so a collection in a worker never writes to those pages.
+        self.data_manager.pool.close_idle()
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGUSR1, self._log_memory)
+        signal.signal(signal.SIGHUP, self._reload)
+        logger.info("Master pid %d starting %d workers on %s:%d; send SIGUSR1 for a memory report, SIGHUP to "
+                    "reload reference data.",
+                    os.getpid(), self.workers, self.host, self.port)
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            while self._pids:
+                pid, status = os.wait()
+                index, started_at = self._pids.pop(pid, (None, None))
+                if index is None or self._stopping:
+                    continue
+                logger.warning("Worker %d (pid %d) exited with status %d, restarting.",
+                               index, pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started_at < self.RESPAWN_DELAY_SECONDS:
+                    time.sleep(self.RESPAWN_DELAY_SECONDS)
+                if not self._stopping:
+                    self._spawn(index)
+        finally:
+            self.socket.close()
+
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Flight To Heal from pre-forked worker processes.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--state-db', help='SQLite file the workers share game state through.')
+    parser.add_argument('--snapshot', help='Precompiled reference data file (see GameData.SNAPSHOT_PATH).')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(process)d %(levelname)s %(message)s')
+
+    # Collections while loading would leave freed holes in pages the workers are meant to share.
+    gc.disable()
+    data_manager = GameData(snapshot_path=args.snapshot)
+    data_manager.load_from_database()
+    PreforkServer(data_manager, workers=args.workers, host=args.host, port=args.port,
+                  state_path=args.state_db).serve()
+
+
+if __name__ == '__main__':
+    main()
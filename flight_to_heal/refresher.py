@@ -0,0 +1,75 @@
+import logging
+import signal
+import threading
+import time
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceDataRefresher:
+    # Background thread that periodically (or on trigger / SIGHUP) asks GameData to reload and swap its snapshot.
+    # An interval of 0 disables polling; the thread then only wakes for triggers.
+
+    def __init__(self, data_manager, interval_seconds=300):
+        self.data_manager = data_manager
+        self.interval_seconds = interval_seconds
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._force = False
+        self._thread = None
+        self.counters = {'checks': 0, 'reloads': 0, 'unchanged': 0, 'failures': 0}
+        self.last_reload_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='reference-data-refresher', daemon=True)
+            self._thread.start()
+
+    def trigger(self, force=True):
+        self._force = self._force or force
+        self.start()
+        self._wake.set()
+
+    def install_signal_handler(self):
+        # `kill -HUP <pid>` reloads now instead of at the next poll. The handler only sets an event, the reload
+        # itself runs on the refresher thread. Signal handlers can only be installed from the main thread.
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.trigger())
+
+    def refresh_now(self, force=False):
+        self.counters['checks'] += 1
+        try:
+            reloaded = self.data_manager.refresh(force=force)
+        except mysql.connector.Error as error:
+            self.counters['failures'] += 1
+            logger.warning("Reference data refresh failed, keeping data version %s: %s",
+                           self.data_manager.data_version, error)
+            return False
+
+        if reloaded:
+            self.counters['reloads'] += 1
+            self.last_reload_at = time.time()
+            logger.info("Reference data reloaded, now at data version %s.", self.data_manager.data_version)
+        else:
+            self.counters['unchanged'] += 1
+        return reloaded
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval_seconds or None)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            force, self._force = self._force, False
+            self.refresh_now(force=force)
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return dict(self.counters, data_version=self.data_manager.data_version, last_reload_at=self.last_reload_at)
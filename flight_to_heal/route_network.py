@@ -0,0 +1,188 @@
+import logging
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+
+class RouteNetwork:
+    # The route graph as flat arrays indexed by interned airport ids. Edges are grouped by departure in CSR form:
+    # the edges leaving airport i are offsets[i]:offsets[i + 1] of the parallel edge columns, in load order.
+    # A few large buffers instead of a dict per route keep the network small, and after a fork the buffers stay
+    # shared with the parent because nothing writes to them (not even a refcount).
+
+    def __init__(self, airports, interconnections):
+        self.icaos = tuple(sys.intern(icao) for icao in airports)
+        self.ids = {icao: airport_id for airport_id, icao in enumerate(self.icaos)}
+
+        self.clinic = array('B', (bool(airport.get('Clinic', False)) for airport in airports.values()))
+        self.healing = array('d', (airport.get('Healing') or 0.0 for airport in airports.values()))
+        self.time_factor = array('d', (airport.get('TimeFactor') or 1.0 for airport in airports.values()))
+
+        # The airport query joins Continent, so an airport without one is missing while its routes are not.
+        known = [connection for connection in interconnections
+                 if connection['Departure_Airport_ID'] in self.ids and connection['Arrival_Airport_ID'] in self.ids]
+        if len(known) < len(interconnections):
+            logger.warning("Ignoring %d routes to or from unknown airports.", len(interconnections) - len(known))
+            interconnections = known
+
+        departures = [self.ids[connection['Departure_Airport_ID']] for connection in interconnections]
+        order = sorted(range(len(interconnections)), key=departures.__getitem__)
+        counts = [0] * (len(self.icaos) + 1)
+        for departure in departures:
+            counts[departure + 1] += 1
+        self.offsets = array('I', counts)
+        for airport_id in range(len(self.icaos)):
+            self.offsets[airport_id + 1] += self.offsets[airport_id]
+
+        self.departures = array('I', (departures[index] for index in order))
+        self.arrivals = array('I', (self.ids[interconnections[index]['Arrival_Airport_ID']] for index in order))
+        self.times = array('i', (interconnections[index]['Time'] for index in order))
+        self.costs = array('d', (interconnections[index]['Health_Cost_Per_Minute'] for index in order))
+        self.health_losses = array('d', (time * cost for time, cost in zip(self.times, self.costs)))
+
+    @property
+    def airport_count(self):
+        return len(self.icaos)
+
+    @property
+    def edge_count(self):
+        return len(self.arrivals)
+
+    def edges_from(self, icao):
+        airport_id = self.ids.get(icao)
+        if airport_id is None:
+            return range(0)
+        return range(self.offsets[airport_id], self.offsets[airport_id + 1])
+
+    def has_departures(self, airport_id):
+        return self.offsets[airport_id + 1] > self.offsets[airport_id]
+
+    def find_edge(self, departure_icao, arrival_icao):
+        # First route between the pair in load order, or None. Out-degrees are small, so a scan beats an index.
+        arrival_id = self.ids.get(arrival_icao)
+        for edge in self.edges_from(departure_icao):
+            if self.arrivals[edge] == arrival_id:
+                return edge
+        return None
+
+    def connection(self, edge):
+        return {
+            'Departure_Airport_ID': self.icaos[self.departures[edge]],
+            'Arrival_Airport_ID': self.icaos[self.arrivals[edge]],
+            'Time': self.times[edge], 'Health_Cost_Per_Minute': self.costs[edge],
+        }
+
+    def route(self, edge):
+        # A route built on demand from the columns, in the shape the per-route dicts used to have.
+        return MappingProxyType(dict(self.connection(edge), Health_Loss=self.health_losses[edge]))
+
+    def routes_from(self, icao):
+        return tuple(self.route(edge) for edge in self.edges_from(icao))
+
+
+class RoutesByDeparture(Mapping):
+    # Read-only {departure icao: routes} view; only airports with departures are keys, as before.
+
+    def __init__(self, network):
+        self._network = network
+
+    def __getitem__(self, icao):
+        routes = self._network.routes_from(icao)
+        if not routes:
+            raise KeyError(icao)
+        return routes
+
+    def __iter__(self):
+        network = self._network
+        return (icao for airport_id, icao in enumerate(network.icaos) if network.has_departures(airport_id))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class IcaoSequence(Sequence):
+    # Airport ids from a shared id buffer, read back as ICAO codes.
+    __slots__ = ('_icaos', '_ids')
+
+    def __init__(self, icaos, ids):
+        self._icaos = icaos
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return IcaoSequence(self._icaos, self._ids[index])
+        return self._icaos[self._ids[index]]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"IcaoSequence({list(self)!r})"
+
+
+class AirportLists(Mapping):
+    # {icao: [icao, ...]} with every list packed into one id buffer, laid out like the network's edges.
+    # Lookups hand out zero-copy slices of that buffer.
+
+    def __init__(self, network, lists):
+        self._network = network
+        ids = network.ids
+        members_by_id = {ids[icao]: members for icao, members in lists.items() if members}
+        offsets = array('I', [0])
+        packed = array('I')
+        for airport_id in range(network.airport_count):
+            packed.extend(ids[member] for member in members_by_id.get(airport_id, ()))
+            offsets.append(len(packed))
+        self._offsets = offsets
+        self._ids = memoryview(packed)
+        self._keys = tuple(network.icaos[airport_id] for airport_id in sorted(members_by_id))
+
+    def __getitem__(self, icao):
+        airport_id = self._network.ids.get(icao)
+        if airport_id is None or self._offsets[airport_id] == self._offsets[airport_id + 1]:
+            raise KeyError(icao)
+        return IcaoSequence(self._network.icaos, self._ids[self._offsets[airport_id]:self._offsets[airport_id + 1]])
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class PackedBlobs(Mapping):
+    # {icao: bytes} concatenated into one buffer in airport id order; lookups return memoryview slices.
+
+    def __init__(self, network, blobs):
+        self._network = network
+        offsets = array('I', [0])
+        parts = []
+        for icao in network.icaos:
+            blob = blobs.get(icao, b'')
+            parts.append(blob)
+            offsets.append(offsets[-1] + len(blob))
+        self._offsets = offsets
+        self._blob = b''.join(parts)
+        self._keys = tuple(icao for icao in network.icaos if blobs.get(icao))
+
+    def __getitem__(self, icao):
+        airport_id = self._network.ids.get(icao)
+        if airport_id is None or self._offsets[airport_id] == self._offsets[airport_id + 1]:
+            raise KeyError(icao)
+        return memoryview(self._blob)[self._offsets[airport_id]:self._offsets[airport_id + 1]]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
@@ -0,0 +1,157 @@
+import heapq
+import threading
+from collections import OrderedDict
+
+from route_network import AirportLists
+
+
+class RouteSolver:
+    ROUTE_CACHE_SIZE = 4096
+    # Bump when a change to the search changes which pairs are winnable, so stored winnable maps are recomputed.
+    VERSION = 1
+
+    def __init__(self, data_manager):
+        self.data = data_manager
+        self.network = data_manager.route_network
+        self.airports = data_manager.airports
+        self.max_time = data_manager.MAXIMUM_TIME_MINUTES
+        self.max_health = data_manager.START_HEALTH
+
+        self.winnable_targets = {}
+        self.winnable_starts = ()
+        self._route_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def parameters_key(cls, data_manager):
+        # Everything besides the network that the winnable map depends on.
+        return (cls.VERSION, float(data_manager.START_HEALTH), float(data_manager.MAXIMUM_TIME_MINUTES),
+                float(data_manager.HEALING_TIME_BASE))
+
+    def _healing_step(self, airport_id):
+        network = self.network
+        if not network.clinic[airport_id]:
+            return None
+        time_cost = int(round(self.data.HEALING_TIME_BASE * network.time_factor[airport_id]))
+        return time_cost, network.healing[airport_id]
+
+    def _search(self, start_icao, health, elapsed, target_icao=None):
+        # Label-setting search with time and health as dual costs. Labels are settled in time order, so a
+        # label is Pareto-optimal at its airport iff it carries more health than every label settled there.
+        # Airports are network ids and flights are edge indexes, so the search reads the arrays directly.
+        network = self.network
+        offsets, arrivals, times, health_losses = network.offsets, network.arrivals, network.times, \
+            network.health_losses
+        start_id = network.ids[start_icao]
+        target_id = network.ids.get(target_icao)
+        labels = [(start_id, elapsed, health, None, None)]
+        heap = [(elapsed, -health, 0)]
+        best_health = [0.0] * network.airport_count
+        settled = {}
+
+        while heap:
+            time_total, negative_health, label_id = heapq.heappop(heap)
+            airport_id = labels[label_id][0]
+            current_health = -negative_health
+            if current_health <= best_health[airport_id]:
+                continue
+            best_health[airport_id] = current_health
+            settled.setdefault(airport_id, []).append(label_id)
+
+            if airport_id == target_id:
+                continue
+
+            healing = self._healing_step(airport_id)
+            if healing and current_health < self.max_health:
+                time_cost, health_gain = healing
+                healed_time = time_total + time_cost
+                if healed_time < self.max_time:
+                    healed_health = min(self.max_health, current_health + health_gain)
+                    labels.append((airport_id, healed_time, healed_health, label_id,
+                                   ('heal', time_cost, health_gain)))
+                    heapq.heappush(heap, (healed_time, -healed_health, len(labels) - 1))
+
+            for edge in range(offsets[airport_id], offsets[airport_id + 1]):
+                arrival_id = arrivals[edge]
+                arrival_time = time_total + times[edge]
+                arrival_health = current_health - health_losses[edge]
+                if arrival_health <= 0 or arrival_time >= self.max_time:
+                    continue
+                if arrival_health <= best_health[arrival_id]:
+                    continue
+                labels.append((arrival_id, arrival_time, arrival_health, label_id, ('fly', edge)))
+                heapq.heappush(heap, (arrival_time, -arrival_health, len(labels) - 1))
+
+        return labels, settled
+
+    def _build_route(self, labels, label_id):
+        network = self.network
+        _, time_total, health, _, _ = labels[label_id]
+        steps = []
+        while labels[label_id][3] is not None:
+            step_id, step_time, step_health, parent_id, action = labels[label_id]
+            if action[0] == 'heal':
+                steps.append({'action': 'heal', 'icao': network.icaos[step_id], 'time': action[1],
+                              'health_gain': round(action[2], 2),
+                              'time_total': step_time, 'health': round(step_health, 2)})
+            else:
+                edge = action[1]
+                steps.append({'action': 'fly', 'from_icao': network.icaos[network.departures[edge]],
+                              'to_icao': network.icaos[network.arrivals[edge]], 'time': network.times[edge],
+                              'health_loss': round(network.health_losses[edge], 2),
+                              'time_total': step_time, 'health': round(step_health, 2)})
+            label_id = parent_id
+        steps.reverse()
+        return {'total_time': time_total, 'final_health': round(health, 2), 'steps': steps}
+
+    def solve(self, start_icao, target_icao, health=None, elapsed=0):
+        health = self.max_health if health is None else health
+        if start_icao not in self.airports or target_icao not in self.airports:
+            return []
+        if start_icao == target_icao:
+            return [{'total_time': elapsed, 'final_health': round(health, 2), 'steps': []}]
+
+        cache_key = (start_icao, target_icao, health, elapsed)
+        # Requests share the cache; the search itself runs outside the lock.
+        with self._cache_lock:
+            routes = self._route_cache.get(cache_key)
+            if routes is not None:
+                self._route_cache.move_to_end(cache_key)
+                return routes
+
+        labels, settled = self._search(start_icao, health, elapsed, target_icao)
+        routes = [self._build_route(labels, label_id)
+                  for label_id in settled.get(self.network.ids[target_icao], ())]
+
+        with self._cache_lock:
+            self._route_cache[cache_key] = routes
+            while len(self._route_cache) > self.ROUTE_CACHE_SIZE:
+                self._route_cache.popitem(last=False)
+        return routes
+
+    def reachable_targets(self, start_icao, health=None, elapsed=0):
+        health = self.max_health if health is None else health
+        _, settled = self._search(start_icao, health, elapsed)
+        icaos = self.network.icaos
+        return frozenset(icaos[airport_id] for airport_id in settled if icaos[airport_id] != start_icao)
+
+    def is_winnable(self, start_icao, target_icao):
+        return target_icao in self.winnable_targets.get(start_icao, ())
+
+    def use_precomputed(self, winnable_targets):
+        # Adopts a winnable map computed earlier against identical data (e.g. from a snapshot file).
+        self.winnable_targets = AirportLists(self.network, winnable_targets)
+        self.winnable_starts = tuple(self.winnable_targets)
+        return self
+
+    def precompute(self, start_icaos=None):
+        start_icaos = self.data.valid_start_icaos if start_icaos is None else start_icaos
+        winnable_targets = {}
+        for start_icao in start_icaos:
+            targets = self.reachable_targets(start_icao)
+            if targets:
+                winnable_targets[start_icao] = tuple(icao for icao in self.airports if icao in targets)
+        # Packed into one id buffer: the map has an entry per start/target pair and would dominate memory as tuples.
+        self.winnable_targets = AirportLists(self.network, winnable_targets)
+        self.winnable_starts = tuple(self.winnable_targets)
+        return self
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryStateStore:
+    # In-process LRU of serialized game states with a sliding TTL.
+
+    def __init__(self, ttl_seconds, max_entries=100000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def get(self, game_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(game_id)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._entries[game_id]
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(game_id)
+            self.counters['hits'] += 1
+            return payload
+
+    def set(self, game_id, payload):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[game_id] = (now + self.ttl_seconds, payload)
+            self._entries.move_to_end(game_id)
+            while self._entries:
+                oldest_id, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at <= now:
+                    self.counters['expired'] += 1
+                elif len(self._entries) > self.max_entries:
+                    self.counters['evicted'] += 1
+                else:
+                    break
+                del self._entries[oldest_id]
+
+    def delete(self, game_id):
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+
+class SharedStateStore:
+    # Store backed by a Redis-style client (get / setex / delete), shared by every worker process.
+
+    def __init__(self, client, ttl_seconds, key_prefix='flight_to_heal:game:'):
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds)
+        self.key_prefix = key_prefix
+
+    def _key(self, game_id):
+        return f"{self.key_prefix}{game_id}"
+
+    def get(self, game_id):
+        return self.client.get(self._key(game_id))
+
+    def set(self, game_id, payload):
+        self.client.setex(self._key(game_id), self.ttl_seconds, payload)
+
+    def delete(self, game_id):
+        self.client.delete(self._key(game_id))
+
+
+class SQLiteKeyValueClient:
+    # Local stand-in for a Redis client: a SQLite file that several processes can share.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM kv_store WHERE key = ? AND expires_at > ?', (key, time.time())).fetchone()
+        return bytes(row[0]) if row else None
+
+    def setex(self, key, seconds, value):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO kv_store (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + seconds))
+
+    def delete(self, *keys):
+        self._connection().executemany('DELETE FROM kv_store WHERE key = ?', [(key,) for key in keys])
+
+    def purge_expired(self):
+        self._connection().execute('DELETE FROM kv_store WHERE expires_at <= ?', (time.time(),))
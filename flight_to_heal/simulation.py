@@ -0,0 +1,268 @@
+import argparse
+import time
+
+import numpy as np
+
+from app import GameData, GameState
+from game_random import GameRandom
+
+ACTIVE, SUCCESS, LOST_HEALTH, LOST_TIME = 0, 1, 2, 3
+OUTCOME_NAMES = {ACTIVE: 'INCOMPLETE', SUCCESS: 'SUCCESS', LOST_HEALTH: 'LOST_HEALTH', LOST_TIME: 'LOST_TIME'}
+RISK_POLICIES = ('proceed', 'cancel_retry')
+
+FLY, HEAL = 0, 1
+
+
+def _route_steps(route):
+    return route['steps'] if isinstance(route, dict) else route
+
+
+def compile_route(data_manager, start_icao, route):
+    # Turns solver-style steps into flat per-step arrays: kind, time cost, health delta, arrives-at-target.
+    kinds, times, health_deltas, destinations = [], [], [], []
+    location = start_icao
+    for step in _route_steps(route):
+        if step['action'] == 'heal':
+            airport = data_manager.airports[location]
+            if not airport.get('Clinic', False):
+                raise ValueError(f"Cannot heal at {location}: no clinic.")
+            kinds.append(HEAL)
+            times.append(int(round(data_manager.HEALING_TIME_BASE * airport.get('TimeFactor', 1.0))))
+            health_deltas.append(airport.get('Healing', 0.0))
+            destinations.append(location)
+        else:
+            flight = data_manager.get_route(location, step['to_icao'])
+            if flight is None:
+                raise ValueError(f"No flight from {location} to {step['to_icao']}.")
+            kinds.append(FLY)
+            times.append(flight['Time'])
+            health_deltas.append(-flight['Health_Loss'])
+            destinations.append(step['to_icao'])
+            location = step['to_icao']
+    return (np.array(kinds, dtype=np.int8), np.array(times, dtype=np.int64),
+            np.array(health_deltas, dtype=np.float64), destinations)
+
+
+def _risk_arrays(risks):
+    return (np.array([risk['Probability'] for risk in risks], dtype=np.float64),
+            np.array([risk['TimePenalty'] for risk in risks], dtype=np.int64),
+            np.array([risk['HealthPenalty'] for risk in risks], dtype=np.float64))
+
+
+def _end_games(outcome, active, health, total_time, max_time):
+    lost_health = active & (health <= 0)
+    outcome[lost_health] = LOST_HEALTH
+    lost_time = active & ~lost_health & (total_time >= max_time)
+    outcome[lost_time] = LOST_TIME
+    return active & ~lost_health & ~lost_time
+
+
+def _simulate_chunk(rng, n_games, compiled, risks, target_icao, data_manager, health, elapsed,
+                    risk_policy, max_retries):
+    kinds, times, health_deltas, destinations = compiled
+    probabilities, time_penalties, health_penalties = risks
+    max_time = data_manager.MAXIMUM_TIME_MINUTES
+    max_health = data_manager.START_HEALTH
+
+    health = np.full(n_games, health, dtype=np.float64)
+    total_time = np.full(n_games, elapsed, dtype=np.int64)
+    outcome = np.zeros(n_games, dtype=np.int8)
+    active = np.ones(n_games, dtype=bool)
+
+    for step in range(len(kinds)):
+        if kinds[step] == HEAL:
+            total_time[active] += times[step]
+            health[active] = np.minimum(max_health, health[active] + health_deltas[step])
+            active = _end_games(outcome, active, health, total_time, max_time)
+            continue
+
+        # Departure risk check; under cancel_retry a hit cancels the flight and the check is repeated.
+        attempts = max_retries + 1 if risk_policy == 'cancel_retry' else 1
+        checking = active.copy()
+        for _ in range(attempts):
+            if len(probabilities) == 0 or not checking.any():
+                break
+            draws = rng.random((int(checking.sum()), len(probabilities)))
+            hits = draws < probabilities
+            hit_any = hits.any(axis=1)
+            first_hit = hits.argmax(axis=1)
+            indices = np.flatnonzero(checking)
+            hit_indices = indices[hit_any]
+            total_time[hit_indices] += time_penalties[first_hit[hit_any]]
+            health[hit_indices] -= health_penalties[first_hit[hit_any]]
+            active = _end_games(outcome, active, health, total_time, max_time)
+            checking = np.zeros(n_games, dtype=bool)
+            checking[hit_indices] = True
+            checking &= active
+
+        total_time[active] += times[step]
+        health[active] += health_deltas[step]
+        active = _end_games(outcome, active, health, total_time, max_time)
+        if destinations[step] == target_icao:
+            outcome[active] = SUCCESS
+            active[:] = False
+
+    return outcome, health, total_time
+
+
+def _distribution(values):
+    percentiles = np.percentile(values, [5, 50, 95]) if len(values) else [0.0, 0.0, 0.0]
+    return {
+        'mean': float(values.mean()) if len(values) else 0.0,
+        'p5': float(percentiles[0]), 'p50': float(percentiles[1]), 'p95': float(percentiles[2]),
+        'min': float(values.min()) if len(values) else 0.0, 'max': float(values.max()) if len(values) else 0.0,
+    }
+
+
+def simulate_route(data_manager: GameData, start_icao, target_icao, route, n_games=100000, seed=None,
+                   risk_policy='proceed', max_retries=3, health=None, elapsed=0, chunk_size=1000000):
+    if risk_policy not in RISK_POLICIES:
+        raise ValueError(f"Unknown risk policy {risk_policy!r}; expected one of {RISK_POLICIES}.")
+    health = data_manager.START_HEALTH if health is None else health
+
+    compiled = compile_route(data_manager, start_icao, route)
+    risks = _risk_arrays(data_manager.departure_risks)
+    rng = np.random.default_rng(seed)
+
+    outcomes, final_health, total_time = [], [], []
+    remaining = n_games
+    while remaining > 0:
+        chunk = min(chunk_size, remaining)
+        chunk_outcome, chunk_health, chunk_time = _simulate_chunk(
+            rng, chunk, compiled, risks, target_icao, data_manager, health, elapsed, risk_policy, max_retries)
+        outcomes.append(chunk_outcome)
+        final_health.append(chunk_health)
+        total_time.append(chunk_time)
+        remaining -= chunk
+
+    outcomes = np.concatenate(outcomes)
+    final_health = np.concatenate(final_health)
+    total_time = np.concatenate(total_time)
+    counts = np.bincount(outcomes, minlength=len(OUTCOME_NAMES))
+
+    return {
+        'games': n_games, 'seed': seed, 'risk_policy': risk_policy,
+        'outcomes': {OUTCOME_NAMES[code]: int(counts[code]) for code in OUTCOME_NAMES},
+        'success_rate': float(counts[SUCCESS]) / n_games if n_games else 0.0,
+        'final_health': _distribution(final_health),
+        'total_time': _distribution(total_time),
+        'success_total_time': _distribution(total_time[outcomes == SUCCESS]),
+    }
+
+
+def replay_route(data_manager: GameData, start_icao, target_icao, route, n_games=1000, seed=None,
+                 risk_policy='proceed', max_retries=3):
+    # Reference implementation: plays the route through GameState one game at a time, as the Flask handlers do.
+    # Game i draws from its own stream seeded from (seed, i), so any single game can be re-run on its own.
+    base_seed = GameRandom.new_seed() if seed is None else seed
+    counts = {name: 0 for name in OUTCOME_NAMES.values()}
+    for game_index in range(n_games):
+        state = GameState(data_manager, GameRandom(base_seed, game_index).next_u64())
+        state.current_location_icao = start_icao
+        state.target_hospital_icao = target_icao
+
+        for step in _route_steps(route):
+            if state.is_game_over:
+                break
+            if step['action'] == 'heal':
+                state.execute_healing()
+                continue
+
+            flight = state.get_flight_info(state.current_location_icao, step['to_icao'])
+            attempts = max_retries + 1 if risk_policy == 'cancel_retry' else 1
+            for _ in range(attempts):
+                risk = state.check_risk(data_manager.departure_risks)
+                if not risk:
+                    break
+                if state.apply_departure_risk(risk):
+                    break
+            if state.is_game_over:
+                break
+            state.execute_flight({'Destination_ICAO': step['to_icao'], 'Time': flight['Time'],
+                                  'Health_Loss': flight['Health_Loss']})
+
+        counts[state.outcome or 'INCOMPLETE'] += 1
+    return counts
+
+
+def replay_actions(data_manager: GameData, seed, actions):
+    # Re-plays a game from its seed and action list (risk_check / fly_execute / fly_cancel / heal, as returned by
+    # event_log.actions_from_events) with the same rules and random draws as the Flask handlers.
+    state = GameState(data_manager, seed)
+    state.initialize()
+    for step in actions:
+        if state.is_game_over:
+            break
+        action_type, target_icao = step['action'], step.get('target_icao')
+        if action_type == 'risk_check':
+            if state.get_flight_info(state.current_location_icao, target_icao):
+                risk = state.check_risk(data_manager.departure_risks)
+                if risk:
+                    state.apply_departure_risk(risk)
+        elif action_type == 'fly_execute':
+            flight = state.get_flight_info(state.current_location_icao, target_icao)
+            if flight:
+                state.execute_flight({'Destination_ICAO': target_icao, 'Time': flight['Time'],
+                                      'Health_Loss': flight['Health_Loss']})
+        elif action_type == 'heal':
+            if data_manager.airports[state.current_location_icao].get('Clinic', False):
+                state.execute_healing()
+    state.messages = []
+    return state
+
+
+def benchmark(data_manager, start_icao, target_icao, route, n_games=1000000, replay_games=20000, seed=1):
+    started = time.perf_counter()
+    vectorized = simulate_route(data_manager, start_icao, target_icao, route, n_games=n_games, seed=seed)
+    vectorized_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    replayed = replay_route(data_manager, start_icao, target_icao, route, n_games=replay_games, seed=seed)
+    replay_seconds = time.perf_counter() - started
+
+    vectorized_rate = n_games / vectorized_seconds
+    replay_rate = replay_games / replay_seconds
+    return {
+        'vectorized': {'games': n_games, 'seconds': vectorized_seconds, 'games_per_second': vectorized_rate,
+                       'success_rate': vectorized['success_rate']},
+        'replay': {'games': replay_games, 'seconds': replay_seconds, 'games_per_second': replay_rate,
+                   'success_rate': replayed['SUCCESS'] / replay_games},
+        'speedup': vectorized_rate / replay_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo simulation of Flight To Heal routes.')
+    parser.add_argument('--start', help='Start airport ICAO (default: first winnable start).')
+    parser.add_argument('--target', help='Target airport ICAO (default: first winnable target).')
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--replay-games', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--risk-policy', choices=RISK_POLICIES, default='proceed')
+    args = parser.parse_args()
+
+    data_manager = GameData()
+    data_manager.load_from_database()
+    solver = data_manager.route_solver
+    start_icao = args.start or solver.winnable_starts[0]
+    target_icao = args.target or solver.winnable_targets[start_icao][0]
+    routes = solver.solve(start_icao, target_icao)
+    if not routes:
+        parser.error(f"No winnable route from {start_icao} to {target_icao}.")
+
+    for route in routes:
+        result = simulate_route(data_manager, start_icao, target_icao, route, n_games=args.games,
+                                seed=args.seed, risk_policy=args.risk_policy)
+        print(f"Route {start_icao}->{target_icao} ({len(route['steps'])} steps, {route['total_time']} min planned): "
+              f"success {result['success_rate']:.2%}, outcomes {result['outcomes']}, "
+              f"median health {result['final_health']['p50']:.2f}, median time {result['total_time']['p50']:.0f}")
+
+    report = benchmark(data_manager, start_icao, target_icao, routes[0], n_games=args.games,
+                       replay_games=args.replay_games, seed=args.seed)
+    print(f"Vectorized: {report['vectorized']['games_per_second']:,.0f} games/s, "
+          f"GameState replay: {report['replay']['games_per_second']:,.0f} games/s, "
+          f"speedup {report['speedup']:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import json
+import os
+import struct
+import tempfile
+from array import array
+
+# Precompiled reference data, so a worker can start without querying the database or rebuilding the derived maps.
+# Every section is a packed little-endian array. Reading decodes the whole file into the plain dicts and lists
+# GameData builds from the database; nothing refers back to the file once it is loaded.
+#
+#   header      MAGIC, version, then the section counts and the string indexes of the content hash / fingerprint
+#   solver key  solver version, start health, time limit and healing base time the winnable map was computed
+#               with (version 0: unknown); the map is only valid for the same game parameters
+#   strings     uint32 offsets (count + 1), then the UTF-8 blob they index
+#   airports    AIRPORT records; string fields are string-table indexes, NO_STRING for NULL
+#   routes      ROUTE records; airports are airport-record indexes
+#   risks       RISK records
+#   winnable    WINNABLE (start airport index, target count) records, then all target indexes as uint32
+#   options     uint32 offsets (airports + 1), then each airport's pre-encoded flight option JSON (empty if none)
+MAGIC = b'FTHR'
+FORMAT_VERSION = 2
+NO_STRING = 0xFFFFFFFF
+
+HEADER = struct.Struct('<4sHHIIIIIIII')
+SOLVER_KEY = struct.Struct('<Hddd')
+AIRPORT = struct.Struct('<IIIIddBdd')
+ROUTE = struct.Struct('<IIid')
+RISK = struct.Struct('<Idid')
+WINNABLE = struct.Struct('<II')
+
+
+class _StringTable:
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        if value is None:
+            return NO_STRING
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+    def pack(self):
+        return _pack_blobs([value.encode('utf-8') for value in self.values])
+
+
+def _pack_blobs(blobs):
+    offsets = array('I', [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets.tobytes() + b''.join(blobs)
+
+
+def _unpack_blobs(view, offset, count):
+    # Returns the blobs as memoryview slices and the offset just past the section.
+    offsets = array('I')
+    offsets.frombytes(view[offset:offset + 4 * (count + 1)])
+    start = offset + 4 * (count + 1)
+    return [view[start + offsets[i]:start + offsets[i + 1]] for i in range(count)], start + offsets[-1]
+
+
+def write_snapshot(path, airports, interconnections, departure_risks, content_hash, fingerprint=None,
+                   winnable_targets=None, flight_options_json=None, solver_key=None):
+    strings = _StringTable()
+    airport_index = {icao: position for position, icao in enumerate(airports)}
+
+    airport_records = b''.join(AIRPORT.pack(
+        strings.add(icao), strings.add(airport['Name']), strings.add(airport.get('Continent')),
+        strings.add(airport.get('Country')), airport['Latitude'], airport['Longitude'],
+        int(bool(airport.get('Clinic', False))), airport.get('Healing', 0.0), airport.get('TimeFactor', 1.0),
+    ) for icao, airport in airports.items())
+    route_records = b''.join(ROUTE.pack(
+        airport_index[route['Departure_Airport_ID']], airport_index[route['Arrival_Airport_ID']],
+        route['Time'], route['Health_Cost_Per_Minute'],
+    ) for route in interconnections)
+    risk_records = b''.join(RISK.pack(
+        strings.add(risk['Name']), risk['Probability'], risk['TimePenalty'], risk['HealthPenalty'],
+    ) for risk in departure_risks)
+
+    winnable_targets = winnable_targets or {}
+    winnable_records = b''.join(WINNABLE.pack(airport_index[start], len(targets))
+                                for start, targets in winnable_targets.items())
+    winnable_indexes = array('I', (airport_index[target] for targets in winnable_targets.values()
+                                   for target in targets))
+
+    flight_options_json = flight_options_json or {}
+    options = _pack_blobs([bytes(flight_options_json.get(icao, b'')) for icao in airports])
+
+    hash_index = strings.add(content_hash)
+    fingerprint_index = strings.add(None if fingerprint is None else json.dumps(fingerprint))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(strings.values), len(airports), len(interconnections),
+                         len(departure_risks), len(winnable_targets), len(winnable_indexes), hash_index,
+                         fingerprint_index)
+    solver_key = SOLVER_KEY.pack(*(solver_key or (0, 0.0, 0.0, 0.0)))
+
+    # Written beside the target and renamed into place, so a reader never sees a half-written file.
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            for part in (header, solver_key, strings.pack(), airport_records, route_records, risk_records,
+                         winnable_records, winnable_indexes.tobytes(), options):
+                output.write(part)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def read_snapshot(path):
+    # Returns the reference data as GameData uses it, plus the stored content hash, fingerprint, winnable map and
+    # the solver key the map was computed with.
+    # Raises OSError if the file is missing and ValueError if it is not a snapshot this version can read.
+    with open(path, 'rb') as source:
+        contents = source.read()
+    try:
+        return _parse(memoryview(contents))
+    except struct.error as error:
+        raise ValueError(f"Truncated reference snapshot {path}: {error}")
+
+
+def _parse(view):
+    (magic, version, _, n_strings, n_airports, n_routes, n_risks, n_winnable, n_winnable_targets,
+     hash_index, fingerprint_index) = HEADER.unpack_from(view)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"Not a version {FORMAT_VERSION} reference snapshot.")
+    solver_key = SOLVER_KEY.unpack_from(view, HEADER.size)
+    offset = HEADER.size + SOLVER_KEY.size
+
+    blobs, offset = _unpack_blobs(view, offset, n_strings)
+    strings = [str(blob, 'utf-8') for blob in blobs]
+
+    def text(index):
+        return None if index == NO_STRING else strings[index]
+
+    airports = {}
+    icaos = []
+    end = offset + AIRPORT.size * n_airports
+    for icao, name, continent, country, latitude, longitude, clinic, healing, time_factor in \
+            AIRPORT.iter_unpack(view[offset:end]):
+        airport = {'Name': text(name), 'Continent': text(continent), 'Country': text(country),
+                   'Latitude': latitude, 'Longitude': longitude, 'Clinic': bool(clinic)}
+        if clinic:
+            airport.update({'Healing': healing, 'TimeFactor': time_factor})
+        icaos.append(strings[icao])
+        airports[strings[icao]] = airport
+    offset = end
+
+    end = offset + ROUTE.size * n_routes
+    interconnections = [{
+        'Departure_Airport_ID': icaos[departure], 'Arrival_Airport_ID': icaos[arrival],
+        'Time': travel_time, 'Health_Cost_Per_Minute': cost,
+    } for departure, arrival, travel_time, cost in ROUTE.iter_unpack(view[offset:end])]
+    offset = end
+
+    end = offset + RISK.size * n_risks
+    departure_risks = [{
+        'Name': strings[name], 'Probability': probability, 'TimePenalty': time_penalty,
+        'HealthPenalty': health_penalty,
+    } for name, probability, time_penalty, health_penalty in RISK.iter_unpack(view[offset:end])]
+    offset = end
+
+    end = offset + WINNABLE.size * n_winnable
+    starts = list(WINNABLE.iter_unpack(view[offset:end]))
+    offset = end
+    targets = array('I')
+    targets.frombytes(view[offset:offset + 4 * n_winnable_targets])
+    offset += 4 * n_winnable_targets
+    winnable_targets = {}
+    position = 0
+    for start, count in starts:
+        winnable_targets[icaos[start]] = tuple(icaos[index] for index in targets[position:position + count])
+        position += count
+
+    blobs, offset = _unpack_blobs(view, offset, n_airports)
+    flight_options_json = {icao: bytes(blob) for icao, blob in zip(icaos, blobs) if len(blob)}
+
+    fingerprint = text(fingerprint_index)
+    return {
+        'airports': airports, 'interconnections': interconnections, 'departure_risks': departure_risks,
+        'content_hash': strings[hash_index],
+        'fingerprint': None if fingerprint is None else tuple(tuple(pair) for pair in json.loads(fingerprint)),
+        'winnable_targets': winnable_targets if n_winnable else None,
+        'flight_options_json': flight_options_json,
+        'solver_key': solver_key if solver_key[0] else None,
+    }
@@ -0,0 +1,118 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0
+_HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def _unit_vector(latitude, longitude):
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    cos_lat = math.cos(lat)
+    return cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat)
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(distance_km):
+    return 2 * math.sin(min(distance_km, _HALF_CIRCUMFERENCE_KM) / (2 * EARTH_RADIUS_KM))
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    return _chord_to_km(math.dist(_unit_vector(latitude, longitude), _unit_vector(other_latitude, other_longitude)))
+
+
+class SpatialIndex:
+    # Fixed latitude/longitude grid over the airports. Cells narrow the candidates to the query's neighbourhood;
+    # distances are compared as chords between unit-sphere vectors, so no trigonometry runs per candidate.
+
+    def __init__(self, airports, cell_degrees=2.0):
+        self.cell_degrees = cell_degrees
+        self._columns = int(math.ceil(360.0 / cell_degrees))
+        self._cells = {}
+        self.size = 0
+        for icao, airport in airports.items():
+            latitude, longitude = airport.get('Latitude'), airport.get('Longitude')
+            if latitude is None or longitude is None:
+                continue
+            entry = (icao, latitude, longitude) + _unit_vector(latitude, longitude)
+            self._cells.setdefault(self._cell(latitude, longitude), []).append(entry)
+            self.size += 1
+
+    def _row(self, latitude):
+        return int(math.floor((min(max(latitude, -90.0), 90.0) + 90.0) / self.cell_degrees))
+
+    def _column(self, longitude):
+        return int(math.floor(((longitude + 180.0) % 360.0) / self.cell_degrees)) % self._columns
+
+    def _cell(self, latitude, longitude):
+        return self._row(latitude), self._column(longitude)
+
+    def _columns_between(self, west, east):
+        first, last = self._column(west), self._column(east)
+        if east - west >= 360.0:
+            return range(self._columns)
+        if first <= last and west <= east:
+            return range(first, last + 1)
+        # The box wraps across the antimeridian.
+        return list(range(first, self._columns)) + list(range(0, last + 1))
+
+    def _candidates(self, south, west, north, east):
+        cells = self._cells
+        for row in range(self._row(south), self._row(north) + 1):
+            for column in self._columns_between(west, east):
+                entries = cells.get((row, column))
+                if entries:
+                    yield from entries
+
+    def within(self, latitude, longitude, radius_km):
+        # (icao, distance_km) pairs within radius_km, nearest first.
+        radius_degrees = math.degrees(min(radius_km, _HALF_CIRCUMFERENCE_KM) / EARTH_RADIUS_KM)
+        south, north = latitude - radius_degrees, latitude + radius_degrees
+        if south <= -90.0 or north >= 90.0:
+            west, east = -180.0, 180.0
+        else:
+            # Widest longitude offset of a spherical cap: asin(sin r / cos latitude).
+            span = math.degrees(math.asin(min(1.0, math.sin(math.radians(radius_degrees))
+                                              / math.cos(math.radians(latitude)))))
+            west, east = longitude - span, longitude + span
+
+        x, y, z = _unit_vector(latitude, longitude)
+        limit = _km_to_chord(radius_km) ** 2
+        found = []
+        for icao, _, _, ax, ay, az in self._candidates(south, west, north, east):
+            squared = (ax - x) ** 2 + (ay - y) ** 2 + (az - z) ** 2
+            if squared <= limit:
+                found.append((squared, icao))
+        found.sort()
+        return [(icao, _chord_to_km(math.sqrt(squared))) for squared, icao in found]
+
+    def nearest(self, latitude, longitude, count=1, exclude=(), max_km=None):
+        # Grows the search radius until `count` results are inside it; everything nearer is then guaranteed found.
+        max_km = _HALF_CIRCUMFERENCE_KM if max_km is None else min(max_km, _HALF_CIRCUMFERENCE_KM)
+        radius_km = min(max_km, self.cell_degrees * 111.0)
+        while True:
+            found = [item for item in self.within(latitude, longitude, radius_km) if item[0] not in exclude]
+            if len(found) >= count or radius_km >= max_km:
+                return found[:count]
+            radius_km = min(max_km, radius_km * 2)
+
+    def iter_box(self, south, west, north, east):
+        # Lazily yields (icao, latitude, longitude) inside a box, cell by cell, so callers can stream the result.
+        # west > east means the box crosses the antimeridian.
+        wraps = west > east
+        for icao, latitude, longitude, _, _, _ in self._candidates(south, west, north, east):
+            if not south <= latitude <= north:
+                continue
+            if (wraps and west > longitude > east) or (not wraps and not west <= longitude <= east):
+                continue
+            yield icao, latitude, longitude
+
+    def in_box(self, south, west, north, east, limit=None):
+        # ICAOs inside a map viewport.
+        result = []
+        for icao, _, _ in self.iter_box(south, west, north, east):
+            result.append(icao)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
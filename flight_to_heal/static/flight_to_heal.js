@@ -1,9 +1,15 @@
 'use strict'
 let mymap;
 let airportMarkers = new L.LayerGroup();
+let clinicMarkers = new L.LayerGroup();
 
 const airportCoords = {};
 
+// live status stream of the current game; while it is open, actions get a short reply and the UI follows the stream
+let statusStream = null;
+let streamReady = false;
+let gameView = null;
+
 const startButton = document.getElementById('start-button');
 const startScreen = document.getElementById('start-screen');
 const gameScreen = document.getElementById('game-screen');
@@ -95,7 +101,28 @@ function initializeLeafletMap() {
         maxZoom: 18,
         attribution: '© OpenStreetMap contributors'
     }).addTo(mymap);
+    clinicMarkers.addTo(mymap);
     airportMarkers.addTo(mymap);
+    mymap.on('moveend', loadClinicsInView);
+}
+
+// show the clinics inside the visible map area only, instead of downloading every airport up front
+async function loadClinicsInView() {
+    const bounds = mymap.getBounds();
+    const query = new URLSearchParams({
+        south: bounds.getSouth(), west: bounds.getWest(), north: bounds.getNorth(), east: bounds.getEast(),
+        clinic_only: 'true', limit: 500
+    });
+    const data = await apiCall(`/api/airports_in_view?${query}`, 'GET');
+    if (!data) return;
+
+    clinicMarkers.clearLayers();
+    Object.entries(data.airports).forEach(([icao, [lat, lon]]) => {
+        airportCoords[icao] = [lat, lon];
+        L.circleMarker([lat, lon], { radius: 4, color: '#28a745', weight: 1, fillOpacity: 0.6 })
+            .addTo(clinicMarkers)
+            .bindPopup(`<b>Clinic</b> (${icao})`);
+    });
 }
 
 // Tasks of function cleanup, validation, show current and target markers and options.
@@ -103,6 +130,8 @@ function updateMap(status, options) {
     airportMarkers.clearLayers();
     const currentICAO = status.current_icao;
     const targetICAO = status.target_icao;
+    if (status.current_coords) airportCoords[currentICAO] = status.current_coords;
+    if (status.target_coords) airportCoords[targetICAO] = status.target_coords;
     let currentLocationCoordinates = airportCoords[currentICAO];
     let targetCoordinates = airportCoords[targetICAO];
 
@@ -124,9 +153,10 @@ function updateMap(status, options) {
 
     options.forEach(option => {
         const destICAO = option.Destination_ICAO;
+        if (option.Latitude !== undefined) airportCoords[destICAO] = [option.Latitude, option.Longitude];
         const destCoords = airportCoords[destICAO];
         if (destCoords) {
-            const destIsClinic = !!airportCoords[destICAO].Clinic; // Check if the destination has clinic data
+            const destIsClinic = !!option.Clinic; // Check if the destination has clinic data
             const markerType = destIsClinic ? 'option_clinic' : 'option';
 
             const marker = L.marker(destCoords, { icon: iconFactory(markerType) })
@@ -156,6 +186,7 @@ function updateMap(status, options) {
 function updateGameUI(data) {
     const status = data.status;
     const options = data.options; // Get options for action area
+    gameView = { status: Object.assign({}, status), options: options };
     const messages = data.messages || [];
     const flightOptionsDiv = document.getElementById('flight-options');
 
@@ -204,6 +235,42 @@ function updateGameUI(data) {
 }
 
 
+// the server pushes only what changed: status fields, the options after a move, new messages and the outcome
+function applyStatusDelta(delta) {
+    if (!gameView) return;
+    updateGameUI({
+        status: Object.assign(gameView.status, delta.status || {}),
+        options: delta.options || gameView.options,
+        messages: delta.messages,
+        game_over: delta.game_over,
+        outcome: delta.outcome
+    });
+}
+
+function closeStatusStream() {
+    if (statusStream) statusStream.close();
+    statusStream = null;
+    streamReady = false;
+}
+
+function openStatusStream() {
+    closeStatusStream();
+    if (!window.EventSource) return;
+    statusStream = new EventSource('/api/status_stream');
+    statusStream.addEventListener('status', event => {
+        streamReady = true;
+        updateGameUI(JSON.parse(event.data));
+    });
+    statusStream.addEventListener('delta', event => applyStatusDelta(JSON.parse(event.data)));
+    statusStream.addEventListener('end', closeStatusStream);
+    // the browser reconnects on its own and the new connection starts with a full status
+    statusStream.onerror = () => { streamReady = false; };
+}
+
+function actionEndpoint(endpoint) {
+    return streamReady ? `${endpoint}?stream=1` : endpoint;
+}
+
 function showGameOver(outcome) {
     gameScreen.style.display = 'none';
     gameOverPopup.style.display = 'flex';
@@ -223,14 +290,20 @@ function showGameOver(outcome) {
     }
 }
 
-// check risk , handling a risk event - given choice before the mission continues
+// check risk and fly in a single round trip; the server stops at a departure risk so the player can decide
 async function handleFlightAction(targetICAO) {
-    const riskData = await apiCall('/api/risk_check', 'POST', { target_icao: targetICAO });
+    const streamed = streamReady;
+    const data = await apiCall(actionEndpoint('/api/batch_actions'), 'POST', {
+        actions: [{ action: 'fly', target_icao: targetICAO }],
+        risk_policy: 'stop'
+    });
 
-    if (!riskData) return;
+    if (!data) return;
 
-    if (riskData.risk_found) {
-        const details = riskData.risk_details;
+    const riskResult = data.results.find(result => result.risk);
+
+    if (riskResult) {
+        const details = riskResult.risk;
         riskMessageElement.innerHTML = `
             Risk Type: <b>${details.name}</b><br>
             Delay: <b>+${details.time_penalty} min</b><br>
@@ -239,20 +312,13 @@ async function handleFlightAction(targetICAO) {
         proceedButton.setAttribute('data-target-icao', targetICAO);
         riskPopup.style.display = 'flex';
 
-        if (riskData.game_over_after_risk) {
-            showGameOver(riskData.current_status.outcome);
-          } else {
-            updateGameUI(riskData.current_status);
-        }
-    } else {
-
-        const execData = await apiCall('/api/take_action', 'POST', {
-            action: 'fly_execute',
-            target_icao: targetICAO
-        });
-        if (execData) {
-            updateGameUI(execData);
+        if (data.game_over) {
+            showGameOver(data.outcome);
+        } else if (!streamed) {
+            updateGameUI(data);
         }
+    } else if (!streamed) {
+        updateGameUI(data);
     }
 }
 
@@ -262,42 +328,30 @@ async function handleRiskDecision(actionType) {
 
     riskPopup.style.display = 'none'; // Hide popup
 
-    const data = await apiCall('/api/take_action', 'POST', {
+    const streamed = streamReady;
+    const data = await apiCall(actionEndpoint('/api/take_action'), 'POST', {
         action: actionType,
         target_icao: targetICAO
     });
 
-    if (data) {
+    if (data && !streamed) {
         updateGameUI(data);
     }
 }
 
 async function handleHealAction() {
-    const data = await apiCall('/api/take_action', 'POST', { action: 'heal' });
-    if (data) {
+    const streamed = streamReady;
+    const data = await apiCall(actionEndpoint('/api/take_action'), 'POST', { action: 'heal' });
+    if (data && !streamed) {
         updateGameUI(data);
     }
 }
 
 async function startGame(playerName, playerAge) {
+    // coordinates arrive with each game status and with the viewport clinic layer, not as one bulk download
     initializeLeafletMap();
 
 
-    try {
-        const coordData = await apiCall('/api/get_airport_coords', 'GET');
-        if (coordData) {
-            Object.assign(airportCoords, coordData);
-            logMessage(`✅ Fetched coordinates for ${Object.keys(airportCoords).length} airports.`, 'info');
-        } else {
-             logMessage("🚨 FATAL: Could not fetch airport coordinates from server. Check Flask logs.", 'error');
-             return;
-        }
-    } catch (e) {
-        logMessage("🚨 FATAL: Coordinate fetch failed.", 'error');
-        return;
-    }
-
-
     startScreen.style.display = 'none';
     gameScreen.style.display = 'block';
     messagesLog.innerHTML = '';
@@ -315,6 +369,7 @@ async function startGame(playerName, playerAge) {
 
     if (data) {
         updateGameUI(data);
+        openStatusStream();
     } else {
         startScreen.style.display = 'block';
         gameScreen.style.display = 'none';
@@ -340,6 +395,7 @@ startButton.addEventListener('click', () => {
 
 
 playAgainButton.addEventListener('click', () => {
+    closeStatusStream();
 
     gameOverPopup.style.display = 'none';
     startScreen.style.display = 'block';
@@ -0,0 +1,32 @@
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def encode_json(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+class EncodedPayload:
+    # A JSON body encoded once per data version, with its compressed variants and strong per-encoding ETags.
+
+    def __init__(self, value, data_version):
+        self.data_version = data_version
+        identity = encode_json(value)
+        self.bodies = {'identity': identity, 'gzip': gzip.compress(identity, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(identity)
+        self.digest = hashlib.sha256(identity).hexdigest()[:20]
+
+    @property
+    def encodings(self):
+        return [encoding for encoding in ('br', 'gzip') if encoding in self.bodies]
+
+    def etag(self, encoding):
+        suffix = '' if encoding == 'identity' else f'-{encoding}'
+        return f'v{self.data_version}-{self.digest}{suffix}'
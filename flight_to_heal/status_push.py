@@ -0,0 +1,317 @@
+import asyncio
+import atexit
+import threading
+import time
+from collections import deque
+
+from static_payloads import encode_json
+
+KEEPALIVE_FRAME = b': keepalive\n\n'
+# Tells the browser not to reconnect; EventSource would otherwise retry a finished stream forever.
+END_FRAME = b'event: end\ndata: {}\n\n'
+
+
+def format_event(event, body):
+    # One Server-Sent Events frame; body is already-encoded single-line JSON.
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + bytes(body) + b'\n\n'
+
+
+def encode_delta(delta):
+    # Like encode_json, but pre-encoded JSON values (the per-airport option lists) are spliced in as-is.
+    return b'{' + b','.join(
+        encode_json(key) + b':' + (bytes(value) if isinstance(value, (bytes, memoryview)) else encode_json(value))
+        for key, value in delta.items()) + b'}'
+
+
+def merge_delta(into, delta):
+    # Later values win, status fields merge key by key and messages accumulate in order.
+    for key, value in delta.items():
+        if key == 'status':
+            into.setdefault('status', {}).update(value)
+        elif key == 'messages':
+            into.setdefault('messages', []).extend(value)
+        else:
+            into[key] = value
+    return into
+
+
+def unsent_delta(delta, revisions, resent, newer):
+    # The frame for a merged delta minus the messages of resent revisions; status fields only when newer.
+    messages, offset = [], 0
+    for revision, count in revisions:
+        if revision not in resent:
+            messages.extend(delta['messages'][offset:offset + count])
+        offset += count
+    delta = {key: value for key, value in delta.items() if key != 'messages'} if newer else {}
+    if messages:
+        delta['messages'] = messages
+    return format_event('delta', encode_delta(delta)) if delta else None
+
+
+class StatusSubscription:
+    # One open status stream. The hub appends (frame or None, merged delta, state payload, revisions, finished)
+    # items, revisions being (state revision, message count) per merged publish; the stream takes them with get().
+
+    def __init__(self, hub, game_id, max_queue):
+        self.hub = hub
+        self.game_id = game_id
+        self.max_queue = max_queue
+        self._items = deque()
+        self._condition = threading.Condition()
+        self.closed = False
+        # Called from the hub's thread whenever get() has something new; set by streams driven from an event loop.
+        self.on_ready = None
+
+    def _notify(self):
+        self._condition.notify_all()
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def _deliver(self, item):
+        with self._condition:
+            if self.closed:
+                return True
+            if len(self._items) >= self.max_queue:
+                # A client this far behind resynchronises from a full status when its EventSource reconnects.
+                self.closed = True
+                self._notify()
+                return False
+            self._items.append(item)
+            self._notify()
+            return True
+
+    def get(self, timeout):
+        # Pending items, [] on timeout, or None once the subscription is closed.
+        with self._condition:
+            if not self._items and not self.closed:
+                self._condition.wait(timeout)
+            if self.closed and not self._items:
+                return None
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._items.clear()
+            self._notify()
+        self.hub._unsubscribe(self)
+
+
+class StatusStream:
+    # The body of one status stream: the full status, then what each move changed, a keepalive while idle and an
+    # end frame once the game is over. Iterating it blocks the calling thread for the whole stream (WSGI servers);
+    # an event loop drives it with frames() instead and needs no thread while it waits.
+    # read_store() returns the stored state blob and render(blob) its (full status frame with messages, finished,
+    # revision); both block, so frames() runs the store poll through run_blocking.
+
+    def __init__(self, subscription, first_frame, payload, finished, read_store, render, poll_seconds,
+                 keepalive_seconds, max_seconds):
+        self.subscription = subscription
+        self.first_frame = first_frame
+        self.read_store = read_store
+        self.render = render
+        self.poll_seconds = poll_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.max_seconds = max_seconds
+        self.finished = finished
+        self.last_payload = payload
+        # Revision the client's status reflects, and those of full statuses resent from the store whose deltas
+        # are still to come. The first status is neither: it leaves messages out, so queued deltas carry them.
+        self.shown_revision = 0
+        self.resent = set()
+        self.started = self.last_sent = time.monotonic()
+
+    def _running(self):
+        return not self.finished and time.monotonic() - self.started < self.max_seconds
+
+    def _take(self, items):
+        frames = []
+        for frame, delta, payload, revisions, item_finished in items:
+            latest = revisions[-1][0]
+            if self.resent and revisions[0][0] <= max(self.resent):
+                # Flushed after a full status was resent from the store: that status already carried the
+                # messages of its own revision, and its fields are newer than any from older revisions.
+                frame = unsent_delta(delta, revisions, self.resent, latest > self.shown_revision)
+                self.resent = {revision for revision in self.resent if revision > latest}
+            if frame is not None:
+                frames.append(frame)
+            if latest > self.shown_revision:
+                self.last_payload, self.shown_revision = payload, latest
+                self.finished = self.finished or item_finished
+        return frames
+
+    def _resend(self, stored):
+        # Moved by another worker process, or by this one with its delta still in the hub's flush window; resend
+        # everything and let _take drop what the delta repeats when it comes.
+        if stored is None or stored == self.last_payload:
+            return []
+        self.last_payload = stored
+        frame, finished, revision = self.render(stored)
+        if revision <= self.shown_revision:
+            return []
+        self.finished, self.shown_revision = finished, revision
+        self.resent.add(revision)
+        return [frame]
+
+    def _chunk(self, frames):
+        now = time.monotonic()
+        if frames:
+            self.last_sent = now
+            return b''.join(frames)
+        if now - self.last_sent >= self.keepalive_seconds:
+            self.last_sent = now
+            return KEEPALIVE_FRAME
+        return None
+
+    def __iter__(self):
+        try:
+            yield self.first_frame
+            while self._running():
+                items = self.subscription.get(self.poll_seconds)
+                if items is None:
+                    break
+                chunk = self._chunk(self._take(items) if items else self._resend(self.read_store()))
+                if chunk:
+                    yield chunk
+            if self.finished:
+                # Any other exit just closes the response, and the reconnect starts again from a full status.
+                yield END_FRAME
+        finally:
+            self.close()
+
+    async def frames(self, run_blocking):
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        self.subscription.on_ready = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            yield self.first_frame
+            while self._running():
+                ready.clear()
+                items = self.subscription.get(0)
+                if items == []:
+                    try:
+                        await asyncio.wait_for(ready.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    items = self.subscription.get(0)
+                if items is None:
+                    break
+                chunk = self._chunk(self._take(items) if items else self._resend(await run_blocking(self.read_store)))
+                if chunk:
+                    yield chunk
+            if self.finished:
+                yield END_FRAME
+        finally:
+            self.close()
+
+    def close(self):
+        self.subscription.close()
+
+
+class StatusHub:
+    # Fans game status deltas out to subscribed streams. publish() only merges the delta into the game's pending
+    # entry; one flusher thread wakes every flush_interval, encodes each changed game's merged delta once and
+    # hands the frame to that game's subscribers. A burst of moves becomes one frame, and many concurrent games
+    # share one wakeup instead of one per change.
+    # Subscribers live in this process: with several worker processes a stream also polls the shared state
+    # store (see StatusStream) for moves handled elsewhere.
+
+    def __init__(self, flush_interval=0.05, max_queue=256):
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.counters = {'published': 0, 'coalesced': 0, 'frames': 0, 'deliveries': 0, 'overflows': 0,
+                         'subscribed': 0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='status-hub', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def subscribe(self, game_id):
+        subscription = StatusSubscription(self, game_id, self.max_queue)
+        with self._condition:
+            if self._closed:
+                subscription.closed = True
+                return subscription
+            self._ensure_started()
+            self._subscribers.setdefault(game_id, []).append(subscription)
+            self.counters['subscribed'] += 1
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._condition:
+            subscribers = self._subscribers.get(subscription.game_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.game_id, None)
+
+    def has_subscribers(self, game_id):
+        return game_id in self._subscribers
+
+    def publish(self, game_id, delta, payload, revision):
+        # payload is the state blob as saved with this delta and revision its save counter, so streams can tell
+        # their view is current and which messages a full status they already sent contained.
+        with self._condition:
+            if game_id not in self._subscribers:
+                return
+            self.counters['published'] += 1
+            pending = self._pending.get(game_id)
+            if pending is None:
+                pending = self._pending[game_id] = [{}, payload, []]
+                self._condition.notify_all()
+            else:
+                self.counters['coalesced'] += 1
+            merge_delta(pending[0], delta)
+            pending[1] = payload
+            pending[2].append((revision, len(delta.get('messages', ()))))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            # Let other moves arrive so they leave in the same frame.
+            time.sleep(self.flush_interval)
+            with self._condition:
+                pending, self._pending = self._pending, {}
+                targets = {game_id: list(self._subscribers.get(game_id, ())) for game_id in pending}
+
+            for game_id, (delta, payload, revisions) in pending.items():
+                frame = format_event('delta', encode_delta(delta)) if delta else None
+                item = (frame, delta, payload, tuple(revisions), bool(delta.get('game_over')))
+                for subscription in targets[game_id]:
+                    delivered = subscription._deliver(item)
+                    with self._condition:
+                        if not delivered:
+                            self.counters['overflows'] += 1
+                        elif frame is not None:
+                            self.counters['deliveries'] += 1
+                if frame is not None:
+                    with self._condition:
+                        self.counters['frames'] += 1
+
+    def close(self, timeout=5.0):
+        with self._condition:
+            self._closed = True
+            subscriptions = [subscription for subscribers in self._subscribers.values() for subscription in subscribers]
+            self._condition.notify_all()
+        for subscription in subscriptions:
+            subscription.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, games=len(self._subscribers),
+                        subscribers=sum(len(subscribers) for subscribers in self._subscribers.values()))
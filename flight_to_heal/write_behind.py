@@ -0,0 +1,174 @@
+import atexit
+import logging
+import threading
+import time
+
+import mysql.connector
+
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GameStatusWriter:
+    UPDATE_SQL = """
+                 UPDATE game_state
+                 SET Current_Patient_Health  = %s,
+                     Total_Game_Time_Minutes = %s,
+                     Current_Location_ID     = %s,
+                     Game_Status             = %s
+                 WHERE Game_ID = %s \
+                 """
+
+    def __init__(self, data_manager, max_pending=10000, batch_size=500, linger_seconds=0.02,
+                 max_retries=3, retry_backoff_seconds=0.5, submit_timeout=1.0, metrics=None):
+        self.data_manager = data_manager
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.submit_timeout = submit_timeout
+
+        # Game_ID -> latest (health, time, location, status) row; a newer submit replaces the queued one.
+        self._pending = {}
+        self._attempts = {}
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.counters = {
+            'submitted': 0, 'coalesced': 0, 'backpressure_waits': 0, 'sync_writes': 0,
+            'batches': 0, 'written': 0, 'failed_batches': 0, 'retried': 0, 'dropped': 0,
+        }
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='game-status-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def submit(self, game_id, row):
+        with self._condition:
+            self.counters['submitted'] += 1
+            if game_id in self._pending:
+                self._pending[game_id] = row
+                self.counters['coalesced'] += 1
+                return
+
+            if not self._closed:
+                self._ensure_started()
+                deadline = time.monotonic() + self.submit_timeout
+                if len(self._pending) >= self.max_pending:
+                    self.counters['backpressure_waits'] += 1
+                while len(self._pending) >= self.max_pending and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                if len(self._pending) < self.max_pending and not self._closed:
+                    self._pending[game_id] = row
+                    self._condition.notify_all()
+                    return
+
+            self.counters['sync_writes'] += 1
+
+        # Queue full or writer closed: fall back to writing on the caller's thread rather than losing the update.
+        try:
+            self._write_batch([(game_id, row)])
+        except mysql.connector.Error as error:
+            with self._condition:
+                self.counters['dropped'] += 1
+            logger.warning("Dropped game status write for game %s: %s", game_id, error)
+
+    def _take_batch(self):
+        batch = []
+        for game_id in list(self._pending)[:self.batch_size]:
+            batch.append((game_id, self._pending.pop(game_id)))
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    self._condition.notify_all()
+                    return
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.linger_seconds)
+                batch = self._take_batch()
+                self._in_flight = len(batch)
+                self._condition.notify_all()
+
+            failed = False
+            try:
+                self._write_batch(batch)
+            except mysql.connector.Error as error:
+                failed = True
+                logger.warning("Game status batch of %d rows failed: %s", len(batch), error)
+            except Exception:
+                # Retried like a database error: the worker is never restarted, so it must not die with the batch.
+                failed = True
+                logger.exception("Game status batch of %d rows failed unexpectedly.", len(batch))
+
+            with self._condition:
+                self._in_flight = 0
+                if failed:
+                    self._requeue(batch)
+                else:
+                    self.counters['batches'] += 1
+                    self.counters['written'] += len(batch)
+                    for game_id, _ in batch:
+                        self._attempts.pop(game_id, None)
+                self._condition.notify_all()
+                if failed and not self._closed:
+                    self._condition.wait(self.retry_backoff_seconds)
+
+    def _requeue(self, batch):
+        self.counters['failed_batches'] += 1
+        for game_id, row in batch:
+            attempts = self._attempts.get(game_id, 0) + 1
+            if attempts > self.max_retries:
+                self._attempts.pop(game_id, None)
+                self.counters['dropped'] += 1
+                logger.warning("Dropped game status write for game %s after %d attempts.", game_id, attempts)
+                continue
+            self._attempts[game_id] = attempts
+            self.counters['retried'] += 1
+            # A newer update queued while this batch was in flight supersedes the failed row.
+            self._pending.setdefault(game_id, row)
+
+    def _write_batch(self, batch):
+        with self.metrics.timer('flight_to_heal_db_query_duration_seconds', (('query', 'update_game_status'),)):
+            with self.data_manager._get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(self.UPDATE_SQL, [row + (game_id,) for game_id, row in batch])
+                conn.commit()
+                cursor.close()
+        self.metrics.inc('flight_to_heal_db_rows_written_total', (('table', 'game_state'),), len(batch))
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counters, pending=len(self._pending), in_flight=self._in_flight)
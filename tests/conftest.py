@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flight_to_heal'))
+
+from app import FlightToHealApp, GameData  # noqa: E402
+from benchmark import populate_synthetic_network  # noqa: E402
+from db_pool import SQLiteStandIn  # noqa: E402
+
+
+@pytest.fixture
+def stand_in():
+    database = SQLiteStandIn()
+    yield database
+    database.remove()
+
+
+@pytest.fixture
+def make_data(stand_in):
+    # Reference data over a synthetic network in the SQLite stand-in; keyword arguments go to the generator.
+    def make(n_airports=12, snapshot_path=None, **network):
+        populate_synthetic_network(stand_in, n_airports, **network)
+        data = GameData(connect=stand_in, snapshot_path=snapshot_path)
+        data.load_from_database()
+        return data
+    return make
+
+
+@pytest.fixture
+def flight_app(make_data):
+    flight_app = FlightToHealApp(make_data(60, seed=3))
+    yield flight_app
+    flight_app.close()
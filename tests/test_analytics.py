@@ -0,0 +1,117 @@
+import threading
+
+from analytics import GameAnalytics, GameResultWriter
+from benchmark import populate_synthetic_network
+
+
+class FinishedState:
+
+    def __init__(self, start, target, outcome, minutes, health=50.0, clinics=()):
+        self.start_location_icao = start
+        self.target_hospital_icao = target
+        self.outcome = outcome
+        self.total_time_minutes = minutes
+        self.current_health = health
+        self.clinics_used = list(clinics)
+
+
+def add_games(stand_in, count):
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO game_state (Game_ID, Current_Patient_Health, Total_Game_Time_Minutes, "
+                           "Max_Allowed_Time_Minutes, Current_Location_ID, Target_Hospital_ID, Game_Status, "
+                           "Player_Name, Player_Age) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                           [(game_id, 100.0, 0, 600, 'AAAA', 'AAAB', 'IN_PROGRESS', f'player{game_id}', 30)
+                            for game_id in range(1, count + 1)])
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def make_analytics(make_data, stand_in, games):
+    data = make_data(12)
+    add_games(stand_in, games)
+    return GameAnalytics(data, cache_ttl_seconds=0.0)
+
+
+def walk(fetch, limit):
+    entries, after, pages = [], None, 0
+    while True:
+        page = fetch(limit=limit, after=after)
+        entries.extend(page['entries'])
+        pages += 1
+        if page['next_after'] is None:
+            return entries, pages
+        after = tuple(page['next_after'].split(':')) if ':' in page['next_after'] else page['next_after']
+
+
+def test_record_finished_counts_each_game_once(make_data, stand_in):
+    analytics = make_analytics(make_data, stand_in, 1)
+    state = FinishedState('AAAA', 'AAAB', 'SUCCESS', 240, clinics=['AAAC', 'AAAC', 'AAAD'])
+    threads = [threading.Thread(target=analytics.record_finished, args=(1, state)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    analytics.record_finished(1, state)
+
+    assert analytics.stats()['recorded'] == 1
+    assert analytics.stats()['duplicates'] == 4
+    [pair] = analytics.pair_stats()['entries']
+    assert (pair['games'], pair['wins'], pair['best_win_minutes']) == (1, 1, 240)
+    clinics = {entry['clinic_icao']: entry for entry in analytics.clinic_stats()['entries']}
+    assert (clinics['AAAC']['heals'], clinics['AAAC']['games']) == (2, 1)
+    assert (clinics['AAAD']['heals'], clinics['AAAD']['games']) == (1, 1)
+
+
+def test_keyset_pages_cover_every_row_once(make_data, stand_in):
+    analytics = make_analytics(make_data, stand_in, 30)
+    for game_id in range(1, 31):
+        # Repeated times put ties on the page boundaries; the game id breaks them.
+        analytics.record_finished(game_id, FinishedState(
+            f'AAA{"ABCDE"[game_id % 5]}', f'AAB{"ABC"[game_id % 3]}', 'SUCCESS' if game_id % 4 else 'FAILURE',
+            100 + game_id % 3 * 10, clinics=[f'AAC{"ABCDEFG"[game_id % 7]}']))
+
+    entries, pages = walk(lambda limit, after: analytics.leaderboard(
+        limit, None if after is None else (int(after[0]), int(after[1]))), 4)
+    assert pages == 6
+    keys = [(entry['time_total'], entry['game_id']) for entry in entries]
+    assert keys == sorted(keys) and len(keys) == 23
+
+    entries, _ = walk(analytics.pair_stats, 4)
+    keys = [(entry['start_icao'], entry['target_icao']) for entry in entries]
+    assert keys == sorted(set(keys)) and len(keys) == 15
+    assert sum(entry['games'] for entry in entries) == 30
+
+    entries, _ = walk(analytics.clinic_stats, 3)
+    assert [entry['clinic_icao'] for entry in entries] == [f'AAC{letter}' for letter in 'ABCDEFG']
+
+
+def test_writer_records_in_background_and_retries(make_data, stand_in):
+    analytics = make_analytics(make_data, stand_in, 2)
+    failures = [RuntimeError("lost connection")]
+    record_finished = analytics.record_finished
+
+    def flaky(game_id, state):
+        if failures:
+            raise failures.pop()
+        record_finished(game_id, state)
+
+    analytics.record_finished = flaky
+    writer = GameResultWriter(analytics, retry_backoff_seconds=0.01)
+    state = FinishedState('AAAA', 'AAAB', 'SUCCESS', 120)
+    writer.submit(1, state)
+    # The queued result is a copy; the game moving on cannot change what gets recorded.
+    state.total_time_minutes = 999
+    writer.submit(2, FinishedState('AAAA', 'AAAB', 'FAILURE', 300))
+    assert writer.flush(5.0)
+
+    stats = writer.stats()
+    assert (stats['written'], stats['failed'], stats['retried'], stats['dropped']) == (2, 1, 1, 0)
+    assert [entry['time_total'] for entry in analytics.leaderboard()['entries']] == [120]
+    writer.close()
+
+    writer.submit(2, FinishedState('AAAA', 'AAAB', 'FAILURE', 300))
+    assert writer.stats()['sync_writes'] == 1
+    assert analytics.stats()['duplicates'] == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from app import FlightToHealApp, GameData
+from benchmark import populate_synthetic_network
+
+
+@pytest.fixture
+def risky_app(stand_in):
+    # Every departure draws the 60 minute weather delay, so each policy is exercised on every flight.
+    populate_synthetic_network(stand_in, 60, seed=3)
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("UPDATE Departure_Risk SET Probability_of_Occurring = "
+                       "CASE WHEN Departure_Risk_Name = 'Weather Delay' THEN 1.0 ELSE 0.0 END")
+        cursor.close()
+    finally:
+        connection.close()
+    data = GameData(connect=stand_in)
+    data.load_from_database()
+    flight_app = FlightToHealApp(data)
+    yield flight_app
+    flight_app.close()
+
+
+def start(client):
+    return client.post('/api/start_game', json={'player_name': 'Test', 'player_age': 30, 'seed': 5}).get_json()
+
+
+def fly(*targets):
+    return [{'action': 'fly', 'target_icao': target} for target in targets]
+
+
+def test_stop_policy_holds_the_flight_and_skips_the_rest(risky_app):
+    client = risky_app.app.test_client()
+    status = start(client)
+    first, second = [option['Destination_ICAO'] for option in status['options'][:2]]
+
+    reply = client.post('/api/batch_actions', json={'actions': fly(first, second)}).get_json()
+    assert reply['risk_pending'] and reply['risk_details']['name'] == 'Weather Delay'
+    assert reply['actions_skipped'] == 1 and len(reply['results']) == 1
+    assert reply['status']['current_icao'] == status['status']['current_icao']
+    assert reply['status']['time_total'] == 60
+
+    # The held flight is the one the follow-up execute takes.
+    reply = client.post('/api/take_action', json={'action': 'fly_execute'}).get_json()
+    assert reply['status']['current_icao'] == first
+
+
+def test_proceed_policy_takes_every_flight(risky_app):
+    client = risky_app.app.test_client()
+    status = start(client)
+    first = status['options'][0]['Destination_ICAO']
+    second = next(option['Destination_ICAO'] for option in risky_app.data_manager.get_flight_options(first)
+                  if option['Destination_ICAO'] != status['status']['current_icao'])
+
+    reply = client.post('/api/batch_actions', json={'actions': fly(first, second),
+                                                    'risk_policy': 'proceed'}).get_json()
+    assert not reply['risk_pending'] and reply['actions_skipped'] == 0
+    assert [result['risk']['name'] for result in reply['results']] == ['Weather Delay', 'Weather Delay']
+    if not reply['game_over']:
+        assert reply['status']['current_icao'] == second
+
+
+def test_cancel_policy_stays_put_and_continues(risky_app):
+    client = risky_app.app.test_client()
+    status = start(client)
+    first, second = [option['Destination_ICAO'] for option in status['options'][:2]]
+
+    reply = client.post('/api/batch_actions', json={'actions': fly(first, second),
+                                                    'risk_policy': 'cancel'}).get_json()
+    assert not reply['risk_pending'] and reply['actions_skipped'] == 0
+    assert reply['status']['current_icao'] == status['status']['current_icao']
+    assert reply['status']['time_total'] == 120
+
+
+def test_unknown_policy_and_empty_batch_are_rejected(risky_app):
+    client = risky_app.app.test_client()
+    start(client)
+    assert client.post('/api/batch_actions', json={'actions': fly('AAAA'), 'risk_policy': 'maybe'}).status_code == 400
+    assert client.post('/api/batch_actions', json={'actions': []}).status_code == 400
@@ -0,0 +1,48 @@
+import json
+import random
+
+import pytest
+
+from coord_stream import decode_delta, iter_delta, iter_json, tile_bounds
+
+
+def sample_records(count, seed=4):
+    rng = random.Random(seed)
+    return [(f'A{index:03d}', round(rng.uniform(-90, 90), 5), round(rng.uniform(-180, 180), 5), rng.random() < 0.3)
+            for index in range(count)]
+
+
+@pytest.mark.parametrize('chunk_records', [1, 7, 256])
+def test_delta_stream_round_trips(chunk_records):
+    records = sample_records(500) + [('POLE', 90.0, -180.0, False), ('ZERO', 0.0, 0.0, True)]
+    chunks = list(iter_delta(records, chunk_records))
+    assert len(chunks) == 1 + -(-len(records) // chunk_records)
+    decoded = decode_delta(b''.join(chunks))
+    assert decoded == {icao: [latitude, longitude, clinic] for icao, latitude, longitude, clinic in records}
+    assert json.loads(b''.join(iter_json(records, chunk_records))) == decoded
+
+
+def test_delta_stream_rounds_to_the_fixed_point_scale():
+    decoded = decode_delta(b''.join(iter_delta([('ABCD', 12.3456789, -0.0000049, False)])))
+    assert decoded == {'ABCD': [12.34568, -0.0, False]}
+    assert decode_delta(b''.join(iter_delta([]))) == {}
+    with pytest.raises(ValueError):
+        decode_delta(b'FTHC\x09' + bytes(4))
+
+
+def test_tile_endpoint_streams_the_airports_in_the_tile(flight_app):
+    client = flight_app.app.test_client()
+    airports = flight_app.data_manager.airports
+    everything = json.loads(client.get('/api/airport_coords_stream').data)
+    assert everything == {icao: [airport['Latitude'], airport['Longitude'], bool(airport.get('Clinic', False))]
+                          for icao, airport in airports.items()}
+
+    south, west, north, east = tile_bounds(1, 1, 0)
+    tile = json.loads(client.get('/api/airport_tiles/1/1/0').data)
+    assert tile and tile == {icao: coords for icao, coords in everything.items()
+                             if south <= coords[0] <= north and west <= coords[1] <= east}
+    delta = decode_delta(client.get('/api/airport_tiles/1/1/0?format=delta').data)
+    assert delta.keys() == tile.keys()
+    for icao, (latitude, longitude, clinic) in delta.items():
+        assert (latitude, longitude, clinic) == (pytest.approx(tile[icao][0], abs=1e-5),
+                                                 pytest.approx(tile[icao][1], abs=1e-5), tile[icao][2])
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import mysql.connector
+import pytest
+from mysql.connector import errors as mysql_errors
+
+from db_pool import ConnectionPool
+
+
+class FakeRaw:
+
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.closed = False
+
+    def is_connected(self):
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+
+    def __init__(self, failures=0):
+        self.made = []
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise mysql_errors.InterfaceError("Can't connect")
+        self.made.append(FakeRaw())
+        return self.made[-1]
+
+
+def test_returned_connections_are_reused():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=2)
+    with pool.connection() as first:
+        raw = first._raw
+    with pool.connection() as second:
+        assert second._raw is raw
+    stats = pool.stats()
+    assert (stats['created'], stats['checkouts'], stats['open'], stats['idle'], stats['in_use']) == (1, 2, 1, 1, 0)
+    with pytest.raises(mysql_errors.OperationalError):
+        second.cursor()
+
+
+def test_exhausted_pool_times_out():
+    pool = ConnectionPool(Connector(), size=1)
+    held = pool.connection()
+    started = time.monotonic()
+    with pytest.raises(mysql_errors.PoolError):
+        pool.connection(timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['exhausted'] == 1
+    held.close()
+    pool.connection(timeout=0.05).close()
+
+
+def test_waiter_gets_the_released_connection():
+    pool = ConnectionPool(Connector(), size=1)
+    held = pool.connection()
+    timer = threading.Timer(0.05, held.close)
+    timer.start()
+    with pool.connection(timeout=2.0):
+        pass
+    timer.join()
+    stats = pool.stats()
+    assert (stats['waits'], stats['created'], stats['peak_in_use']) == (1, 1, 1)
+
+
+def test_database_errors_discard_the_connection():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1)
+    with pytest.raises(mysql.connector.Error):
+        with pool.connection():
+            raise mysql_errors.OperationalError("Lost connection")
+    assert connect.made[0].closed
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("not the connection's fault")
+    stats = pool.stats()
+    assert (stats['created'], stats['closed'], stats['open'], stats['idle']) == (2, 1, 1, 1)
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    connect = Connector()
+    pool = ConnectionPool(connect, size=1, health_check_interval=0.0)
+    pool.connection().close()
+    connect.made[0].healthy = False
+    with pool.connection() as connection:
+        assert connection._raw is connect.made[1]
+    assert pool.stats()['health_check_failures'] == 1
+
+
+def test_failed_connect_frees_its_slot():
+    pool = ConnectionPool(Connector(failures=1), size=1)
+    with pytest.raises(mysql_errors.InterfaceError):
+        pool.connection()
+    assert pool.stats()['open'] == 0
+    pool.connection(timeout=0.05).close()
+    with pytest.raises(ValueError):
+        ConnectionPool(Connector(), size=0)
@@ -0,0 +1,78 @@
+import pytest
+
+from event_log import DatabaseEventSink, GameEventLog, SegmentedFileEventSink
+
+
+class ListSink:
+    # Keeps batches in memory; raises the queued failures on the next writes first.
+
+    def __init__(self, failures=()):
+        self.batches = []
+        self.failures = list(failures)
+
+    def append_batch(self, events):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.batches.append(list(events))
+
+    def read(self, game_id):
+        return [event for batch in self.batches for event in batch if event['game_id'] == game_id]
+
+
+def test_events_are_batched_in_order():
+    sink = ListSink()
+    log = GameEventLog(sink, batch_size=50, linger_seconds=0.01)
+    for index in range(120):
+        log.append(index % 3, 'flight', step=index)
+    assert log.flush(timeout=5.0)
+    assert [event['step'] for event in log.read(1)] == list(range(1, 120, 3))
+    assert max(len(batch) for batch in sink.batches) <= 50
+    assert log.stats()['written'] == 120
+    log.close()
+
+
+def test_worker_survives_an_unexpected_sink_error():
+    sink = ListSink([RuntimeError("sink bug")])
+    log = GameEventLog(sink, linger_seconds=0.01)
+    log.append(1, 'start')
+    assert log.flush(timeout=5.0)
+    log.append(1, 'flight')
+    assert log.flush(timeout=5.0)
+    assert log._thread.is_alive()
+    assert [event['type'] for event in sink.read(1)] == ['flight']
+    stats = log.stats()
+    assert (stats['failed_batches'], stats['dropped'], stats['written'], stats['sync_writes']) == (1, 1, 1, 0)
+    log.close()
+
+
+def test_closed_log_writes_synchronously():
+    sink = ListSink()
+    log = GameEventLog(sink)
+    log.close()
+    log.append(4, 'outcome', outcome='SUCCESS')
+    assert sink.read(4)[0]['outcome'] == 'SUCCESS'
+    assert log.stats()['sync_writes'] == 1
+
+
+def test_segmented_files_roll_over_and_read_back(tmp_path):
+    sink = SegmentedFileEventSink(str(tmp_path), segment_max_bytes=200)
+    for index in range(10):
+        sink.append_batch([{'game_id': index % 2, 'type': 'flight', 'at': 0.0, 'step': index}])
+    sink.close()
+    assert len(sink.segments()) > 1
+    with open(sink.segments()[-1], 'ab') as segment:
+        segment.write(b'{"game_id": 1, "ty')
+
+    reopened = SegmentedFileEventSink(str(tmp_path), segment_max_bytes=200)
+    assert [event['step'] for event in reopened.read(1)] == [1, 3, 5, 7, 9]
+    reopened.close()
+
+
+@pytest.mark.parametrize('batches', [1, 3])
+def test_database_sink_round_trip(make_data, batches):
+    sink = DatabaseEventSink(make_data(6))
+    events = [{'game_id': 7, 'type': 'heal', 'at': float(index), 'icao': 'AAAA', 'time': 45} for index in range(6)]
+    for start in range(0, 6, 6 // batches):
+        sink.append_batch(events[start:start + 6 // batches])
+    assert sink.read(7) == events
+    assert sink.read(8) == []
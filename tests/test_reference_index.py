@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+
+def scan_routes(stand_in):
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT Departure_Airport_ID, Arrival_Airport_ID, Travel_Time_Minutes, Health_Cost_Per_Minute "
+                       "FROM Interconnection")
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+    return rows
+
+
+@pytest.fixture
+def indexed(make_data, stand_in):
+    data = make_data(80, seed=11)
+    return data, scan_routes(stand_in)
+
+
+def test_flight_options_match_a_scan_of_the_routes(indexed):
+    data, rows = indexed
+    for icao, airport in data.airports.items():
+        expected = sorted((arrival, minutes, round(minutes * cost, 2))
+                          for departure, arrival, minutes, cost in rows if departure == icao)
+        options = data.get_flight_options(icao)
+        assert sorted((option['Destination_ICAO'], option['Time'], option['Health_Loss'])
+                      for option in options) == expected
+        assert [option['ID'] for option in options] == list(range(1, len(options) + 1))
+        for option in options:
+            arrival = data.airports[option['Destination_ICAO']]
+            assert (option['Destination_Name'], option['Clinic']) == (arrival['Name'], bool(arrival.get('Clinic')))
+        # The pre-encoded payload is the same list the status reply would otherwise build.
+        assert json.loads(bytes(data.get_flight_options_json(icao))) == [dict(option) for option in options]
+
+    assert set(data.valid_start_icaos) == {row[0] for row in rows}
+
+
+def test_route_lookup_matches_a_scan_of_the_routes(indexed):
+    data, rows = indexed
+    routes = {(departure, arrival): (minutes, cost) for departure, arrival, minutes, cost in rows}
+    for (departure, arrival), (minutes, cost) in routes.items():
+        route = data.get_route(departure, arrival)
+        assert (route['Time'], route['Health_Cost_Per_Minute']) == (minutes, cost)
+        assert route['Health_Loss'] == pytest.approx(minutes * cost)
+
+    icaos = sorted(data.airports)
+    for departure in icaos[:10]:
+        for arrival in icaos:
+            if (departure, arrival) not in routes:
+                assert data.get_route(departure, arrival) is None
+    assert data.get_flight_options('NONE') == () and data.get_route('NONE', icaos[0]) is None
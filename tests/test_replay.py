@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from app import GameState
+from event_log import actions_from_events, replay_events
+from headless import GreedyPolicy, RandomPolicy, play
+from simulation import replay_actions
+
+
+def play_through_api(client, seed, max_moves=40):
+    # Flies towards the target when a direct flight exists, heals when low, otherwise takes a random flight.
+    rng = random.Random(seed)
+    reply = client.post('/api/start_game', json={'player_name': 'Test', 'player_age': 30, 'seed': seed}).get_json()
+    for _ in range(max_moves):
+        if reply['game_over']:
+            break
+        status = reply['status']
+        if status['is_clinic'] and status['health'] < 40:
+            reply = client.post('/api/take_action', json={'action': 'heal'}).get_json()
+            continue
+        targets = [option['Destination_ICAO'] for option in reply['options']]
+        target = status['target_icao'] if status['target_icao'] in targets else rng.choice(targets)
+        reply = client.post('/api/batch_actions', json={
+            'actions': [{'action': 'fly', 'target_icao': target}], 'risk_policy': 'proceed'}).get_json()
+    return reply
+
+
+@pytest.mark.parametrize('seed', [1, 7, 12345])
+def test_recorded_game_replays_to_the_same_state(flight_app, seed):
+    client = flight_app.app.test_client()
+    reply = play_through_api(client, seed)
+    events = client.get('/api/game_events').get_json()['events']
+    assert events[0]['type'] == 'start' and events[0]['seed'] == seed
+
+    data = flight_app.data_manager
+    for state in (replay_events(GameState(data), events), replay_actions(data, *actions_from_events(events))):
+        assert round(state.current_health, 2) == reply['status']['health']
+        assert state.total_time_minutes == reply['status']['time_total']
+        assert state.current_location_icao == reply['status']['current_icao']
+        assert (state.is_game_over, state.outcome) == (reply['game_over'], reply['outcome'])
+
+
+def test_same_seed_and_moves_give_the_same_game(flight_app):
+    first = play_through_api(flight_app.app.test_client(), 99)
+    second = play_through_api(flight_app.app.test_client(), 99)
+    assert first == second
+
+
+@pytest.mark.parametrize('policy', [RandomPolicy, GreedyPolicy])
+def test_headless_games_are_deterministic(make_data, policy):
+    data = make_data(60, seed=3)
+    results = [play(data, policy(), seed) for seed in range(20)]
+    assert results == [play(data, policy(), seed) for seed in range(20)]
+    assert len({result[:2] for result in results}) > 1
@@ -0,0 +1,37 @@
+import logging
+
+from app import GameData
+from benchmark import populate_synthetic_network
+from route_network import RouteNetwork
+
+
+def test_routes_to_unknown_airports_are_dropped(stand_in, tmp_path, caplog):
+    # Routes left behind by an airport the Continent join dropped, which used to abort the load with a KeyError.
+    populate_synthetic_network(stand_in, 12)
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO Interconnection VALUES (%s, %s, %s, %s)",
+                           [('AAAA', 'ZZZZ', 60, 0.1), ('YYYY', 'AAAB', 60, 0.1)])
+        cursor.close()
+    finally:
+        connection.close()
+
+    with caplog.at_level(logging.WARNING, logger='route_network'):
+        data = GameData(connect=stand_in, snapshot_path=str(tmp_path / 'reference.snapshot'))
+        data.load_from_database()
+    assert "Ignoring 2 routes" in caplog.text
+    assert all(option['Destination_ICAO'] in data.airports for option in data.get_flight_options('AAAA'))
+    assert data.get_route('AAAA', 'ZZZZ') is None
+
+
+def test_network_without_unknown_routes_is_unchanged():
+    airports = {'AAAA': {}, 'BBBB': {'Clinic': True, 'Healing': 10.0, 'TimeFactor': 0.5}}
+    network = RouteNetwork(airports, [
+        {'Departure_Airport_ID': 'BBBB', 'Arrival_Airport_ID': 'AAAA', 'Time': 30, 'Health_Cost_Per_Minute': 0.1},
+        {'Departure_Airport_ID': 'AAAA', 'Arrival_Airport_ID': 'CCCC', 'Time': 40, 'Health_Cost_Per_Minute': 0.1},
+        {'Departure_Airport_ID': 'AAAA', 'Arrival_Airport_ID': 'BBBB', 'Time': 50, 'Health_Cost_Per_Minute': 0.2},
+    ])
+    assert network.edge_count == 2
+    assert [network.route(edge)['Arrival_Airport_ID'] for edge in network.edges_from('AAAA')] == ['BBBB']
+    assert network.route(network.find_edge('AAAA', 'BBBB'))['Health_Loss'] == 10.0
@@ -0,0 +1,94 @@
+import pytest
+
+
+def brute_force(data, start_icao, health, elapsed, target_icao=None):
+    # Every (airport, time, health) that some sequence of flights and heals reaches, without dominance pruning.
+    # A flight is lost if it lands at zero health or at the time limit; the search stops at the target.
+    reached = set()
+    frontier = [(start_icao, elapsed, health)]
+    while frontier:
+        label = frontier.pop()
+        if label in reached:
+            continue
+        reached.add(label)
+        icao, time_total, current_health = label
+        if icao == target_icao:
+            continue
+        airport = data.airports[icao]
+        if airport.get('Clinic') and current_health < data.START_HEALTH:
+            healed_time = time_total + int(round(data.HEALING_TIME_BASE * airport.get('TimeFactor', 1.0)))
+            if healed_time < data.MAXIMUM_TIME_MINUTES:
+                frontier.append((icao, healed_time, min(data.START_HEALTH, current_health + airport['Healing'])))
+        for option in data.get_flight_options(icao):
+            route = data.get_route(icao, option['Destination_ICAO'])
+            arrival_time = time_total + route['Time']
+            arrival_health = current_health - route['Health_Loss']
+            if arrival_health > 0 and arrival_time < data.MAXIMUM_TIME_MINUTES:
+                frontier.append((option['Destination_ICAO'], arrival_time, arrival_health))
+    return reached
+
+
+def pareto_front(points):
+    front = []
+    for time_total, health in sorted(points, key=lambda point: (point[0], -point[1])):
+        if not front or health > front[-1][1]:
+            front.append((time_total, health))
+    return [(time_total, round(health, 2)) for time_total, health in front]
+
+
+def replay_route(data, start_icao, health, elapsed, route):
+    icao = start_icao
+    for step in route['steps']:
+        if step['action'] == 'heal':
+            assert step['icao'] == icao and data.airports[icao].get('Clinic')
+            airport = data.airports[icao]
+            elapsed += int(round(data.HEALING_TIME_BASE * airport.get('TimeFactor', 1.0)))
+            health = min(data.START_HEALTH, health + airport['Healing'])
+        else:
+            assert step['from_icao'] == icao
+            flight = data.get_route(icao, step['to_icao'])
+            elapsed += flight['Time']
+            health -= flight['Health_Loss']
+            icao = step['to_icao']
+        assert health > 0 and elapsed < data.MAXIMUM_TIME_MINUTES
+    return icao, elapsed, round(health, 2)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('health, elapsed', [(None, 0), (20.0, 600)])
+def test_reachable_targets_match_brute_force(make_data, seed, health, elapsed):
+    data = make_data(12, out_degree=4, seed=seed)
+    health = data.START_HEALTH if health is None else health
+    solver = data.route_solver
+    for start_icao in data.airports:
+        expected = {icao for icao, _, _ in brute_force(data, start_icao, health, elapsed)} - {start_icao}
+        assert solver.reachable_targets(start_icao, health, elapsed) == expected
+        if health == data.START_HEALTH and elapsed == 0:
+            assert set(solver.winnable_targets.get(start_icao, ())) == expected
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_solve_returns_the_pareto_front(make_data, seed):
+    data = make_data(12, out_degree=4, seed=seed)
+    icaos = list(data.airports)
+    for start_icao in icaos[:4]:
+        for target_icao in icaos[-4:]:
+            if start_icao == target_icao:
+                continue
+            reached = brute_force(data, start_icao, data.START_HEALTH, 0, target_icao)
+            expected = pareto_front((time_total, health) for icao, time_total, health in reached
+                                    if icao == target_icao)
+            routes = data.route_solver.solve(start_icao, target_icao)
+            assert [(route['total_time'], route['final_health']) for route in routes] == expected
+            for route in routes:
+                assert replay_route(data, start_icao, data.START_HEALTH, 0, route) == \
+                    (target_icao, route['total_time'], route['final_health'])
+
+
+def test_unknown_and_identical_airports(make_data):
+    data = make_data(6)
+    solver = data.route_solver
+    start_icao = next(iter(data.airports))
+    assert solver.solve(start_icao, 'ZZZZ') == []
+    assert solver.solve(start_icao, start_icao, 30.0, 100) == [
+        {'total_time': 100, 'final_health': 30.0, 'steps': []}]
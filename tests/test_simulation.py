@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from simulation import OUTCOME_NAMES, replay_route, simulate_route
+
+
+def uncertain_routes(data, count, seed=1):
+    # Random walks whose outcome depends on the departure risks, so the two engines' distributions are comparable.
+    rng = random.Random(seed)
+    routes = []
+    while len(routes) < count:
+        start = location = rng.choice(data.valid_start_icaos)
+        steps = []
+        for _ in range(rng.randint(2, 6)):
+            options = data.get_flight_options(location)
+            if not options:
+                break
+            location = rng.choice(options)['Destination_ICAO']
+            steps.append({'action': 'fly', 'to_icao': location})
+            if data.airports[location].get('Clinic') and rng.random() < 0.5:
+                steps.append({'action': 'heal'})
+        if location == start or not steps:
+            continue
+        if 0.1 < simulate_route(data, start, location, steps, n_games=5000, seed=seed)['success_rate'] < 0.9:
+            routes.append((start, location, steps))
+    return routes
+
+
+@pytest.mark.parametrize('risk_policy', ['proceed', 'cancel_retry'])
+def test_vectorized_outcomes_match_the_game_state_replay(make_data, risk_policy):
+    data = make_data(60, seed=3)
+    replay_games = 3000
+    for start, target, steps in uncertain_routes(data, 3):
+        simulated = simulate_route(data, start, target, steps, n_games=50000, seed=2, risk_policy=risk_policy)
+        replayed = replay_route(data, start, target, steps, n_games=replay_games, seed=2, risk_policy=risk_policy)
+        for name in OUTCOME_NAMES.values():
+            # About four standard errors of the replay's estimate.
+            assert simulated['outcomes'][name] / 50000 == pytest.approx(replayed[name] / replay_games, abs=0.04)
+
+
+def test_simulation_is_seeded_and_checks_its_input(make_data):
+    data = make_data(60, seed=3)
+    start, target, steps = uncertain_routes(data, 1)[0]
+    first = simulate_route(data, start, target, steps, n_games=2000, seed=9)
+    assert first == simulate_route(data, start, target, steps, n_games=2000, seed=9)
+
+    with pytest.raises(ValueError):
+        simulate_route(data, start, target, steps, risk_policy='hope')
+    non_clinic = next(icao for icao, airport in data.airports.items() if not airport.get('Clinic'))
+    with pytest.raises(ValueError):
+        simulate_route(data, non_clinic, target, [{'action': 'heal'}], n_games=10)
@@ -0,0 +1,101 @@
+import pytest
+
+from app import GameData
+from route_solver import RouteSolver
+from snapshot_file import read_snapshot, write_snapshot
+
+
+@pytest.fixture
+def precomputes(monkeypatch):
+    # Counts winnable-map computations, i.e. loads that could not take the map from the file.
+    calls = []
+    original = RouteSolver.precompute
+
+    def precompute(solver, *args, **kwargs):
+        calls.append(solver.max_health)
+        return original(solver, *args, **kwargs)
+    monkeypatch.setattr(RouteSolver, 'precompute', precompute)
+    return calls
+
+
+def winnable_map(data):
+    return {start: tuple(targets) for start, targets in data.route_solver.winnable_targets.items()}
+
+
+def test_round_trip(make_data, tmp_path):
+    path = tmp_path / 'reference.snapshot'
+    data = make_data(40, snapshot_path=str(path))
+    stored = read_snapshot(str(path))
+
+    assert stored['airports'] == data.airports
+    assert stored['content_hash'] == data._snapshot.content_hash
+    assert stored['solver_key'] == RouteSolver.parameters_key(data)
+    assert {start: tuple(targets) for start, targets in stored['winnable_targets'].items()} == winnable_map(data)
+    for icao in data.airports:
+        assert bytes(stored['flight_options_json'][icao]) == bytes(data.get_flight_options_json(icao))
+    routes = {(route['Departure_Airport_ID'], route['Arrival_Airport_ID']): route
+              for route in stored['interconnections']}
+    for (departure, arrival), route in routes.items():
+        assert data.get_route(departure, arrival)['Time'] == route['Time']
+
+
+def test_matching_file_skips_the_precompute(make_data, stand_in, tmp_path, precomputes):
+    path = str(tmp_path / 'reference.snapshot')
+    first = make_data(40, snapshot_path=path)
+    assert len(precomputes) == 1
+
+    second = GameData(connect=stand_in, snapshot_path=path)
+    second.load_from_database()
+    assert len(precomputes) == 1
+    assert winnable_map(second) == winnable_map(first)
+
+
+def test_other_game_parameters_invalidate_the_winnable_map(make_data, stand_in, tmp_path, precomputes):
+    path = str(tmp_path / 'reference.snapshot')
+    make_data(40, snapshot_path=path)
+
+    class LowHealthData(GameData):
+        START_HEALTH = 20.0
+
+    low_health = LowHealthData(connect=stand_in, snapshot_path=path)
+    low_health.load_from_database()
+    fresh = LowHealthData(connect=stand_in)
+    fresh.load_from_database()
+    assert precomputes == [GameData.START_HEALTH, 20.0, 20.0]
+    assert winnable_map(low_health) == winnable_map(fresh)
+    assert read_snapshot(path)['solver_key'] == RouteSolver.parameters_key(low_health)
+
+
+def test_changed_rows_invalidate_the_file(make_data, stand_in, tmp_path, precomputes):
+    path = str(tmp_path / 'reference.snapshot')
+    first = make_data(40, snapshot_path=path)
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("UPDATE Interconnection SET Travel_Time_Minutes = Travel_Time_Minutes + 7")
+        cursor.close()
+    finally:
+        connection.close()
+
+    second = GameData(connect=stand_in, snapshot_path=path)
+    second.load_from_database()
+    assert len(precomputes) == 2
+    assert read_snapshot(path)['content_hash'] == second._snapshot.content_hash != first._snapshot.content_hash
+
+
+def test_unknown_solver_key_reads_as_none(make_data, tmp_path):
+    data = make_data(10)
+    path = str(tmp_path / 'reference.snapshot')
+    write_snapshot(path, data.airports, [], [], 'hash')
+    assert read_snapshot(path)['solver_key'] is None
+
+
+def test_unreadable_file_is_ignored(make_data, stand_in, tmp_path):
+    path = tmp_path / 'reference.snapshot'
+    path.write_bytes(b'FTHR' + b'\0' * 8)
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
+
+    data = make_data(20, snapshot_path=str(path))
+    assert len(data.airports) == 20
+    assert read_snapshot(str(path))['content_hash'] == data._snapshot.content_hash
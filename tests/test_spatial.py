@@ -0,0 +1,96 @@
+import math
+import random
+
+import pytest
+
+from spatial import SpatialIndex, distance_km
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def random_airports(seed, count=600):
+    # Uniform points plus clusters at the poles and along the antimeridian, where the grid wraps and narrows.
+    rng = random.Random(seed)
+    points = [(rng.uniform(-90.0, 90.0), rng.uniform(-180.0, 180.0)) for _ in range(count)]
+    points += [(rng.uniform(80.0, 90.0), rng.uniform(-180.0, 180.0)) for _ in range(count // 10)]
+    points += [(rng.uniform(-90.0, -80.0), rng.uniform(-180.0, 180.0)) for _ in range(count // 10)]
+    points += [(rng.uniform(-60.0, 60.0), rng.choice((-1, 1)) * rng.uniform(175.0, 180.0)) for _ in range(count // 5)]
+    return {f"P{index:04d}": {'Latitude': latitude, 'Longitude': longitude}
+            for index, (latitude, longitude) in enumerate(points)}
+
+
+def queries(seed, count=40):
+    rng = random.Random(seed + 1000)
+    fixed = [(89.5, 10.0), (-89.9, -170.0), (0.0, 179.9), (10.0, -179.9), (45.0, 0.0)]
+    return fixed + [(rng.uniform(-90.0, 90.0), rng.uniform(-180.0, 180.0)) for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_distance_matches_haversine(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        points = [rng.uniform(-90.0, 90.0), rng.uniform(-180.0, 180.0), rng.uniform(-90.0, 90.0),
+                  rng.uniform(-180.0, 180.0)]
+        assert distance_km(*points) == pytest.approx(haversine_km(*points), abs=1e-6)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('radius_km', [50.0, 800.0, 3000.0, 25000.0])
+def test_within_matches_brute_force(seed, radius_km):
+    airports = random_airports(seed)
+    index = SpatialIndex(airports)
+    for latitude, longitude in queries(seed):
+        distances = {icao: haversine_km(latitude, longitude, airport['Latitude'], airport['Longitude'])
+                     for icao, airport in airports.items()}
+        found = index.within(latitude, longitude, radius_km)
+        # Points within a metre of the radius may fall either way through rounding.
+        assert {icao for icao, distance in distances.items() if distance <= radius_km - 1e-3} \
+            <= {icao for icao, _ in found} \
+            <= {icao for icao, distance in distances.items() if distance <= radius_km + 1e-3}
+        for icao, distance in found:
+            assert distance == pytest.approx(distances[icao], abs=1e-6)
+        assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_matches_brute_force(seed):
+    airports = random_airports(seed)
+    index = SpatialIndex(airports)
+    excluded = set(list(airports)[:50])
+    for latitude, longitude in queries(seed):
+        ranked = sorted((haversine_km(latitude, longitude, airport['Latitude'], airport['Longitude']), icao)
+                        for icao, airport in airports.items() if icao not in excluded)
+        found = index.nearest(latitude, longitude, count=5, exclude=excluded)
+        assert [distance for _, distance in found] == pytest.approx([distance for distance, _ in ranked[:5]],
+                                                                   abs=1e-6)
+        limited = index.nearest(latitude, longitude, count=5, exclude=excluded, max_km=500.0)
+        assert [icao for icao, _ in limited] == [icao for icao, distance in found if distance <= 500.0]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_in_box_matches_brute_force(seed):
+    airports = random_airports(seed)
+    index = SpatialIndex(airports)
+    rng = random.Random(seed)
+    boxes = [(-10.0, 170.0, 10.0, -170.0), (80.0, -180.0, 90.0, 180.0), (-90.0, -180.0, 90.0, 180.0)]
+    for _ in range(30):
+        south, north = sorted((rng.uniform(-90.0, 90.0), rng.uniform(-90.0, 90.0)))
+        boxes.append((south, rng.uniform(-180.0, 180.0), north, rng.uniform(-180.0, 180.0)))
+    for south, west, north, east in boxes:
+        wraps = west > east
+        expected = {icao for icao, airport in airports.items()
+                    if south <= airport['Latitude'] <= north
+                    and ((airport['Longitude'] >= west or airport['Longitude'] <= east) if wraps
+                         else west <= airport['Longitude'] <= east)}
+        assert set(index.in_box(south, west, north, east)) == expected
+        assert len(index.in_box(south, west, north, east, limit=3)) == min(3, len(expected))
+
+
+def test_airports_without_coordinates_are_skipped():
+    index = SpatialIndex({'AAAA': {'Latitude': 1.0, 'Longitude': 1.0}, 'BBBB': {'Latitude': None, 'Longitude': 2.0}})
+    assert index.size == 1
+    assert index.in_box(-90.0, -180.0, 90.0, 180.0) == ['AAAA']
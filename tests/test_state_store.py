@@ -0,0 +1,102 @@
+import struct
+import time
+
+import pytest
+
+from app import GameState
+from game_random import GameRandom
+from session_store import MemoryStateStore, SharedStateStore, SQLiteKeyValueClient
+
+HEADER = struct.Struct('<BdiBB')
+
+
+def strings(*values):
+    return b''.join(struct.pack('<H', len(value.encode())) + value.encode() for value in values)
+
+
+@pytest.fixture
+def data(make_data):
+    return make_data(12)
+
+
+def test_current_blob_round_trips(data):
+    state = GameState(data, seed=42)
+    state.initialize()
+    state.rng.random()
+    state.clinics_used = ['AAAB', 'AAAB']
+    state.messages = ['✈️ Arrived', '']
+    state.revision = 7
+    state.total_time_minutes = 95
+
+    loaded = GameState(data)
+    loaded.load_from_bytes(state.to_bytes())
+    assert loaded.to_dict() == state.to_dict()
+    assert loaded.revision == 7
+    assert (loaded.rng.seed, loaded.rng.counter) == (state.rng.seed, state.rng.counter)
+    assert loaded.rng.random() == state.rng.random()
+
+
+def test_version_1_blob(data):
+    payload = HEADER.pack(1, 80.5, 120, 0, 0) + struct.pack('<H', 1) + strings('AAAA', 'AAAC', 'hello')
+    state = GameState(data)
+    state.load_from_bytes(payload)
+    assert (state.current_health, state.total_time_minutes) == (80.5, 120)
+    assert (state.current_location_icao, state.target_hospital_icao, state.start_location_icao) == \
+        ('AAAA', 'AAAC', None)
+    assert (state.clinics_used, state.messages, state.revision) == ([], ['hello'], 0)
+    assert state.rng is not None
+
+
+def test_version_2_blob(data):
+    payload = HEADER.pack(2, 10.0, 300, 1, 2) + struct.pack('<HH', 2, 0) + \
+        strings('AAAB', 'AAAC', 'AAAA', 'AAAB', 'AAAD')
+    state = GameState(data)
+    state.load_from_bytes(payload)
+    assert (state.is_game_over, state.outcome) == (True, 'LOST_HEALTH')
+    assert state.start_location_icao == 'AAAA'
+    assert (state.clinics_used, state.messages) == (['AAAB', 'AAAD'], [])
+
+
+def test_version_3_blob_keeps_the_random_stream(data):
+    payload = HEADER.pack(3, 60.0, 30, 0, 0) + struct.pack('<HH', 0, 1) + struct.pack('<QI', 99, 4) + \
+        strings('AAAB', '', 'AAAA', 'note')
+    state = GameState(data)
+    state.load_from_bytes(payload)
+    assert state.target_hospital_icao is None and state.messages == ['note']
+    assert (state.rng.seed, state.rng.counter, state.revision) == (99, 4, 0)
+    expected = GameRandom(99)
+    for _ in range(4):
+        expected.random()
+    assert state.rng.random() == expected.random()
+
+
+def test_unknown_version_is_rejected(data):
+    with pytest.raises(ValueError):
+        GameState(data).load_from_bytes(HEADER.pack(9, 0.0, 0, 0, 0))
+
+
+def test_memory_store_expires_and_evicts():
+    store = MemoryStateStore(ttl_seconds=0.05, max_entries=2)
+    for game_id in (1, 2, 3):
+        store.set(game_id, b'%d' % game_id)
+    assert store.get(1) is None and store.get(2) == b'2'
+    time.sleep(0.06)
+    assert store.get(3) is None
+    # Setting a new entry also sweeps out the expired one ahead of it.
+    store.set(4, b'4')
+    store.delete(4)
+    assert store.get(4) is None
+    stats = store.stats()
+    assert (stats['evicted'], stats['expired'], stats['hits'], stats['entries']) == (1, 2, 1, 0)
+
+
+def test_shared_store_over_the_sqlite_client(tmp_path):
+    path = str(tmp_path / 'states.sqlite')
+    writer = SharedStateStore(SQLiteKeyValueClient(path), ttl_seconds=60)
+    reader = SharedStateStore(SQLiteKeyValueClient(path), ttl_seconds=60)
+    writer.set(5, b'\x04state')
+    assert reader.get(5) == b'\x04state'
+    reader.delete(5)
+    assert writer.get(5) is None
+    SharedStateStore(SQLiteKeyValueClient(path), ttl_seconds=0).set(6, b'gone')
+    assert reader.get(6) is None
@@ -0,0 +1,57 @@
+import gzip
+import json
+
+from static_payloads import EncodedPayload
+
+COORDS = '/api/get_airport_coords'
+
+
+def test_identity_and_gzip_bodies_carry_their_own_etags(flight_app):
+    client = flight_app.app.test_client()
+    plain = client.get(COORDS)
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+    coords = plain.get_json()
+    assert coords == {icao: [airport['Latitude'], airport['Longitude']]
+                      for icao, airport in flight_app.data_manager.airports.items()}
+
+    packed = client.get(COORDS, headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(packed.data)) == coords
+    assert packed.headers['ETag'] != plain.headers['ETag']
+    for response in (plain, packed):
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+
+
+def test_matching_etag_gets_a_304(flight_app):
+    client = flight_app.app.test_client()
+    etag = client.get(COORDS, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    cached = client.get(COORDS, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b'' and cached.headers['ETag'] == etag
+    # A cached gzip body does not satisfy a client that cannot decode it.
+    assert client.get(COORDS, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_changed_data_changes_the_etag(flight_app, stand_in):
+    client = flight_app.app.test_client()
+    before = client.get(COORDS)
+    connection = stand_in()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("UPDATE Airport SET Latitude = Latitude + 1.0")
+        cursor.close()
+    finally:
+        connection.close()
+    assert flight_app.data_manager.refresh()
+
+    after = client.get(COORDS, headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200 and after.headers['ETag'] != before.headers['ETag']
+    assert int(after.headers['X-Data-Version']) == int(before.headers['X-Data-Version']) + 1
+
+
+def test_payload_etags_follow_content_and_version():
+    payload = EncodedPayload({'a': [1.0, 2.0]}, 3)
+    assert payload.etag('identity') == EncodedPayload({'a': [1.0, 2.0]}, 3).etag('identity')
+    assert payload.etag('identity') != EncodedPayload({'a': [1.0, 2.5]}, 3).etag('identity')
+    assert payload.etag('identity').startswith('v3-') and payload.etag('gzip').endswith('-gzip')
+    assert gzip.decompress(payload.bodies['gzip']) == payload.bodies['identity'] == b'{"a":[1.0,2.0]}'
@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+import pytest
+
+from asgi import AsyncFlightToHeal
+from status_push import END_FRAME, StatusHub, StatusStream, encode_delta, format_event
+
+INVALID = "\U0001f6ab Invalid action."
+
+
+def parse(chunk):
+    events = []
+    for frame in chunk.split(b'\n\n'):
+        lines = dict(line.split(b': ', 1) for line in frame.split(b'\n') if line and not line.startswith(b':'))
+        if b'event' in lines:
+            events.append((lines[b'event'].decode(), json.loads(lines[b'data'])))
+    return events
+
+
+def delta_item(revisions, messages, status=None, finished=False):
+    delta = dict({'status': status} if status else {}, messages=messages)
+    return format_event('delta', encode_delta(delta)), delta, b'state-%d' % revisions[-1][0], revisions, finished
+
+
+@pytest.fixture
+def hub():
+    hub = StatusHub(flush_interval=0.01)
+    yield hub
+    hub.close()
+
+
+def make_stream(hub, store, poll_seconds=0.01):
+    # The store maps the blob to (revision, messages); render() turns it into a full status that carries them.
+    def render(payload):
+        revision, messages = store[payload]
+        return format_event('status', json.dumps({'revision': revision, 'messages': messages}).encode()), False, \
+            revision
+    return StatusStream(hub.subscribe('game'), b'first', b'state-1', False, lambda: store['current'], render,
+                        poll_seconds, keepalive_seconds=60, max_seconds=60)
+
+
+def test_hub_merges_a_burst_into_one_frame(hub):
+    subscription = hub.subscribe('game')
+    hub.publish('game', {'status': {'health': 70}, 'messages': ['a']}, b'state-1', 1)
+    hub.publish('game', {'status': {'health': 65}, 'messages': ['a']}, b'state-2', 2)
+    [(frame, delta, payload, revisions, finished)] = subscription.get(1.0)
+    assert parse(frame) == [('delta', {'status': {'health': 65}, 'messages': ['a', 'a']})]
+    assert (payload, revisions, finished) == (b'state-2', ((1, 1), (2, 1)), False)
+    assert hub.stats()['coalesced'] == 1
+    subscription.close()
+    assert not hub.has_subscribers('game')
+
+
+def test_delta_covered_by_a_store_resend_is_dropped(hub):
+    store = {'current': b'state-2', b'state-2': (2, [INVALID])}
+    stream = make_stream(hub, store)
+    chunks = iter(stream)
+    assert next(chunks) == b'first'
+    # The move's delta is still in the hub's flush window when the stream polls the store.
+    assert parse(next(chunks)) == [('status', {'revision': 2, 'messages': [INVALID]})]
+
+    stream.subscription._deliver(delta_item(((2, 1),), [INVALID], {'health': 70}))
+    stream.subscription._deliver(delta_item(((3, 1),), [INVALID]))
+    assert parse(next(chunks)) == [('delta', {'messages': [INVALID]})]
+    stream.close()
+
+
+def test_merged_delta_keeps_what_the_resend_did_not_show(hub):
+    store = {'current': b'state-3', b'state-3': (3, ['second'])}
+    stream = make_stream(hub, store)
+    chunks = iter(stream)
+    next(chunks)
+    assert parse(next(chunks)) == [('status', {'revision': 3, 'messages': ['second']})]
+
+    # Revision 2 happened before the resend but its message was never shown; revision 4 is newer in full.
+    stream.subscription._deliver(delta_item(((2, 1), (3, 1)), ['first', 'second'], {'health': 60}))
+    stream.subscription._deliver(delta_item(((4, 1),), ['third'], {'health': 50}, finished=True))
+    assert parse(next(chunks)) == [('delta', {'messages': ['first']}),
+                                   ('delta', {'status': {'health': 50}, 'messages': ['third']})]
+    assert next(chunks) == END_FRAME
+    with pytest.raises(StopIteration):
+        next(chunks)
+
+
+def test_event_loop_stream_wakes_on_publish_and_ends_on_close(hub):
+    store = {'current': b'state-1'}
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        stream = make_stream(hub, store, poll_seconds=30)
+        frames = stream.frames(lambda function: loop.run_in_executor(None, function))
+        assert await frames.__anext__() == b'first'
+        waiting = asyncio.ensure_future(frames.__anext__())
+        await asyncio.sleep(0.05)
+        hub.publish('game', {'messages': [INVALID]}, b'state-2', 2)
+        assert parse(await asyncio.wait_for(waiting, 5)) == [('delta', {'messages': [INVALID]})]
+
+        waiting = asyncio.ensure_future(frames.__anext__())
+        await asyncio.sleep(0.05)
+        stream.close()
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(waiting, 5)
+    asyncio.run(scenario())
+    assert not hub.has_subscribers('game')
+
+
+def test_status_stream_pushes_repeated_messages(flight_app):
+    client = flight_app.app.test_client()
+    client.post('/api/start_game', json={'player_name': 'Test', 'player_age': 30, 'seed': 5})
+    response = client.get('/api/status_stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    [(event, status)] = parse(next(chunks))
+    assert event == 'status' and status['messages'] == []
+
+    for _ in range(3):
+        reply = client.post('/api/take_action?stream=1', json={'action': 'bogus'}).get_json()
+        assert reply['accepted']
+        assert parse(next(chunks)) == [('delta', {'messages': [INVALID]})]
+    response.close()
+
+
+def test_asgi_stream_leaves_the_worker_pool_free(flight_app):
+    client = flight_app.app.test_client()
+    client.post('/api/start_game', json={'player_name': 'Test', 'player_age': 30})
+    cookie = f"session={client.get_cookie('session').value}".encode()
+
+    def scope(path, headers=()):
+        return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': list(headers)}
+
+    async def scenario():
+        front = AsyncFlightToHeal(flight_app, max_workers=1)
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+        requested = []
+
+        async def stream_receive():
+            if not requested:
+                requested.append(True)
+                return {'type': 'http.request', 'body': b''}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        stream = asyncio.ensure_future(front(scope('/api/status_stream', [(b'cookie', cookie)]), stream_receive,
+                                             sent.put))
+        start = await asyncio.wait_for(sent.get(), 5)
+        assert start['status'] == 200 and (b'content-type', b'text/event-stream; charset=utf-8') in start['headers']
+        assert parse((await asyncio.wait_for(sent.get(), 5))['body'])[0][0] == 'status'
+
+        # With the only pool thread free, an ordinary request still goes through while the stream is open.
+        replies = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def collect(message):
+            replies.append(message)
+        await asyncio.wait_for(front(scope('/api/get_airport_coords'), receive, collect), 5)
+        assert replies[0]['status'] == 200
+        assert flight_app.status_hub.stats()['subscribers'] == 1
+
+        disconnected.set()
+        await asyncio.wait_for(stream, 5)
+        assert flight_app.status_hub.stats()['subscribers'] == 0
+        assert front._in_flight == 0
+        front._executor.shutdown()
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+import threading
+
+import mysql.connector
+
+from write_behind import GameStatusWriter
+
+
+class FakeDatabase:
+    # Stands in for GameData: records each executemany as one batch, or raises the next queued failure.
+
+    def __init__(self, failures=()):
+        self.batches = []
+        self.failures = list(failures)
+        self.release = threading.Event()
+        self.release.set()
+
+    def _get_db_connection(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        self.database.release.wait(5.0)
+        if self.database.failures:
+            raise self.database.failures.pop(0)
+        self.database.batches.append(list(rows))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def written(database):
+    # Latest row per game, in write order.
+    rows = {}
+    for batch in database.batches:
+        for row in batch:
+            rows[row[-1]] = row[:-1]
+    return rows
+
+
+def test_updates_to_a_queued_game_coalesce():
+    database = FakeDatabase()
+    # The worker lingers for a fuller batch, so every submit below finds game 1 still queued.
+    writer = GameStatusWriter(database, linger_seconds=1.0)
+    writer.submit(1, (75.0, 0, 'AAAA', 'ACTIVE'))
+    for minutes in (60, 120, 180):
+        writer.submit(1, (70.0, minutes, 'AAAB', 'ACTIVE'))
+    writer.submit(2, (75.0, 0, 'AAAC', 'ACTIVE'))
+    assert writer.flush(timeout=5.0)
+    assert database.batches == [[(70.0, 180, 'AAAB', 'ACTIVE', 1), (75.0, 0, 'AAAC', 'ACTIVE', 2)]]
+    assert writer.stats()['coalesced'] == 3
+    writer.close()
+
+
+def test_update_queued_during_a_failed_write_wins():
+    database = FakeDatabase([mysql.connector.Error("gone")])
+    database.release.clear()
+    writer = GameStatusWriter(database, linger_seconds=0.01, retry_backoff_seconds=0.01)
+    writer.submit(1, (75.0, 0, 'AAAA', 'ACTIVE'))
+    while not writer.stats()['in_flight']:
+        pass
+    writer.submit(1, (70.0, 60, 'AAAB', 'ACTIVE'))
+    database.release.set()
+    assert writer.flush(timeout=5.0)
+    assert written(database) == {1: (70.0, 60, 'AAAB', 'ACTIVE')}
+    writer.close()
+
+
+def test_failed_batches_are_retried_then_dropped():
+    database = FakeDatabase([mysql.connector.Error("gone")] * 2)
+    writer = GameStatusWriter(database, linger_seconds=0.01, retry_backoff_seconds=0.01, max_retries=3)
+    writer.submit(5, (50.0, 300, 'AAAA', 'ACTIVE'))
+    assert writer.flush(timeout=5.0)
+    assert written(database) == {5: (50.0, 300, 'AAAA', 'ACTIVE')}
+    assert (writer.stats()['failed_batches'], writer.stats()['retried'], writer.stats()['dropped']) == (2, 2, 0)
+
+    database.failures = [mysql.connector.Error("gone")] * 4
+    writer.submit(6, (40.0, 400, 'AAAB', 'ACTIVE'))
+    assert writer.flush(timeout=5.0)
+    assert 6 not in written(database)
+    assert writer.stats()['dropped'] == 1
+    writer.close()
+
+
+def test_worker_survives_an_unexpected_error():
+    database = FakeDatabase([TypeError("bad row")])
+    writer = GameStatusWriter(database, linger_seconds=0.01, retry_backoff_seconds=0.01)
+    writer.submit(3, (30.0, 90, 'AAAA', 'ACTIVE'))
+    assert writer.flush(timeout=5.0)
+    assert writer._thread.is_alive()
+    assert written(database) == {3: (30.0, 90, 'AAAA', 'ACTIVE')}
+    assert writer.stats()['retried'] == 1
+    writer.close()
+
+
+def test_closed_writer_writes_synchronously():
+    database = FakeDatabase()
+    writer = GameStatusWriter(database)
+    writer.close()
+    writer.submit(9, (10.0, 1000, 'AAAA', 'LOST_TIME'))
+    assert written(database) == {9: (10.0, 1000, 'AAAA', 'LOST_TIME')}
+    assert writer.stats()['sync_writes'] == 1